@@ -17,6 +17,9 @@ import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 运行时数据目录（检查点、转存文件等），默认在代码仓库之外，可通过环境变量A7_DATA_DIR修改
+DATA_DIR = Path(os.environ.get('A7_DATA_DIR', Path.home() / '.a7'))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -57,21 +60,34 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'corsheaders.middleware.CorsMiddleware',  # CORS中间件，必须放在CommonMiddleware之前
+    'apps.core.middleware.RouteDispatchMiddleware',  # 区分有状态/无状态请求，需在以下Stateful*中间件之前
+    'corsheaders.middleware.CorsMiddleware',  # CORS中间件，必须放在CommonMiddleware之前，负载保护返回的503也带CORS响应头
+    # 按优先级的负载保护中间件，在会话、认证等中间件之前尽早拒绝请求
+    'apps.core.middleware.LoadSheddingMiddleware',
+    # 会话、CSRF、认证、消息和点击劫持中间件的子类，无状态的/api/请求跳过（STATELESS_API_ENABLED）
+    'apps.core.middleware.StatefulSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.StatefulCsrfViewMiddleware',
+    'apps.core.middleware.StatefulAuthenticationMiddleware',
+    'apps.core.middleware.StatefulMessageMiddleware',
+    'apps.core.middleware.StatefulXFrameOptionsMiddleware',
     
     # 自定义中间件
+    'apps.core.middleware.ServerTimingMiddleware',  # Server-Timing分阶段计时中间件，需在日志中间件之前
+    'apps.core.middleware.QueryTrackingMiddleware',  # SQL查询统计和N+1检测中间件，需在日志中间件之前
     'apps.core.middleware.RequestLoggingMiddleware',  # 请求日志记录中间件
     'users.middleware.JWTAuthMiddleware',  # JWT认证中间件
+    'apps.core.middleware.RateLimitMiddleware',  # 限流中间件，需在JWT认证中间件之后以便按用户限流
+    'apps.core.middleware.CompressionMiddleware',  # 响应压缩中间件，需在请求处理中间件之前，压缩最终响应内容
     'apps.core.middleware.RequestProcessorMiddleware',  # 请求处理中间件
     # 'users.middleware.RoleBasedPermissionMiddleware',  # 基于角色的权限中间件 - 计划将来实现
 ]
 
+STATELESS_API_ENABLED = True  # 是否为无状态的/api/请求跳过有状态中间件，设为False时所有请求都执行全部中间件
+
+# 认证后端：认证方式与ModelBackend相同，用户权限由角色权限和单独授予的权限共同解析
+AUTHENTICATION_BACKENDS = ['users.backends.RolePermissionBackend']
+
 ROOT_URLCONF = 'a7.urls'
 
 TEMPLATES = [
@@ -152,7 +168,7 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     # 认证类配置
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT令牌认证
+        'users.authentication.CachedJWTAuthentication',  # JWT令牌认证（复用JWTAuthMiddleware的认证结果）
         'rest_framework.authentication.SessionAuthentication',  # 会话认证（支持浏览器可视化API）
     ),
     
@@ -167,13 +183,13 @@ REST_FRAMEWORK = {
     
     # 渲染器配置 - 定义API输出格式
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',  # JSON渲染器
+        'apps.core.renderers.EnvelopeJSONRenderer',  # JSON渲染器（渲染时直接输出标准化响应格式）
         'rest_framework.renderers.BrowsableAPIRenderer',  # 可视化API渲染器
     ],
     
     # 解析器配置 - 定义API输入解析方式
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',  # JSON解析器
+        'apps.core.parsers.CachedJSONParser',  # JSON解析器（复用中间件已解析的请求体）
         'rest_framework.parsers.FormParser',  # 表单数据解析器
         'rest_framework.parsers.MultiPartParser',  # 多部分表单数据解析器，支持文件上传
     ],
@@ -215,6 +231,12 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # 登录和刷新时在访问令牌中写入角色、权限位图和权限版本，权限类据此授权而不查询数据库
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.PermissionTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.PermissionTokenRefreshSerializer',
+    # 验证和加入黑名单时通过黑名单过滤器检查，大部分未加入黑名单的令牌不查询数据库
+    'TOKEN_VERIFY_SERIALIZER': 'users.serializers.FilteredTokenVerifySerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers.FilteredTokenBlacklistSerializer',
 }
 
 # CORS 配置
@@ -261,6 +283,18 @@ SWAGGER_SETTINGS = {
     'VALIDATOR_URL': None,
 }
 
+# 异步日志管道配置（用于请求日志和JWT认证日志的文件写入）
+LOG_SINK_OPTIONS = {
+    'max_queue_size': 10000,  # 内存队列最大长度
+    'policy': 'drop_oldest',  # 背压策略：block, drop_oldest, sample
+    'sample_rate': 0.1,  # sample策略下积压时的保留比例
+    'batch_size': 500,  # 每批写入的最大记录数
+    'flush_interval': 0.5,  # 写入线程最长等待时间（秒）
+    'fsync_interval': 5.0,  # fsync周期（秒）
+    'max_bytes': 50 * 1024 * 1024,  # 单个日志文件最大大小，超过后轮转
+    'backup_count': 5,  # 保留的轮转文件数量
+}
+
 # 日志配置
 LOGGING = {
     'version': 1,
@@ -289,15 +323,17 @@ LOGGING = {
         },
         'jwt_auth_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'apps.core.log_sink.QueuedFileHandler',  # 异步队列写入，避免磁盘IO阻塞请求线程
             'filename': str(BASE_DIR.parent / 'jwt_auth.log'),
             'formatter': 'verbose',
+            **LOG_SINK_OPTIONS,
         },
         'request_log_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'apps.core.log_sink.QueuedFileHandler',  # 异步队列写入，避免磁盘IO阻塞请求线程
             'filename': str(BASE_DIR.parent / 'request.log'),
             'formatter': 'verbose',
+            **LOG_SINK_OPTIONS,
         },
     },
     'loggers': {
@@ -326,12 +362,38 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'query_log': {
+            'handlers': ['request_log_file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'ratelimit': {
+            'handlers': ['request_log_file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
 # 中间件配置项
+# 以下各类路径配置由apps.core.routing在启动时编译为单个前缀匹配器，每个请求只分类一次
+API_PATH_PREFIXES = ['/api/']  # API请求路径前缀
+ADMIN_PATH_PREFIXES = ['/admin/']  # 管理后台路径前缀
+
 # JWT认证中间件配置
 CUSTOM_JWT_ERROR_RESPONSE = True  # 是否使用自定义JWT错误响应
+JWT_AUTH_EXEMPT_PATHS = [
+    '/admin/',
+    '/static/',
+    '/media/',
+    '/api-auth/',
+    '/api/token/',
+    '/api/login/',
+    '/swagger/',
+    '/redoc/',
+    '/health-check/',
+    '/api/health/',
+]  # 不进行JWT认证的URL路径
 
 # 请求日志中间件配置
 REQUEST_LOG_LEVEL = 'INFO'  # 日志级别：DEBUG, INFO, WARNING, ERROR
@@ -342,7 +404,167 @@ REQUEST_LOG_EXCLUDE_PATHS = [
     '/static/',
     '/media/',
     '/health-check/',
-]  # 不记录日志的URL路径
+    '/api/health/',
+]  # 不记录日志的URL路径（负载均衡器的健康检查请求很频繁）
+# 请求日志采样：错误响应、慢请求和携带有效调试请求头的请求总是记录，其余正常请求按比例采样
+REQUEST_LOG_SAMPLE_RATE = 1.0  # 正常请求的采样比例（1.0表示全部记录）
+REQUEST_LOG_SLOW_THRESHOLD = 1.0  # 默认延迟预算（秒），超过即视为慢请求
+REQUEST_LOG_ROUTE_BUDGETS = {}  # 按路由设置延迟预算（秒），如 {'GET knowledgepoint-list': 0.3}
+REQUEST_LOG_DEBUG_HEADER = 'X-Debug-Log'  # 管理员用户（is_staff）携带该请求头的请求总是记录
+# 调试请求头的值与该密钥一致时，非管理员的请求也总是记录（如排查登录问题）；未设置时只对管理员生效
+REQUEST_LOG_DEBUG_SECRET = os.environ.get('A7_REQUEST_LOG_DEBUG_SECRET')
+
+# 性能指标配置
+LATENCY_METRICS_ENABLED = True  # 是否按路由聚合响应时间直方图
+LATENCY_METRICS_FLUSH_INTERVAL = 60  # 汇总结果写入PerformanceMetric的周期（秒）
+SERVER_TIMING_ENABLED = False  # 是否为所有请求输出Server-Timing响应头
+SERVER_TIMING_REQUEST_HEADER = 'X-Server-Timing'  # 携带该请求头的请求单独开启计时，设为None则不允许
+SERVER_TIMING_ALLOWED_IPS = []  # 允许查看Server-Timing响应头的客户端IP，DEBUG模式和管理员用户（is_staff）总是允许
+QUERY_TRACKING_ENABLED = True  # 是否统计每个请求的SQL查询
+N_PLUS_ONE_THRESHOLD = 5  # 同一形状的查询在一个请求中执行达到该次数时记录N+1警告
+
+# 健康检查配置
+# /api/health/live/为存活检查，不访问任何外部依赖；/api/health/ready/为就绪检查，关键依赖不可用时返回503
+HEALTH_CHECK_PROBES = ['database', 'cache', 'log_sinks', 'token_blacklist', 'user_cache', 'permission_cache', 'token_blacklist_filter']  # 就绪检查执行的探针
+HEALTH_CHECK_CRITICAL = ['database', 'cache', 'token_blacklist']  # 失败时视为未就绪的探针，其余失败只标记为degraded
+HEALTH_CHECK_CACHE_TTL = 5  # 检查结果在进程内的缓存时间（秒）
+HEALTH_CHECK_CACHE = 'shared'  # 缓存探针检查的缓存（多个worker进程共享、各项功能依赖的缓存）
+HEALTH_CHECK_LOG_QUEUE_THRESHOLD = 0.9  # 日志管道队列深度超过容量的该比例时视为积压
+# 可以查看就绪检查详细结果的客户端IP（按REMOTE_ADDR判断），管理员用户（is_staff）总是允许。
+# 默认为空：部署在同一主机的反向代理之后时所有请求的REMOTE_ADDR都是127.0.0.1，只有直接对外或代理不在本机时才可加入内部地址
+HEALTH_CHECK_DETAIL_ALLOWED_IPS = []
+
+# 用户缓存配置：JWT认证时通过两级缓存（进程内LRU + CACHES中的共享缓存）解析令牌中的用户
+# 用户保存/删除时清除缓存；其他进程中is_active、权限版本等字段的变化最迟USER_CACHE_LOCAL_TTL秒后生效
+USER_CACHE_ENABLED = True
+USER_CACHE_MAX_SIZE = 2048  # 进程内缓存的最大用户数
+USER_CACHE_LOCAL_TTL = 10  # 进程内缓存有效期（秒）
+USER_CACHE_SHARED_TTL = 60  # 共享缓存有效期（秒），同时也是绕过信号的批量更新生效的最长时间
+# 共享缓存使用的缓存；为进程内缓存时共享缓存有效期被限制为USER_CACHE_LOCAL_TTL。
+# 第二级缓存需要Redis等内存缓存（设置A7_REDIS_URL）：数据库缓存未命中时要多执行几次缓存表查询，
+# 比直接查询用户表更慢，因此为数据库缓存时只使用进程内缓存（每个进程每USER_CACHE_LOCAL_TTL秒查询一次用户表）
+USER_CACHE_ALIAS = 'shared'
+
+# 用户有效权限缓存（users.permission_cache），has_perm/has_module_perms在同一个请求中只计算一次权限集，
+# 跨请求按用户的权限版本（User.permissions_version，保存在用户表中）缓存，
+# 角色、组或用户的权限变化时版本递增，缓存键随之变化，旧的权限集不会再被读取
+PERMISSION_CACHE_TIMEOUT = 300  # 权限集在缓存中的有效期（秒）
+PERMISSION_CACHE_ALIAS = 'default'  # 保存权限集的缓存，缓存键包含版本，使用进程内缓存也不会读到过期的权限集
+
+# 角色变更的批量传播（users.role_propagation）：角色保存后按批次UPDATE同步用户的role/role_obj
+ROLE_PROPAGATION_BATCH_SIZE = 1000  # 每批更新的用户数
+ROLE_PROPAGATION_BACKGROUND_THRESHOLD = 1000  # 待同步的用户超过该数量时在事务提交后由后台任务执行
+ROLE_PROPAGATION_CACHE = 'shared'  # 保存同步进度和锁的缓存，必须在多个worker进程间共享
+ROLE_PROPAGATION_INTERVAL = 60  # 后台任务检查等待中的同步的间隔（秒），其他进程退出前留下的同步由此继续
+ROLE_PROPAGATION_STALE_AFTER = 300  # 同步中的进度超过该时间（秒）没有更新时标记为失败
+
+# sync_roles/init_roles命令的分批同步配置（users.role_sync）
+ROLE_SYNC_CHUNK_SIZE = 1000  # 每批同步的用户数，每批在单独的事务中更新
+ROLE_SYNC_CHECKPOINT_FILE = str(DATA_DIR / 'role_sync.checkpoint')  # 同步进度检查点文件，中断后再次运行时从检查点继续
+
+# 令牌黑名单过滤器配置：布隆过滤器+最近写入的精确集合，未命中的令牌刷新/验证时不查询黑名单表
+TOKEN_BLACKLIST_FILTER_ENABLED = True
+TOKEN_BLACKLIST_FILTER_CAPACITY = 100000  # 布隆过滤器的最小容量，实际容量为黑名单数量的2倍（取较大值）
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.01  # 布隆过滤器的误判率，误判时查询数据库确认
+TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL = 300  # 后台全量重建周期（秒），重建时清除已过期的令牌
+TOKEN_BLACKLIST_FILTER_CACHE = 'shared'  # 保存黑名单写入代数的缓存；为进程内缓存时否定结果也查询数据库确认
+
+# 过期令牌清理配置（定时任务和purge_tokens命令），分批删除过期的OutstandingToken/BlacklistedToken
+TOKEN_PURGE_INTERVAL = 3600  # 定时清理周期（秒），设为None则只能通过purge_tokens命令清理
+TOKEN_PURGE_MAX_SECONDS = 60  # 定时任务每轮最长执行时间（秒），未完成的部分下一轮从检查点继续
+TOKEN_PURGE_BATCH_SIZE = 1000  # 每批删除的令牌数，每批在单独的短事务中执行
+TOKEN_PURGE_PAUSE = 0.1  # 批次之间的暂停时间（秒）
+TOKEN_PURGE_CHECKPOINT_FILE = str(DATA_DIR / 'token_purge.checkpoint')  # 清理进度检查点文件
+TOKEN_PURGE_LOCK_CACHE = 'shared'  # 定时任务和purge_tokens命令共用的清理锁所在的缓存
+
+# 使用统计写入配置
+USAGE_BUFFER_SIZE = 500  # 缓冲区达到该数量时批量写入
+USAGE_FLUSH_INTERVAL = 5  # 缓冲区最长刷新周期（秒）
+USAGE_SPILL_FILE = str(DATA_DIR / 'usage_spill.jsonl')  # 数据库不可用时的本地转存文件
+
+# 后台任务配置（定期批量写库等），测试配置（a7.test_settings）中关闭
+BACKGROUND_WORKERS_ENABLED = True
+
+# 缓存配置
+CACHES = {
+    # 进程内缓存，保存只在当前进程使用的数据
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'a7-default',
+    },
+    # 多个worker进程共享的数据（限流计数、负载统计、用户快照等）。设置环境变量A7_REDIS_URL时使用Redis
+    # （需要安装redis），否则使用数据库缓存表（manage.py migrate 时自动创建）；
+    # 数据库缓存的每次读写都是一次SQL查询，限流等高频数据改为按周期批量同步（见RATELIMIT_SYNC_INTERVAL）。
+    # manage.py check --deploy --database default 会检查这些数据是否误用了进程内缓存、缓存表是否已创建
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'a7_shared_cache',
+    },
+}
+REDIS_URL = os.environ.get('A7_REDIS_URL')
+if REDIS_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# 黑名单过滤器每个进程读取写入代数的最短间隔（秒）；数据库缓存每次读取都是一次SQL查询，
+# 其他进程加入黑名单的令牌最迟该间隔后被拒绝（本进程写入的立即生效）
+TOKEN_BLACKLIST_FILTER_CHECK_INTERVAL = 0 if REDIS_URL else 0.5
+
+# 条件请求配置：课程内容视图集根据版本戳生成ETag/Last-Modified，命中时返回304
+# 版本戳保存在数据库（core.ContentVersion）中，与数据修改在同一个事务中提交
+CONDITIONAL_GET_ENABLED = True
+
+# 限流配置（滑动窗口，计数保存在RATELIMIT_CACHE指定的共享缓存中，所有worker进程共享同一份预算）
+RATELIMIT_ENABLED = True
+RATELIMIT_CACHE = 'shared'
+# 各进程把本地计数加到共享缓存的周期（秒），其他进程的请求最多延迟该时间计入；
+# 为0时每个请求直接在共享缓存中计数（只适合Redis，数据库缓存每条规则需要多次SQL查询）
+RATELIMIT_SYNC_INTERVAL = 0 if REDIS_URL else 0.5
+# 部署在反向代理（nginx、负载均衡器等）之后时必须开启，按X-Forwarded-For识别客户端IP；
+# 未开启时所有客户端的IP都是代理的IP，按IP的限流对整个站点只有一份预算。只在代理会覆盖该请求头时开启，否则客户端可以伪造
+RATELIMIT_TRUST_X_FORWARDED_FOR = False
+# 是否启用key为ip的规则（如下面的api-ip），确认能识别真实客户端IP（直接对外或已开启上一项）后再开启
+RATELIMIT_IP_RULES_ENABLED = False
+# 限流规则：key可以是user（按用户，未认证时按IP）、ip-username（按IP和登录用户名）、ip或route（整个路由共享），
+# 同一请求需满足全部匹配的规则
+RATELIMIT_RULES = [
+    {'name': 'token', 'paths': ['/api/token/', '/api/login/'], 'methods': ['POST'], 'key': 'ip-username', 'rate': '20/m'},
+    {'name': 'knowledge-points', 'paths': ['/api/knowledge-points/'], 'key': 'user', 'rate': '120/m'},
+    {'name': 'api-user', 'paths': ['/api/'], 'key': 'user', 'rate': '600/m'},
+    {'name': 'api-ip', 'paths': ['/api/'], 'key': 'ip', 'rate': '1200/m'},
+]
+RATELIMIT_EXEMPT_PATHS = ['/api/health/']  # 不限流的路径，健康检查不访问共享缓存
+
+# 负载保护配置：所有worker进程处理中的请求数超过阈值时拒绝对应优先级的请求，高优先级不受限制
+LOAD_SHEDDING_ENABLED = True
+LOAD_SHEDDING_CACHE = 'shared'  # 各进程通过该缓存发布自己处理中的请求数
+LOAD_SHEDDING_SYNC_INTERVAL = 0.5  # 发布和读取各进程处理中请求数的周期（秒）
+LOAD_SHEDDING_LIMITS = {
+    'low': 32,
+    'normal': 64,
+}
+LOAD_SHEDDING_PRIORITIES = {
+    'low': ['/api/knowledge-points/', '/api/coursewares/', '/swagger/', '/redoc/'],
+    'high': ['/api/token/', '/api/login/', '/admin/'],
+}
+LOAD_SHEDDING_EXEMPT_PATHS = ['/api/health/']  # 不参与负载保护的路径，健康检查不计数也不访问共享缓存
+
+# 响应压缩配置
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 1024  # 小于该大小（字节）的响应不压缩
+COMPRESSION_ENCODINGS = ['br', 'gzip']  # 服务端优先顺序，br需要安装brotli，未安装时自动忽略
+COMPRESSION_GZIP_LEVEL = 5  # gzip压缩级别（1-9），较低级别速度更快
+COMPRESSION_BROTLI_QUALITY = 4  # brotli压缩质量（0-11）
+COMPRESSION_EXCLUDE_TYPES = [
+    'image/',
+    'video/',
+    'audio/',
+    'application/zip',
+    'application/gzip',
+    'application/pdf',
+]  # 已压缩的内容类型，不再压缩
 
 # 请求处理中间件配置
 MAX_REQUEST_SIZE = 10 * 1024 * 1024  # 最大请求大小（10MB）
@@ -355,7 +577,18 @@ PROCESSOR_EXCLUDE_PATHS = [
     '/admin/',
     '/static/',
     '/media/',
-]  # 不进行处理的URL路径
+    '/api/health/',
+]  # 不进行处理的URL路径（健康检查直接返回检查结果，不包装为标准化格式）
 
 # 角色权限中间件配置
 CUSTOM_PERMISSION_DENIED_RESPONSE = True  # 是否使用自定义权限拒绝响应
+PERMISSION_EXEMPT_PATHS = [
+    '/admin/',
+    '/static/',
+    '/media/',
+    '/api-auth/',
+    '/api/token/',
+    '/api/login/',
+    '/swagger/',
+    '/redoc/',
+]  # 不进行角色权限检查的URL路径
@@ -0,0 +1,24 @@
+"""
+测试配置
+
+在a7.settings的基础上只修改测试需要不同的配置项：
+    python manage.py test --settings=a7.test_settings
+    pytest --ds=a7.test_settings
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# 不启动后台线程，避免后台线程写入测试数据库；需要时测试中显式刷新或用override_settings开启
+BACKGROUND_WORKERS_ENABLED = False
+
+# 测试在单个进程中运行，共享缓存改用与默认缓存同一块进程内存储，cache.clear()同时清除两者
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'a7-default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'a7-default',
+    },
+}
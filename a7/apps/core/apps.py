@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+    label = 'core'
+    verbose_name = '核心功能'
+
+    def ready(self):
+        # 注册SQL查询统计和Server-Timing的数据库执行包装器（在导入时通过信号注册）
+        import apps.core.queries
+        import apps.core.timing
+        # 注册部署检查，migrate时创建数据库缓存使用的缓存表
+        from apps.core.shared_cache import create_cache_tables
+        post_migrate.connect(create_cache_tables, sender=self, dispatch_uid='core.create_cache_tables')
@@ -0,0 +1,113 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger('django')
+
+# 已创建的后台任务，进程退出时统一停止并执行最后一次任务
+_workers = []
+_workers_lock = threading.Lock()
+
+
+class PeriodicWorker:
+    """
+    周期性后台任务
+
+    在守护线程中每隔interval秒执行一次target，用于批量刷新缓冲数据等场景。
+    - 首次调用start()时才启动线程，fork后在子进程中自动重新启动
+    - trigger()唤醒线程立即执行一次，用于缓冲区写满等场景，避免在请求线程中执行
+    - BACKGROUND_WORKERS_ENABLED为False时（如测试配置中）不启动线程，数据只能显式刷新
+    - 进程退出时执行最后一次target（final_run为True时），避免缓冲数据丢失
+    """
+
+    def __init__(self, name, interval, target, final_run=True):
+        self.name = name
+        self.interval = interval
+        self.target = target
+        # 进程退出时是否再执行一次target（刷新缓冲数据的任务需要，重建索引等任务不需要）
+        self.final_run = final_run
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._lock = threading.Lock()
+        with _workers_lock:
+            _workers.append(self)
+
+    def start(self):
+        """按需启动后台线程，返回线程是否在运行"""
+        if not getattr(settings, 'BACKGROUND_WORKERS_ENABLED', True):
+            return False
+
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return True
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return True
+            self._pid = pid
+            self._stop_event = threading.Event()
+            self._wake_event = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'periodic-{self.name}',
+                daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def trigger(self):
+        """
+        唤醒后台线程立即执行一次target，返回线程是否在运行
+
+        后台任务未启用时返回False，由调用方决定是否在当前线程中执行
+        """
+        if not self.start():
+            return False
+        self._wake_event.set()
+        return True
+
+    def stop(self, run_once=True, timeout=5.0):
+        """停止后台线程；run_once为True时在停止后再执行一次target"""
+        self._stop_event.set()
+        self._wake_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+        if run_once:
+            self.run_once()
+
+    def run_once(self):
+        """执行一次target，异常只记录日志，不影响后续执行"""
+        try:
+            self.target()
+        except Exception:
+            logger.exception(f"后台任务执行失败: {self.name}")
+        finally:
+            # 后台线程中使用的数据库连接需要主动回收
+            close_old_connections()
+
+    def _run(self):
+        while True:
+            # 等待周期结束或被trigger()/stop()唤醒
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.run_once()
+
+
+@atexit.register
+def _stop_all_workers():
+    """进程退出前停止所有后台任务，并执行最后一次刷新"""
+    with _workers_lock:
+        workers = list(_workers)
+    for worker in workers:
+        # 只处理当前进程中启动过的任务
+        if worker._pid == os.getpid():
+            worker.stop(run_once=worker.final_run)
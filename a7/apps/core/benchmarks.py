@@ -0,0 +1,338 @@
+import time
+
+from django.test import RequestFactory
+
+# 已注册的基准测试，名称 -> (说明, 函数, 默认迭代次数)
+BENCHMARKS = {}
+
+
+def register(name, description, iterations=10000):
+    """
+    注册基准测试
+
+    被装饰的函数接收迭代次数，返回 [(场景名称, 可调用对象), ...]，
+    每个可调用对象会被重复执行并统计单次耗时
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (description, func, iterations)
+        return func
+    return decorator
+
+
+def measure(func, iterations):
+    """执行func指定次数，返回单次平均耗时（微秒）"""
+    # 预热，避免首次调用的初始化开销影响结果
+    for _ in range(min(iterations, 100)):
+        func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run_benchmark(name, iterations=None):
+    """运行指定的基准测试，返回 [(场景名称, 单次耗时微秒), ...]"""
+    description, func, default_iterations = BENCHMARKS[name]
+    iterations = iterations or default_iterations
+    return [(label, measure(case, iterations)) for label, case in func(iterations)]
+
+
+# 用于基准测试的典型请求路径
+SAMPLE_PATHS = [
+    '/api/knowledge-points/',
+    '/api/courses/1/',
+    '/api/token/refresh/',
+    '/admin/users/user/',
+    '/static/css/base.css',
+    '/swagger/',
+    '/api/health/',
+]
+
+
+@register('routing', '中间件路由分类：逐个前缀线性扫描 vs 共享的编译前缀匹配器')
+def bench_routing(iterations):
+    from django.conf import settings
+    from apps.core.routing import RouteClassifier, get_route_info
+
+    factory = RequestFactory()
+    requests = [factory.get(path) for path in SAMPLE_PATHS]
+
+    log_excluded = settings.REQUEST_LOG_EXCLUDE_PATHS
+    process_excluded = settings.PROCESSOR_EXCLUDE_PATHS
+
+    def jwt_exempt_urls():
+        # 原实现每次调用都会重建列表
+        return [p.lstrip('/') for p in settings.JWT_AUTH_EXEMPT_PATHS]
+
+    def permission_exempt_urls():
+        return [p.lstrip('/') for p in settings.PERMISSION_EXEMPT_PATHS]
+
+    def linear_scans():
+        # 原实现：四个中间件各自对路径做线性前缀扫描
+        for request in requests:
+            any(request.path.startswith(p) for p in log_excluded)
+            any(request.path.startswith(p) for p in process_excluded)
+            path = request.path_info.lstrip('/')
+            any(path.startswith(url) for url in jwt_exempt_urls())
+            any(path.startswith(url) for url in permission_exempt_urls())
+            request.path.startswith('/api/')
+
+    classifier = RouteClassifier()
+
+    def shared_classifier():
+        # 新实现：每个请求分类一次，四个中间件读取同一结果
+        for request in requests:
+            request.__dict__.pop('route_info', None)
+            request.route_info = classifier.classify(request.path_info)
+            for _ in range(4):
+                get_route_info(request)
+
+    return [
+        (f'线性扫描 x4（{len(requests)}个请求）', linear_scans),
+        (f'共享分类器（{len(requests)}个请求）', shared_classifier),
+    ]
+
+
+@register('envelope', '大页课件列表的标准化响应：渲染后包装再渲染 vs 渲染时直接包装', iterations=200)
+def bench_envelope(iterations):
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.response import Response
+    from apps.core.renderers import EnvelopeJSONRenderer, build_success_envelope
+
+    # 模拟CoursewareViewSet一页（PAGE_SIZE=20）包含完整content字段的列表数据
+    content = '课件内容段落。' * 3000
+    page = {
+        'count': 200,
+        'next': 'http://testserver/api/coursewares/?page=2',
+        'previous': None,
+        'results': [
+            {
+                'id': i,
+                'title': f'课件{i}',
+                'content': content,
+                'type': 'document',
+                'type_display': '文档',
+                'course': 1,
+                'course_title': '高等数学',
+                'created_by': 2,
+                'creator_name': 'teacher',
+                'created_at': '2025-05-01 10:00:00',
+            }
+            for i in range(20)
+        ],
+    }
+    request = Request(RequestFactory().get('/api/coursewares/'))
+
+    def double_render():
+        # 原实现：DRF渲染一次，中间件包装后重置_is_rendered再渲染一次
+        response = Response(page)
+        context = {'request': request, 'response': response}
+        renderer = JSONRenderer()
+        renderer.render(response.data, 'application/json', context)
+        renderer.render(build_success_envelope(response.data, 200), 'application/json', context)
+
+    def single_render():
+        response = Response(page)
+        response.accepted_renderer = renderer = EnvelopeJSONRenderer()
+        context = {'request': request, 'response': response}
+        renderer.render(response.data, 'application/json', context)
+
+    return [
+        ('渲染两次', double_render),
+        ('EnvelopeJSONRenderer单次渲染', single_render),
+    ]
+
+
+@register('asgi', 'ASGI下的自定义中间件链：仅同步中间件逐层线程切换 vs 原生异步中间件', iterations=2000)
+def bench_asgi(iterations):
+    import asyncio
+    import logging
+    from django.conf import settings
+    from django.core.handlers.base import BaseHandler
+    from django.http import HttpResponse
+    from django.test.utils import override_settings
+    from django.utils.module_loading import import_string
+
+    # 只测量项目自定义的中间件
+    middleware_classes = [
+        import_string(path) for path in settings.MIDDLEWARE
+        if path.startswith(('apps.', 'users.'))
+    ]
+    # 两种模式写入的日志相同，关闭输出避免刷屏
+    for name in ('request_log', 'jwt_auth', 'request_processor'):
+        logging.getLogger(name).disabled = True
+
+    async def view(request):
+        return HttpResponse('ok')
+
+    base_handler = BaseHandler()
+
+    def build_chain(force_sync):
+        # 与BaseHandler.load_middleware(is_async=True)相同的适配规则
+        handler, handler_is_async, hops = view, True, 0
+        for middleware_class in reversed(middleware_classes):
+            is_async = handler_is_async if middleware_class.async_capable and not force_sync else False
+            if is_async != handler_is_async:
+                hops += 1
+            adapted = base_handler.adapt_method_mode(is_async, handler, handler_is_async)
+            handler, handler_is_async = middleware_class(adapted), is_async
+        if not handler_is_async:
+            hops += 1
+        return base_handler.adapt_method_mode(True, handler, handler_is_async), hops
+
+    # 不写入延迟统计，避免基准测试产生PerformanceMetric记录
+    with override_settings(LATENCY_METRICS_ENABLED=False):
+        sync_chain, sync_hops = build_chain(force_sync=True)
+        async_chain, async_hops = build_chain(force_sync=False)
+
+    loop = asyncio.new_event_loop()
+    request = RequestFactory().get('/api/courses/')
+
+    return [
+        (f'仅同步中间件（每请求{sync_hops}次线程切换）', lambda: loop.run_until_complete(sync_chain(request))),
+        (f'原生异步中间件（每请求{async_hops}次线程切换）', lambda: loop.run_until_complete(async_chain(request))),
+    ]
+
+
+@register('request_log', '正常请求的日志中间件开销：全部记录 vs 尾部采样（1%）', iterations=5000)
+def bench_request_log(iterations):
+    import logging
+    from django.http import JsonResponse
+    from django.test.utils import override_settings
+    from apps.core.middleware.request_logging_middleware import RequestLoggingMiddleware
+
+    # 只比较日志数据的构建开销，关闭输出避免刷屏
+    logging.getLogger('request_log').disabled = True
+
+    def view(request):
+        return JsonResponse({'success': True})
+
+    with override_settings(LATENCY_METRICS_ENABLED=False, REQUEST_LOG_SAMPLE_RATE=1.0):
+        full = RequestLoggingMiddleware(view)
+    with override_settings(LATENCY_METRICS_ENABLED=False, REQUEST_LOG_SAMPLE_RATE=0.01):
+        sampled = RequestLoggingMiddleware(view)
+
+    request = RequestFactory().get(
+        '/api/knowledge-points/',
+        {'course': '1', 'page': '2'},
+        HTTP_AUTHORIZATION='Bearer token',
+        HTTP_USER_AGENT='Mozilla/5.0',
+        HTTP_ACCEPT='application/json',
+        HTTP_ACCEPT_LANGUAGE='zh-CN',
+        HTTP_X_FORWARDED_FOR='10.0.0.1',
+    )
+
+    return [
+        ('全部记录', lambda: full(request)),
+        ('尾部采样1%', lambda: sampled(request)),
+    ]
+
+
+@register('stateless_api', '携带JWT令牌的/api/请求：完整的有状态中间件链 vs 按路由跳过的精简链', iterations=5000)
+def bench_stateless_api(iterations):
+    from django.http import JsonResponse
+    from django.test.utils import override_settings
+    from apps.core.middleware import (
+        RouteDispatchMiddleware,
+        StatefulAuthenticationMiddleware,
+        StatefulCsrfViewMiddleware,
+        StatefulMessageMiddleware,
+        StatefulSessionMiddleware,
+        StatefulXFrameOptionsMiddleware,
+    )
+
+    def view(request):
+        return JsonResponse({'success': True})
+
+    def chain():
+        handler = view
+        for middleware_class in (
+            StatefulXFrameOptionsMiddleware,
+            StatefulMessageMiddleware,
+            StatefulAuthenticationMiddleware,
+            StatefulCsrfViewMiddleware,
+            StatefulSessionMiddleware,
+            RouteDispatchMiddleware,
+        ):
+            handler = middleware_class(handler)
+        return handler
+
+    with override_settings(STATELESS_API_ENABLED=False):
+        full = chain()
+    with override_settings(STATELESS_API_ENABLED=True):
+        lean = chain()
+
+    factory = RequestFactory()
+
+    # 每次使用新请求，避免会话、用户等惰性属性被复用；基线场景用于扣除构造请求的耗时
+    def full_chain():
+        full(factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token', HTTP_ACCEPT='application/json'))
+
+    def lean_chain():
+        lean(factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token', HTTP_ACCEPT='application/json'))
+
+    def request_only():
+        factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token', HTTP_ACCEPT='application/json')
+
+    return [
+        ('仅构造请求（基线）', request_only),
+        ('完整链（会话/CSRF/认证/消息/X-Frame-Options）', full_chain),
+        ('精简链', lean_chain),
+    ]
+
+
+@register('permissions', '非管理员用户的has_perm：每次调用逐项查询 vs 缓存的有效权限集', iterations=500)
+def bench_permissions(iterations):
+    from django.contrib.auth import get_user_model
+    from django.core.management.base import CommandError
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from users.permission_cache import clear_instance_permissions
+
+    user = (
+        get_user_model().objects
+        .filter(is_superuser=False, is_active=True)
+        .exclude(role='admin')
+        .first()
+    )
+    if user is None:
+        raise CommandError('需要至少一个已激活的非管理员用户')
+
+    perms = ['users.view_student_data', 'users.manage_courses', 'courses.view_course', 'courses.add_course']
+
+    def legacy_has_perm(perm):
+        # 原实现：直接权限、每个组、角色对象各查询一次
+        codename = perm.split('.')[-1]
+        if user.user_permissions.filter(codename=codename).exists():
+            return True
+        for group in user.groups.all():
+            if group.permissions.filter(codename=codename).exists():
+                return True
+        return bool(user.role_obj and user.role_obj.permissions.filter(codename=codename).exists())
+
+    def legacy():
+        for perm in perms:
+            legacy_has_perm(perm)
+
+    def cross_request():
+        # 每个请求使用新的用户对象，权限集从共享缓存读取
+        clear_instance_permissions(user)
+        for perm in perms:
+            user.has_perm(perm)
+
+    def same_request():
+        for perm in perms:
+            user.has_perm(perm)
+
+    def queries_per_call(func):
+        func()
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context) / len(perms)
+
+    return [
+        (f'逐项查询（每次has_perm {queries_per_call(legacy):.1f}次查询）', legacy),
+        (f'跨请求命中权限缓存（每次has_perm {queries_per_call(cross_request):.1f}次查询）', cross_request),
+        (f'同一请求内（每次has_perm {queries_per_call(same_request):.1f}次查询）', same_request),
+    ]
@@ -0,0 +1,108 @@
+import gzip
+import secrets
+import string
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只使用gzip
+    brotli = None
+
+
+class GzipCodec:
+    """
+    gzip压缩
+
+    整体压缩时与Django的GZipMiddleware一样在gzip头中加入随机长度的文件名，
+    使压缩后的长度带有随机性，缓解BREACH攻击
+    """
+
+    encoding = 'gzip'
+
+    def __init__(self, level=5, max_random_bytes=100):
+        self.level = level
+        self.max_random_bytes = max_random_bytes
+
+    def compress(self, data):
+        compressed = gzip.compress(data, compresslevel=self.level, mtime=0)
+        if not self.max_random_bytes:
+            return compressed
+        view = memoryview(compressed)
+        header = bytearray(view[:10])
+        header[3] = gzip.FNAME
+        length = secrets.randbelow(self.max_random_bytes) + 1
+        filename = ''.join(secrets.choice(string.ascii_letters) for _ in range(length)).encode('ascii')
+        return bytes(header) + filename + b'\x00' + view[10:]
+
+    def compressor(self):
+        """返回流式压缩器，提供process(chunk)和finish()"""
+        return _ZlibStream(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+
+class BrotliCodec:
+    """brotli压缩（需要安装brotli），较低的quality下速度与gzip相当而压缩率更高"""
+
+    encoding = 'br'
+
+    def __init__(self, quality=4):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compressor(self):
+        return _BrotliStream(brotli.Compressor(quality=self.quality))
+
+
+class _ZlibStream:
+    def __init__(self, compressobj):
+        self._compressobj = compressobj
+
+    def process(self, chunk):
+        return self._compressobj.compress(chunk)
+
+    def finish(self):
+        return self._compressobj.flush()
+
+
+class _BrotliStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def process(self, chunk):
+        return self._compressor.process(chunk)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def build_codecs(encodings, gzip_level=5, brotli_quality=4):
+    """按服务端优先顺序创建可用的压缩器，未安装的可选编码会被忽略"""
+    codecs = []
+    for encoding in encodings:
+        if encoding == 'gzip':
+            codecs.append(GzipCodec(level=gzip_level))
+        elif encoding == 'br' and brotli is not None:
+            codecs.append(BrotliCodec(quality=brotli_quality))
+    return codecs
+
+
+def parse_accept_encoding(header):
+    """解析Accept-Encoding请求头，返回客户端接受的编码集合（忽略q=0）"""
+    accepted = set()
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+from .models import ContentVersion
+
+
+def bump_versions(*scopes):
+    """
+    更新一组版本范围的版本戳
+
+    版本戳取当前时间（纳秒），既能区分每次修改，也能用作Last-Modified；
+    一条upsert语句完成所有写入，在调用方的事务中执行，随数据修改一起提交。
+    范围按名称排序后写入，并发事务以相同顺序锁定版本行，避免死锁
+    """
+    if not scopes:
+        return
+    now = time.time_ns()
+    ContentVersion.objects.bulk_create(
+        [ContentVersion(scope=scope, version=now) for scope in sorted(set(scopes))],
+        update_conflicts=True,
+        unique_fields=['scope'],
+        update_fields=['version'],
+    )
+
+
+def get_versions(scopes):
+    """
+    获取一组版本范围的版本戳，按scopes顺序返回
+
+    一次查询读取所有范围；从未修改过的范围没有版本行，版本为0
+    （所有进程一致，不会随缓存重启变化，读取时也不写入数据库）
+    """
+    versions = dict(ContentVersion.objects.filter(scope__in=scopes).values_list('scope', 'version'))
+    return [versions.get(scope, 0) for scope in scopes]
+
+
+def build_etag(request, scopes, versions):
+    """根据请求路径、查询参数、当前用户和版本戳生成强ETag"""
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else ''
+    parts = [request.path, request.META.get('QUERY_STRING', ''), str(user_id)]
+    parts.extend(f'{scope}={version}' for scope, version in zip(scopes, versions))
+    return quote_etag(hashlib.md5('\n'.join(parts).encode('utf-8'), usedforsecurity=False).hexdigest())
+
+
+class NotModified(Exception):
+    """条件请求命中时中断视图处理，携带304/412响应"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    条件请求视图集混入类
+
+    子类通过get_version_scopes()声明当前请求依赖的版本范围，
+    GET/HEAD请求在认证和权限检查之后、查询数据库和序列化之前比较If-None-Match/If-Modified-Since，
+    命中时直接返回304；正常响应附带ETag和Last-Modified。
+    """
+
+    def get_version_scopes(self):
+        """返回当前请求依赖的版本范围列表，返回None表示不使用条件请求"""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.content_etag = None
+        self.content_last_modified = None
+        if request.method not in ('GET', 'HEAD') or not getattr(settings, 'CONDITIONAL_GET_ENABLED', True):
+            return
+
+        scopes = self.get_version_scopes()
+        if not scopes:
+            return
+        versions = get_versions(scopes)
+        self.content_etag = build_etag(request, scopes, versions)
+        # 所有范围都未修改过时没有可用的修改时间，只使用ETag
+        self.content_last_modified = max(versions) // 1_000_000_000 or None
+
+        response = get_conditional_response(
+            request,
+            etag=self.content_etag,
+            last_modified=self.content_last_modified,
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'content_etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.content_etag
+            if self.content_last_modified:
+                response['Last-Modified'] = http_date(self.content_last_modified)
+            # 响应与当前用户相关，只允许浏览器缓存，且每次使用前需要重新验证
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,183 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+
+from apps.core.log_sink import get_log_sink_stats
+
+
+def probe_database():
+    """检查数据库连接往返"""
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def probe_cache():
+    """检查共享缓存读写（限流、用户缓存、黑名单过滤器和角色传播依赖该缓存）"""
+    cache = caches[getattr(settings, 'HEALTH_CHECK_CACHE', 'shared')]
+    value = time.time_ns()
+    cache.set('health:probe', value, 30)
+    if cache.get('health:probe') != value:
+        raise RuntimeError('缓存读写结果不一致')
+
+
+def probe_log_sinks():
+    """检查日志管道队列积压，返回各管道的队列深度"""
+    threshold = getattr(settings, 'HEALTH_CHECK_LOG_QUEUE_THRESHOLD', 0.9)
+    depths = {}
+    for name, stats in get_log_sink_stats().items():
+        depths[name] = stats['queue_depth']
+        if stats['queue_depth'] >= stats['max_queue_size'] * threshold:
+            raise RuntimeError(f"日志管道{name}积压: {stats['queue_depth']}/{stats['max_queue_size']}")
+    return depths
+
+
+def probe_token_blacklist():
+    """检查令牌黑名单表是否可以查询（JWT认证依赖该表）"""
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    list(BlacklistedToken.objects.order_by().values_list('pk', flat=True)[:1])
+
+
+# 内置探针：名称 -> 检查函数
+PROBES = {
+    'database': probe_database,
+    'cache': probe_cache,
+    'log_sinks': probe_log_sinks,
+    'token_blacklist': probe_token_blacklist,
+}
+
+
+def register_probe(name, probe):
+    """注册探针，供其他应用在AppConfig.ready中添加检查项或导出统计信息"""
+    PROBES[name] = probe
+
+
+class HealthChecker:
+    """
+    就绪检查
+
+    依次执行各项探针，记录每项的耗时、失败次数和连续失败次数。
+    结果在当前进程中缓存ttl秒，负载均衡器频繁探测时只有缓存过期后的第一个请求会真正执行探针，
+    并发请求等待同一次检查的结果。
+    critical中的探针失败时服务视为未就绪，其余探针失败只标记为degraded。
+    """
+
+    def __init__(self, probes, ttl=5.0, critical=None):
+        self.probes = probes
+        self.ttl = ttl
+        self.critical = set(probes if critical is None else critical)
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = None
+        self.runs = 0
+        self.failures = {name: 0 for name in probes}
+        self.consecutive_failures = {name: 0 for name in probes}
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建检查器"""
+        names = getattr(settings, 'HEALTH_CHECK_PROBES', list(PROBES))
+        return cls(
+            {name: PROBES[name] for name in names if name in PROBES},
+            ttl=getattr(settings, 'HEALTH_CHECK_CACHE_TTL', 5.0),
+            critical=getattr(settings, 'HEALTH_CHECK_CRITICAL', ['database', 'cache', 'token_blacklist']),
+        )
+
+    def check(self, now=None):
+        """返回就绪检查结果，缓存未过期时直接返回缓存"""
+        now = time.monotonic() if now is None else now
+        result = self._cached(now)
+        if result is not None:
+            return result
+        with self._lock:
+            # 等待锁期间其他线程可能已经完成检查
+            result = self._cached(now)
+            if result is None:
+                result = self._run()
+                self._result = result
+                self._checked_at = now
+        return result
+
+    def _cached(self, now):
+        result = self._result
+        if result is not None and now - self._checked_at < self.ttl:
+            return dict(result, cached=True)
+        return None
+
+    def _run(self):
+        """执行全部探针（调用方需持有锁）"""
+        self.runs += 1
+        checks = {}
+        ready = True
+        degraded = False
+        for name, probe in self.probes.items():
+            start = time.perf_counter()
+            try:
+                detail = probe()
+                ok = True
+                error = None
+            except Exception as e:
+                detail = None
+                ok = False
+                error = f'{type(e).__name__}: {e}'
+            latency = time.perf_counter() - start
+
+            if ok:
+                self.consecutive_failures[name] = 0
+            else:
+                self.failures[name] += 1
+                self.consecutive_failures[name] += 1
+                if name in self.critical:
+                    ready = False
+                else:
+                    degraded = True
+
+            checks[name] = {
+                'ok': ok,
+                'latency_ms': round(latency * 1000, 3),
+                'failures': self.failures[name],
+                'consecutive_failures': self.consecutive_failures[name],
+            }
+            if detail is not None:
+                checks[name]['detail'] = detail
+            if error is not None:
+                checks[name]['error'] = error
+
+        if not ready:
+            status = 'unavailable'
+        elif degraded:
+            status = 'degraded'
+        else:
+            status = 'ready'
+        return {
+            'ready': ready,
+            'status': status,
+            'checked_at': time.time(),
+            'cached': False,
+            'checks': checks,
+        }
+
+
+_checker = None
+
+
+def get_health_checker():
+    """获取全局就绪检查器（首次使用时构建）"""
+    global _checker
+    if _checker is None:
+        _checker = HealthChecker.from_settings()
+    return _checker
+
+
+@receiver(setting_changed)
+def _reset_health_checker(setting, **kwargs):
+    """健康检查配置变更时（如测试中的override_settings）重建"""
+    global _checker
+    if setting.startswith('HEALTH_CHECK_'):
+        _checker = None
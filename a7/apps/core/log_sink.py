@@ -0,0 +1,370 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 背压策略
+POLICY_BLOCK = 'block'  # 队列满时阻塞等待（最多block_timeout秒），超时后丢弃
+POLICY_DROP_OLDEST = 'drop_oldest'  # 队列满时丢弃最旧的记录
+POLICY_SAMPLE = 'sample'  # 队列积压超过水位线后按比例采样，满时丢弃新记录
+BACKPRESSURE_POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_SAMPLE)
+
+# 已创建的日志管道，按名称索引，便于健康检查和监控读取统计信息
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+class AsyncLogSink:
+    """
+    异步日志写入管道
+
+    请求线程只负责把预先构建好的记录字典放入有界内存队列，
+    由后台写入线程批量写入磁盘，并定期fsync和按大小轮转文件。
+    - 队列满时按背压策略处理（block / drop_oldest / sample）
+    - 多个worker进程写同一文件时，轮转在文件锁（{filename}.lock）中进行，其他进程发现文件已被轮转后重新打开；
+      没有fcntl的平台（Windows）上多进程部署应设置max_bytes=0，由外部logrotate轮转
+    - 提供入队、写入、丢弃、溢出等计数器
+    """
+
+    def __init__(self, name, filename, formatter=None, max_queue_size=10000,
+                 policy=POLICY_DROP_OLDEST, sample_rate=0.1, sample_watermark=0.5,
+                 block_timeout=1.0, batch_size=500, flush_interval=0.5,
+                 fsync_interval=5.0, max_bytes=0, backup_count=5):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"未知的背压策略: {policy}")
+
+        self.name = name
+        self.filename = os.path.abspath(filename)
+        self.formatter = formatter or logging.Formatter()
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.sample_rate = sample_rate
+        # 采样策略下，队列深度超过该比例后开始采样
+        self.sample_watermark = int(max_queue_size * sample_watermark)
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._stream = None
+        self._last_fsync = time.monotonic()
+
+        # 统计计数器
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.sampled_out = 0
+        self.write_errors = 0
+        self.rotations = 0
+
+    def enqueue(self, record):
+        """
+        将记录放入队列，返回记录是否被接受
+
+        该方法只做内存操作，不会触发磁盘IO
+        """
+        self._ensure_started()
+
+        with self._lock:
+            depth = len(self._queue)
+
+            if self.policy == POLICY_SAMPLE and depth >= self.sample_watermark:
+                # 积压时按比例采样，减少写入压力
+                if random.random() >= self.sample_rate:
+                    self.sampled_out += 1
+                    self.dropped += 1
+                    return False
+
+            if depth >= self.max_queue_size:
+                self.overflows += 1
+                if self.policy == POLICY_DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.policy == POLICY_BLOCK:
+                    # 等待写入线程腾出空间
+                    self._not_full.wait_for(
+                        lambda: len(self._queue) < self.max_queue_size,
+                        timeout=self.block_timeout
+                    )
+                    if len(self._queue) >= self.max_queue_size:
+                        self.dropped += 1
+                        return False
+                else:
+                    self.dropped += 1
+                    return False
+
+            self._queue.append(record)
+            self.enqueued += 1
+            self._not_empty.notify()
+            return True
+
+    def stats(self):
+        """返回管道统计信息"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'policy': self.policy,
+                'queue_depth': len(self._queue),
+                'max_queue_size': self.max_queue_size,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'overflows': self.overflows,
+                'sampled_out': self.sampled_out,
+                'write_errors': self.write_errors,
+                'rotations': self.rotations,
+            }
+
+    def close(self, timeout=5.0):
+        """停止写入线程，并将队列中剩余的记录写入磁盘"""
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        # 写入线程未运行时（如从未启动），在当前线程中完成剩余写入
+        if thread is None or not thread.is_alive():
+            self._drain()
+            self._close_stream()
+
+    def _ensure_started(self):
+        """按需启动写入线程；检测到fork后在子进程中重新启动"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid is not None and self._pid != pid:
+                # fork后继承的队列和文件句柄属于父进程，不能继续使用
+                self._queue.clear()
+                self._stream = None
+            self._pid = pid
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'log-sink-{self.name}',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """写入线程主循环"""
+        while True:
+            with self._lock:
+                if not self._queue and not self._stopping:
+                    self._not_empty.wait(self.flush_interval)
+                batch = self._take_batch()
+                stopping = self._stopping
+
+            if batch:
+                self._write_batch(batch)
+            elif stopping:
+                break
+            else:
+                # 空闲时也检查是否需要fsync
+                self._maybe_fsync()
+
+        self._close_stream()
+
+    def _take_batch(self):
+        """从队列中取出一批记录（调用方需持有锁）"""
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        if batch:
+            self._not_full.notify_all()
+        return batch
+
+    def _drain(self):
+        """同步写入队列中剩余的全部记录"""
+        while True:
+            with self._lock:
+                batch = self._take_batch()
+            if not batch:
+                break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """将一批记录写入磁盘"""
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(logging.makeLogRecord(record)))
+            except Exception:
+                self.write_errors += 1
+        if not lines:
+            return
+
+        try:
+            stream = self._open_stream()
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
+            self.written += len(lines)
+            self._maybe_fsync()
+            self._maybe_rotate()
+        except OSError:
+            self.write_errors += 1
+            self._close_stream()
+
+    def _open_stream(self):
+        if self._stream is None:
+            self._stream = open(self.filename, 'a', encoding='utf-8')
+        return self._stream
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.flush()
+                os.fsync(self._stream.fileno())
+                self._stream.close()
+            except (OSError, ValueError):
+                pass
+            self._stream = None
+
+    def _maybe_fsync(self):
+        """按fsync_interval周期将数据刷到磁盘"""
+        if self._stream is None or self.fsync_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            try:
+                os.fsync(self._stream.fileno())
+            except OSError:
+                self.write_errors += 1
+            self._last_fsync = now
+
+    def _maybe_rotate(self):
+        """文件超过max_bytes时轮转，保留backup_count个备份"""
+        if not self.max_bytes or self._stream is None:
+            return
+        if self._stream.tell() < self.max_bytes:
+            if self._rotated_elsewhere():
+                # 其他进程已经轮转了文件，下次写入时重新打开
+                self._close_stream()
+            return
+
+        self._close_stream()
+        with self._rotation_lock():
+            # 加锁后按文件当前的大小重新判断，其他进程可能已经完成轮转
+            try:
+                if os.path.getsize(self.filename) < self.max_bytes:
+                    return
+            except OSError:
+                return
+            if self.backup_count > 0:
+                for i in range(self.backup_count - 1, 0, -1):
+                    source = f'{self.filename}.{i}'
+                    if os.path.exists(source):
+                        os.replace(source, f'{self.filename}.{i + 1}')
+                os.replace(self.filename, f'{self.filename}.1')
+            else:
+                # 不保留备份时直接截断
+                open(self.filename, 'w').close()
+        self.rotations += 1
+
+    def _rotated_elsewhere(self):
+        """打开的文件已不是filename（被其他进程轮转）"""
+        try:
+            return os.stat(self.filename).st_ino != os.fstat(self._stream.fileno()).st_ino
+        except OSError:
+            return True
+
+    @contextmanager
+    def _rotation_lock(self):
+        """多个进程之间互斥的轮转锁"""
+        if fcntl is None:
+            yield
+            return
+        with open(f'{self.filename}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class QueuedFileHandler(logging.Handler):
+    """
+    基于AsyncLogSink的日志处理器，用于替换logging.FileHandler
+
+    emit只在请求线程中构建记录字典并入队，格式化和磁盘写入由后台线程完成
+    """
+
+    def __init__(self, filename, level=logging.NOTSET, **sink_options):
+        super().__init__(level)
+        self.sink = AsyncLogSink(
+            name=os.path.basename(filename),
+            filename=filename,
+            **sink_options
+        )
+        register_log_sink(self.sink)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.sink.formatter = fmt
+
+    def emit(self, record):
+        try:
+            self.sink.enqueue(self._build_record(record))
+        except Exception:
+            self.handleError(record)
+
+    def _build_record(self, record):
+        """构建可跨线程传递的记录字典"""
+        data = dict(record.__dict__)
+        # 在请求线程中完成消息拼接，避免参数对象在写入前被修改
+        data['msg'] = record.getMessage()
+        data['args'] = None
+        if record.exc_info:
+            data['exc_text'] = logging.Formatter().formatException(record.exc_info)
+            data['exc_info'] = None
+        return data
+
+    def close(self):
+        self.sink.close()
+        super().close()
+
+
+def register_log_sink(sink):
+    """注册日志管道"""
+    with _sinks_lock:
+        _sinks[sink.name] = sink
+
+
+def get_log_sinks():
+    """获取所有已注册的日志管道"""
+    with _sinks_lock:
+        return dict(_sinks)
+
+
+def get_log_sink_stats():
+    """获取所有日志管道的统计信息"""
+    return {name: sink.stats() for name, sink in get_log_sinks().items()}
+
+
+@atexit.register
+def _close_all_sinks():
+    """进程退出前写完所有队列中的日志"""
+    for sink in get_log_sinks().values():
+        sink.close()
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmarks import BENCHMARKS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = '运行性能基准测试，比较优化前后的单次耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='要运行的基准测试名称，默认运行全部',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=None,
+            help='每个场景的迭代次数（默认使用各基准测试自己的设置）',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='列出所有可用的基准测试',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, (description, _, _) in BENCHMARKS.items():
+                self.stdout.write(f'{name}: {description}')
+            return
+
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"未知的基准测试: {', '.join(unknown)}")
+
+        iterations = options['iterations']
+        for name in names:
+            description, _, _ = BENCHMARKS[name]
+            self.stdout.write(self.style.NOTICE(f'\n[{name}] {description}'))
+            results = run_benchmark(name, iterations)
+            baseline = results[0][1]
+            for label, micros in results:
+                ratio = baseline / micros if micros else 0
+                self.stdout.write(f'  - {label}: {micros:.2f} 微秒/次 (x{ratio:.2f})')
@@ -0,0 +1,82 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import InterfaceError, OperationalError
+
+from apps.core.usage import append_usage_entries, rejected_file, write_usage_entries
+
+
+class Command(BaseCommand):
+    help = '将数据库不可用时转存到本地文件的使用统计重新写入数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            dest='file',
+            default=None,
+            help='转存文件路径（默认使用USAGE_SPILL_FILE）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批写入的记录数（默认1000）',
+        )
+
+    def handle(self, *args, **options):
+        spill_file = options['file'] or getattr(settings, 'USAGE_SPILL_FILE', None)
+        if not spill_file:
+            raise CommandError('未指定转存文件，请使用--file或配置USAGE_SPILL_FILE')
+
+        # 先将文件改名，重放期间产生的新转存记录写入新文件，互不影响
+        replay_file = f'{spill_file}.replaying'
+        if not os.path.exists(replay_file):
+            if not os.path.exists(spill_file):
+                self.stdout.write(self.style.SUCCESS('没有需要重放的记录'))
+                return
+            os.replace(spill_file, replay_file)
+
+        with open(replay_file, encoding='utf-8') as f:
+            entries = []
+            invalid = 0
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    invalid += 1
+
+        batch_size = options['batch_size']
+        replayed = 0
+        rejected = 0
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            try:
+                written, rejected_entries = write_usage_entries(batch)
+            except (OperationalError, InterfaceError) as e:
+                # 把尚未写入的记录放回待重放文件，下次从这里继续
+                remaining = entries[start:]
+                with open(replay_file, 'w', encoding='utf-8') as f:
+                    for entry in remaining:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                raise CommandError(
+                    f'写入数据库失败，已重放{replayed}条，剩余{len(remaining)}条保存在{replay_file}: {str(e)}'
+                )
+            replayed += written
+            if rejected_entries:
+                # 违反约束的记录重放多少次都无法写入，移到隔离文件，不阻塞后续记录
+                append_usage_entries(rejected_file(spill_file), rejected_entries)
+                rejected += len(rejected_entries)
+
+        os.remove(replay_file)
+        self.stdout.write(self.style.SUCCESS(f'√ 已重放{replayed}条使用统计'))
+        if invalid:
+            self.stdout.write(self.style.WARNING(f'跳过{invalid}条无法解析的记录'))
+        if rejected:
+            self.stdout.write(self.style.WARNING(
+                f'{rejected}条记录违反数据库约束，已移到{rejected_file(spill_file)}'
+            ))
@@ -0,0 +1,179 @@
+import json
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.background import PeriodicWorker
+
+
+class LatencyHistogram:
+    """
+    HDR风格的延迟直方图
+
+    以微秒为单位记录数值，按对数-线性方式分桶：
+    每个2的幂区间内再细分为2^(precision_bits-1)个子桶，相对误差不超过2^-(precision_bits-1)。
+    只保存非空桶的计数，内存占用与数值分布的跨度相关，而与样本数无关。
+    """
+
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        """记录一个数值（微秒）"""
+        value = max(int(value), 0)
+        shift = max(value.bit_length() - self.precision_bits, 0)
+        bucket = (value >> shift) << shift
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """返回指定百分位的数值（取所在桶的上界，且不超过最大值）"""
+        if not self.count:
+            return 0
+        threshold = self.count * percent / 100.0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= threshold:
+                shift = max(bucket.bit_length() - self.precision_bits, 0)
+                return min(bucket + (1 << shift) - 1, self.max)
+        return self.max
+
+    def summary(self, scale=1000.0):
+        """返回统计摘要，数值除以scale（默认由微秒换算为毫秒）"""
+        return {
+            'count': self.count,
+            'min': round((self.min or 0) / scale, 3),
+            'mean': round(self.total / self.count / scale, 3) if self.count else 0,
+            'p50': round(self.percentile(50) / scale, 3),
+            'p90': round(self.percentile(90) / scale, 3),
+            'p99': round(self.percentile(99) / scale, 3),
+            'max': round(self.max / scale, 3),
+        }
+
+
+def get_route_name(request):
+    """
+    获取请求对应的路由名称，用作聚合维度
+
+    使用解析后的视图名称而不是原始路径，避免路径参数导致维度爆炸；
+    未匹配到路由的请求（如404）统一归为unresolved
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} unresolved'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class RouteMetricAggregator:
+    """
+    进程内按路由聚合的指标
+
+    按（路由, 状态码类别, 指标类型）维护直方图，由后台任务周期性地把每个窗口的汇总结果
+    通过bulk_create写入PerformanceMetric，每个路由每个窗口一行，避免逐请求写库。
+    直方图中记录的是整数，写入时除以scale换算为unit单位。
+    """
+
+    def __init__(self, name, flush_interval=60, unit='ms', scale=1000.0):
+        self.unit = unit
+        self.scale = scale
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._window_start = timezone.now()
+        self.worker = PeriodicWorker(name, flush_interval, self.flush)
+
+    def add(self, request, status_code, metric_type, value):
+        """记录一个数值"""
+        key = (get_route_name(request), f'{status_code // 100}xx', metric_type)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(value)
+        self.worker.start()
+
+    def snapshot(self):
+        """取出当前窗口的直方图并开始新窗口"""
+        with self._lock:
+            histograms = self._histograms
+            window_start = self._window_start
+            self._histograms = {}
+            self._window_start = timezone.now()
+        return window_start, self._window_start, histograms
+
+    def build_metrics(self, window_start, window_end, histograms):
+        """把窗口内的直方图转换为PerformanceMetric对象"""
+        from apps.core.models import PerformanceMetric
+
+        metrics = []
+        for (route, status_class, metric_type), histogram in histograms.items():
+            summary = histogram.summary(self.scale)
+            summary.update({
+                'route': route,
+                'status_class': status_class,
+                'window_start': window_start.isoformat(),
+                'window_end': window_end.isoformat(),
+            })
+            metrics.append(PerformanceMetric(
+                metric_type=metric_type,
+                # 指标值取窗口内的p99，完整分布见context
+                value=summary['p99'],
+                unit=self.unit,
+                related_entity=f'{route} {status_class}'[:100],
+                context=json.dumps(summary, ensure_ascii=False),
+            ))
+        return metrics
+
+    def flush(self):
+        """将当前窗口的汇总结果写入数据库，返回写入的行数"""
+        from apps.core.models import PerformanceMetric
+
+        window_start, window_end, histograms = self.snapshot()
+        if not histograms:
+            return 0
+        metrics = self.build_metrics(window_start, window_end, histograms)
+        PerformanceMetric.objects.bulk_create(metrics)
+        return len(metrics)
+
+
+class LatencyAggregator(RouteMetricAggregator):
+    """
+    进程内延迟聚合器
+
+    以微秒精度记录请求耗时，按毫秒写入PerformanceMetric
+    """
+
+    def __init__(self, flush_interval=60):
+        super().__init__('latency-metrics', flush_interval, unit='ms', scale=1000.0)
+
+    def record(self, request, status_code, duration):
+        """记录一次请求的耗时（秒）"""
+        self.add(request, status_code, self._metric_type(request), duration * 1_000_000)
+
+    def _metric_type(self, request):
+        route_info = getattr(request, 'route_info', None)
+        return 'api_latency' if route_info is not None and route_info.is_api else 'response_time'
+
+
+latency_aggregator = LatencyAggregator(
+    flush_interval=getattr(settings, 'LATENCY_METRICS_FLUSH_INTERVAL', 60)
+)
+
+# 每个请求的SQL查询次数
+query_aggregator = RouteMetricAggregator(
+    'query-metrics',
+    flush_interval=getattr(settings, 'LATENCY_METRICS_FLUSH_INTERVAL', 60),
+    unit='queries',
+    scale=1,
+)
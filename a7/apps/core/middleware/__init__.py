@@ -1,4 +1,31 @@
+from .compression_middleware import CompressionMiddleware
+from .load_shedding_middleware import LoadSheddingMiddleware
+from .query_tracking_middleware import QueryTrackingMiddleware
+from .rate_limit_middleware import RateLimitMiddleware
 from .request_logging_middleware import RequestLoggingMiddleware
 from .request_processor_middleware import RequestProcessorMiddleware
+from .route_dispatch_middleware import RouteDispatchMiddleware
+from .server_timing_middleware import ServerTimingMiddleware
+from .stateful_middleware import (
+    StatefulAuthenticationMiddleware,
+    StatefulCsrfViewMiddleware,
+    StatefulMessageMiddleware,
+    StatefulSessionMiddleware,
+    StatefulXFrameOptionsMiddleware,
+)
 
-__all__ = ['RequestLoggingMiddleware', 'RequestProcessorMiddleware'] 
\ No newline at end of file
+__all__ = [
+    'CompressionMiddleware',
+    'LoadSheddingMiddleware',
+    'QueryTrackingMiddleware',
+    'RateLimitMiddleware',
+    'RequestLoggingMiddleware',
+    'RequestProcessorMiddleware',
+    'RouteDispatchMiddleware',
+    'ServerTimingMiddleware',
+    'StatefulAuthenticationMiddleware',
+    'StatefulCsrfViewMiddleware',
+    'StatefulMessageMiddleware',
+    'StatefulSessionMiddleware',
+    'StatefulXFrameOptionsMiddleware',
+] 
\ No newline at end of file
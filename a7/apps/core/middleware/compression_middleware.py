@@ -0,0 +1,141 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from apps.core.compression import build_codecs, parse_accept_encoding
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+
+    根据Accept-Encoding协商压缩编码（服务端优先顺序见COMPRESSION_ENCODINGS），
+    只压缩超过COMPRESSION_MIN_SIZE的响应，跳过图片、压缩包等已压缩的内容类型，支持流式响应。
+    需放在RequestProcessorMiddleware之前（外层），压缩其添加响应头和标准化格式后的最终内容；
+    压缩率和CPU耗时保存在request.compression中，供RequestLoggingMiddleware写入日志。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # 异步模式下超过该大小的响应在线程池中压缩，避免阻塞事件循环
+    offload_size = 256 * 1024
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 是否开启压缩
+        self.enabled = getattr(settings, 'COMPRESSION_ENABLED', True)
+        # 最小压缩大小（字节）
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        # 不压缩的内容类型（前缀匹配）
+        self.exclude_types = tuple(getattr(settings, 'COMPRESSION_EXCLUDE_TYPES', [
+            'image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'application/pdf',
+        ]))
+        self.codecs = build_codecs(
+            getattr(settings, 'COMPRESSION_ENCODINGS', ['br', 'gzip']),
+            gzip_level=getattr(settings, 'COMPRESSION_GZIP_LEVEL', 5),
+            brotli_quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4),
+        )
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        response = await self.get_response(request)
+        if not response.streaming and len(response.content) > self.offload_size:
+            return await sync_to_async(self.process_response, thread_sensitive=False)(request, response)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        """压缩响应"""
+        if not self.enabled or not self.codecs:
+            return response
+        # 已经编码过的响应不再压缩
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type.startswith(self.exclude_types):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codec = self.negotiate(request)
+        if codec is None:
+            return response
+
+        if response.streaming:
+            self._compress_stream(response, codec)
+            request.compression = {'encoding': codec.encoding, 'streaming': True}
+        else:
+            original = response.content
+            cpu_start = time.thread_time()
+            compressed = codec.compress(original)
+            cpu_time = time.thread_time() - cpu_start
+            # 压缩后没有变小则返回原始内容
+            if len(compressed) >= len(original):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+            request.compression = {
+                'encoding': codec.encoding,
+                'original': len(original),
+                'compressed': len(compressed),
+                'ratio': round(len(original) / len(compressed), 2),
+                'cpu_ms': round(cpu_time * 1000, 3),
+            }
+
+        # 内容编码改变了表示形式，强ETag需要改为弱ETag（仍可用于If-None-Match比较）
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.encoding
+        return response
+
+    def negotiate(self, request):
+        """按服务端优先顺序选择客户端接受的编码"""
+        accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not accepted:
+            return None
+        for codec in self.codecs:
+            if codec.encoding in accepted or '*' in accepted:
+                return codec
+        return None
+
+    def _compress_stream(self, response, codec):
+        """包装流式响应的内容迭代器"""
+        if response.is_async:
+            original_iterator = response.streaming_content
+
+            async def compressed_stream():
+                compressor = codec.compressor()
+                async for chunk in original_iterator:
+                    data = compressor.process(chunk)
+                    if data:
+                        yield data
+                yield compressor.finish()
+        else:
+            original_iterator = response.streaming_content
+
+            def compressed_stream():
+                compressor = codec.compressor()
+                for chunk in original_iterator:
+                    data = compressor.process(chunk)
+                    if data:
+                        yield data
+                yield compressor.finish()
+
+        response.streaming_content = compressed_stream()
+        # 流式响应压缩后的长度未知
+        if response.has_header('Content-Length'):
+            del response.headers['Content-Length']
@@ -0,0 +1,86 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from apps.core.ratelimit import get_load_shedder
+
+# 创建限流日志记录器
+logger = logging.getLogger('ratelimit')
+
+
+class LoadSheddingMiddleware:
+    """
+    负载保护中间件
+
+    所有worker进程正在处理的请求数超过LOAD_SHEDDING_LIMITS中对应优先级的阈值时返回503，
+    低优先级路由先被拒绝。放在CorsMiddleware之后、会话和认证等中间件之前，
+    被拒绝的请求不加载会话、不认证，返回的503仍带CORS响应头。
+    LOAD_SHEDDING_EXEMPT_PATHS中的路径（如健康检查）直接放行，不计数也不访问共享缓存。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 是否开启负载保护
+        self.enabled = getattr(settings, 'LOAD_SHEDDING_ENABLED', True)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if not self.enabled:
+            return self.get_response(request)
+
+        shedder = get_load_shedder()
+        if shedder.is_exempt(request):
+            return self.get_response(request)
+        if not shedder.acquire(request):
+            return self.overloaded_response(request, shedder)
+        try:
+            return self.get_response(request)
+        finally:
+            shedder.release()
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if not self.enabled:
+            return await self.get_response(request)
+
+        shedder = get_load_shedder()
+        if shedder.is_exempt(request):
+            return await self.get_response(request)
+        # 事件循环中只读写进程内计数，需要同步时才在线程池中访问共享缓存（DatabaseCache不能在事件循环中使用）
+        if shedder.sync_due():
+            await sync_to_async(shedder.maybe_sync)()
+        if not shedder.acquire(request, sync=False):
+            return self.overloaded_response(request, shedder)
+        try:
+            return await self.get_response(request)
+        finally:
+            shedder.release(sync=False)
+            if shedder.sync_due():
+                await sync_to_async(shedder.maybe_sync)()
+
+    def overloaded_response(self, request, shedder):
+        """负载过高时的响应"""
+        logger.warning(
+            f"负载保护拒绝请求: 优先级={shedder.priority_for(request)}, "
+            f"处理中请求数={shedder.total_in_flight()}, "
+            f"方法={request.method}, "
+            f"路径={request.path}"
+        )
+        response = JsonResponse({
+            'error': True,
+            'status_code': 503,
+            'message': '服务繁忙，请稍后再试',
+            'detail': '服务器当前负载过高，已暂时拒绝低优先级请求'
+        }, status=503)
+        response['Retry-After'] = '1'
+        return response
@@ -0,0 +1,80 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from apps.core.metrics import get_route_name, query_aggregator
+from apps.core.queries import QueryTracker, activate_tracker, deactivate_tracker
+
+# 创建查询统计日志记录器
+logger = logging.getLogger('query_log')
+
+
+class QueryTrackingMiddleware:
+    """
+    SQL查询统计中间件
+
+    统计每个请求的查询次数、数据库耗时和重复执行的查询形状
+    - 同一形状的查询执行次数达到N_PLUS_ONE_THRESHOLD时按N+1查询记录警告
+    - 统计结果保存在request.query_tracker中，供RequestLoggingMiddleware写入日志
+    - 查询次数按路由汇总，定期写入PerformanceMetric（db_queries）
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 是否开启查询统计
+        self.enabled = getattr(settings, 'QUERY_TRACKING_ENABLED', True)
+        # 同一形状的查询执行多少次视为N+1
+        self.threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        # 是否汇总查询次数到PerformanceMetric
+        self.record_metrics = getattr(settings, 'LATENCY_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if not self.enabled:
+            return self.get_response(request)
+
+        tracker = request.query_tracker = QueryTracker()
+        token = activate_tracker(tracker)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate_tracker(token)
+        self._report(request, response, tracker)
+        return response
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if not self.enabled:
+            return await self.get_response(request)
+
+        tracker = request.query_tracker = QueryTracker()
+        # 上下文变量会随sync_to_async传递到线程池中执行的同步代码
+        token = activate_tracker(tracker)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate_tracker(token)
+        self._report(request, response, tracker)
+        return response
+
+    def _report(self, request, response, tracker):
+        """记录N+1警告并汇总查询次数"""
+        for sql, count in tracker.repeated(self.threshold):
+            logger.warning(
+                f"疑似N+1查询: 路由={get_route_name(request)}, "
+                f"重复次数={count}, "
+                f"总查询数={tracker.count}, "
+                f"SQL={sql[:500]}"
+            )
+
+        if self.record_metrics:
+            query_aggregator.add(request, response.status_code, 'db_queries', tracker.count)
@@ -0,0 +1,66 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from apps.core.ratelimit import get_rate_limiter
+
+# 创建限流日志记录器
+logger = logging.getLogger('ratelimit')
+
+
+class RateLimitMiddleware:
+    """
+    限流中间件
+
+    按RATELIMIT_RULES中配置的规则，以用户、IP或路由为维度进行滑动窗口限流，
+    超过限制时返回429。需放在JWTAuthMiddleware之后，以便按用户限流。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 是否开启限流
+        self.enabled = getattr(settings, 'RATELIMIT_ENABLED', True)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if self.enabled:
+            result = get_rate_limiter().check(request)
+            if not result.allowed:
+                return self.rate_limited_response(request, result)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if self.enabled:
+            # 共享缓存后端的读写可能涉及网络IO，在线程池中执行
+            result = await sync_to_async(get_rate_limiter().check)(request)
+            if not result.allowed:
+                return self.rate_limited_response(request, result)
+        return await self.get_response(request)
+
+    def rate_limited_response(self, request, result):
+        """超过限流时的响应"""
+        logger.warning(
+            f"请求被限流: 规则={result.rule}, "
+            f"方法={request.method}, "
+            f"路径={request.path}, "
+            f"IP={request.META.get('REMOTE_ADDR', 'unknown')}"
+        )
+        response = JsonResponse({
+            'error': True,
+            'status_code': 429,
+            'message': '请求过于频繁，请稍后再试',
+            'detail': f'超过限流规则 {result.rule}（{result.limit}次），请在{result.retry_after}秒后重试'
+        }, status=429)
+        response['Retry-After'] = str(result.retry_after)
+        return response
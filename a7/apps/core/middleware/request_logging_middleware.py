@@ -1,9 +1,16 @@
 import logging
 import time
 import json
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import empty
+
+from apps.core.metrics import latency_aggregator
+from apps.core.request_body import get_json_body
+from apps.core.routing import get_route_info
+from apps.core.sampling import LogSampler
 
 # 创建请求日志记录器
 logger = logging.getLogger('request_log')
@@ -15,54 +22,111 @@ class RequestLoggingMiddleware:
     记录请求的详细信息，包括URL、方法、头部、内容等
     记录响应时间和状态码等性能指标
     可用于性能监控和问题排查
+    
+    同时支持同步（WSGI）和异步（ASGI）调用，异步模式下不会额外切换线程：
+    文件日志通过异步日志管道写入，延迟统计只做内存聚合
+    
+    请求结束后由LogSampler决定是否保留日志（错误、慢请求、调试请求总是保留），
+    不保留的请求不会构建请求头和日志数据
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
         # 日志级别：可在settings中配置，默认为INFO
         self.log_level = getattr(settings, 'REQUEST_LOG_LEVEL', 'INFO')
         # 是否记录请求体：可在settings中配置，默认为False（避免记录敏感信息）
         self.log_request_body = getattr(settings, 'LOG_REQUEST_BODY', False)
         # 最大记录长度：防止过大的请求/响应导致日志过大
         self.max_body_length = getattr(settings, 'MAX_BODY_LOG_LENGTH', 1000)
-        # 要排除的路径：不记录日志的URL路径
-        self.excluded_paths = getattr(settings, 'REQUEST_LOG_EXCLUDE_PATHS', [
-            '/admin/jsi18n/',
-            '/static/',
-            '/media/',
-            '/health-check/',
-        ])
+        # 要排除的路径（REQUEST_LOG_EXCLUDE_PATHS）由共享的路由分类器处理
+        # 是否将响应时间汇总到进程内直方图，定期写入PerformanceMetric
+        self.record_latency = getattr(settings, 'LATENCY_METRICS_ENABLED', True)
+        # 尾部采样策略
+        self.sampler = LogSampler.from_settings()
         
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
         # 检查路径是否被排除
-        if self._should_log_url(request.path):
-            # 记录请求开始
-            start_time = time.time()
-            request_time = timezone.now()
-            
-            # 获取请求信息
-            request_data = self._get_request_data(request)
-            
-            # 执行请求
-            response = self.get_response(request)
-            
-            # 计算处理时间
-            duration = time.time() - start_time
-            
-            # 记录响应信息
-            response_data = self._get_response_data(response, duration)
-            
-            # 记录日志
-            self._log_request(request, request_data, response_data, request_time, duration)
-            
-            return response
-        else:
+        if not get_route_info(request).should_log:
             # 如果路径被排除，不记录日志
             return self.get_response(request)
+        
+        context = self._start(request)
+        response = self.get_response(request)
+        self._finish(request, response, context)
+        return response
     
-    def _should_log_url(self, url):
-        """检查URL是否应该被记录"""
-        return not any(url.startswith(path) for path in self.excluded_paths)
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if not get_route_info(request).should_log:
+            return await self.get_response(request)
+        
+        context = self._start(request)
+        response = await self.get_response(request)
+        self._finish(request, response, context)
+        return response
+    
+    def _start(self, request):
+        """请求开始：记录开始时间"""
+        start_time = time.time()
+        request_time = timezone.now()
+        if self.log_request_body:
+            # 视图可能以流的方式读取请求体，提前缓存以便结束时记录
+            request.body
+        return start_time, request_time
+    
+    def _finish(self, request, response, context):
+        """请求结束：计算耗时，按采样策略记录日志"""
+        start_time, request_time = context
+        
+        # 计算处理时间
+        duration = time.time() - start_time
+        
+        # 记录延迟分布（只做内存聚合，不写数据库），不受日志采样影响
+        if self.record_latency:
+            latency_aggregator.record(request, response.status_code, duration)
+        
+        # 当前日志级别不会输出的请求，以及未被采样保留的请求，不再构建日志数据
+        if not self._should_log_status(response.status_code):
+            return
+        sample_reason = self.sampler.keep_reason(request, response.status_code, duration)
+        if sample_reason is None:
+            return
+        
+        request_data = self._get_request_data(request)
+        # 视图执行后再获取用户信息，此时JWT/DRF认证已经完成
+        request_data.update(self._get_user_data(request))
+        
+        # 记录响应信息
+        response_data = self._get_response_data(response, duration)
+        response_data['sample'] = sample_reason
+        
+        # 记录SQL查询统计
+        tracker = getattr(request, 'query_tracker', None)
+        if tracker is not None:
+            response_data['queries'] = tracker.as_dict()
+        
+        # 记录响应压缩信息
+        compression = getattr(request, 'compression', None)
+        if compression is not None:
+            response_data['compression'] = compression
+        
+        # 开启Server-Timing时记录各阶段耗时
+        timer = getattr(request, 'server_timing', None)
+        if timer is not None:
+            response_data['timings'] = timer.as_dict()
+            response_data['timing_summary'] = timer.summary()
+        
+        # 记录日志
+        self._log_request(request, request_data, response_data, request_time, duration)
     
     def _get_request_data(self, request):
         """获取请求信息"""
@@ -77,13 +141,15 @@ class RequestLoggingMiddleware:
         # 如果配置了记录请求体且请求体不为空
         if self.log_request_body and request.body:
             try:
-                # 尝试解析JSON请求体
-                body = json.loads(request.body.decode('utf-8'))
-                # 敏感字段处理（如密码）
-                if 'password' in body:
-                    body['password'] = '******'
-                if 'token' in body:
-                    body['token'] = '******'
+                # 读取共享的JSON请求体缓存，避免重复解析
+                body = get_json_body(request)
+                # 敏感字段处理（如密码），复制后再修改，不影响后续中间件和视图使用的数据
+                if isinstance(body, dict) and ('password' in body or 'token' in body):
+                    body = dict(body)
+                    if 'password' in body:
+                        body['password'] = '******'
+                    if 'token' in body:
+                        body['token'] = '******'
                 
                 # 限制长度
                 body_str = json.dumps(body)
@@ -95,12 +161,22 @@ class RequestLoggingMiddleware:
                 # 非JSON请求体，记录长度信息
                 data['body'] = f'[非JSON内容，长度: {len(request.body)}字节]'
         
-        # 添加用户信息（如果已认证）
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            data['user'] = request.user.username
-            if hasattr(request.user, 'role'):
-                data['role'] = request.user.role
-        
+        return data
+    
+    def _get_user_data(self, request):
+        """获取用户信息（如果已认证）"""
+        user = getattr(request, 'user', None)
+        if user is None:
+            return {}
+        # 会话中间件提供的惰性用户对象如果还未加载，不为日志单独查询数据库
+        # （异步模式下在事件循环中查询数据库也是不允许的）
+        if getattr(user, '_wrapped', None) is empty:
+            return {}
+        if not user.is_authenticated:
+            return {}
+        data = {'user': user.username}
+        if hasattr(user, 'role'):
+            data['role'] = user.role
         return data
     
     def _get_response_data(self, response, duration):
@@ -117,6 +193,16 @@ class RequestLoggingMiddleware:
         
         return data
     
+    def _should_log_status(self, status_code):
+        """当前日志级别是否会输出该状态码的请求"""
+        if self.log_level in ('DEBUG', 'INFO'):
+            return True
+        if self.log_level == 'WARNING':
+            return status_code >= 400
+        if self.log_level == 'ERROR':
+            return status_code >= 500
+        return False
+    
     def _log_request(self, request, request_data, response_data, request_time, duration):
         """记录请求和响应信息"""
         # 成功响应（2xx）详细级别记录为INFO，其他为WARNING
@@ -127,6 +213,16 @@ class RequestLoggingMiddleware:
             f"[{request_data['method']}] {request_data['path']} - {response_data['status_code']} "
             f"({response_data['duration']})"
         )
+        if 'queries' in response_data:
+            message += f" 查询={response_data['queries']['count']}次/{response_data['queries']['time']}ms"
+        compression = response_data.get('compression')
+        if compression and 'ratio' in compression:
+            message += (
+                f" 压缩={compression['encoding']} {compression['original']}→{compression['compressed']}字节"
+                f"/{compression['cpu_ms']}ms"
+            )
+        if response_data.get('timing_summary'):
+            message += f" [{response_data['timing_summary']}]"
         
         # 构建详细日志数据
         log_data = {
@@ -1,9 +1,12 @@
-import json
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
-from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
+from apps.core.renderers import build_error_envelope, build_success_envelope
+from apps.core.request_body import get_json_body
+from apps.core.routing import get_route_info
+
 # 创建处理中间件日志记录器
 logger = logging.getLogger('request_processor')
 
@@ -15,26 +18,32 @@ class RequestProcessorMiddleware:
     - JSON请求内容验证和转换
     - 为响应添加标准化头部
     - 为API返回标准化的响应格式
+    
+    同时支持同步（WSGI）和异步（ASGI）调用，前后处理都只操作内存中的数据
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
         # 最大请求大小（默认10MB）
         self.max_request_size = getattr(settings, 'MAX_REQUEST_SIZE', 10 * 1024 * 1024)
         # 是否标准化响应
         self.standardize_response = getattr(settings, 'STANDARDIZE_API_RESPONSE', False)
         # 额外响应头
         self.extra_headers = getattr(settings, 'API_EXTRA_HEADERS', {})
-        # 排除路径
-        self.excluded_paths = getattr(settings, 'PROCESSOR_EXCLUDE_PATHS', [
-            '/admin/',
-            '/static/',
-            '/media/',
-        ])
+        # 排除路径（PROCESSOR_EXCLUDE_PATHS）由共享的路由分类器处理
     
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
         # 检查是否排除处理
-        if self._should_process_url(request.path):
+        if get_route_info(request).should_process:
             # 前处理：检查请求
             processed_request = self._process_request(request)
             if isinstance(processed_request, JsonResponse):
@@ -51,9 +60,18 @@ class RequestProcessorMiddleware:
             # 如果路径被排除，不进行处理
             return self.get_response(request)
     
-    def _should_process_url(self, url):
-        """检查URL是否应该被处理"""
-        return not any(url.startswith(path) for path in self.excluded_paths)
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if not get_route_info(request).should_process:
+            return await self.get_response(request)
+        
+        # ASGI请求体在进入中间件前已读入内存，前处理不会阻塞事件循环
+        processed_request = self._process_request(request)
+        if isinstance(processed_request, JsonResponse):
+            return processed_request
+        
+        response = await self.get_response(request)
+        return self._process_response(request, response)
     
     def _process_request(self, request):
         """处理请求内容"""
@@ -67,24 +85,24 @@ class RequestProcessorMiddleware:
                 'detail': f'最大允许大小: {self.max_request_size/1024/1024}MB'
             }, status=413)
         
-        # 如果是JSON内容类型，尝试解析JSON
+        # 如果是JSON内容类型，尝试解析JSON（结果由请求体缓存共享，DRF解析器直接复用）
         if request.content_type == 'application/json' and request.body:
             try:
-                json_data = json.loads(request.body.decode('utf-8'))
+                json_data = get_json_body(request)
                 # 将解析后的JSON数据保存到request属性中，方便后续使用
                 request.json_data = json_data
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON解析错误: {str(e)}")
+            except UnicodeDecodeError as e:
+                logger.warning(f"编码错误: {str(e)}")
                 return JsonResponse({
                     'error': True,
-                    'message': 'JSON格式错误',
+                    'message': '请求编码错误',
                     'detail': str(e)
                 }, status=400)
-            except UnicodeDecodeError as e:
-                logger.warning(f"编码错误: {str(e)}")
+            except ValueError as e:
+                logger.warning(f"JSON解析错误: {str(e)}")
                 return JsonResponse({
                     'error': True,
-                    'message': '请求编码错误',
+                    'message': 'JSON格式错误',
                     'detail': str(e)
                 }, status=400)
         
@@ -102,7 +120,10 @@ class RequestProcessorMiddleware:
         response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
         
         # 如果启用了标准化API响应
-        if self.standardize_response and request.path.startswith('/api/'):
+        # EnvelopeJSONRenderer已在渲染时完成包装的响应直接跳过，避免二次渲染；
+        # 这里仅作为使用其他JSON渲染器的视图的兜底处理
+        if self.standardize_response and get_route_info(request).is_api \
+                and not getattr(response, 'envelope_rendered', False):
             # 只对JSON响应进行标准化
             if hasattr(response, 'accepted_media_type') and 'application/json' in response.accepted_media_type:
                 # 检查响应的状态码
@@ -118,21 +139,11 @@ class RequestProcessorMiddleware:
     def _standardize_success_response(self, response):
         """标准化成功响应"""
         if hasattr(response, 'data'):
-            # 获取原始数据
-            original_data = response.data
-            
-            # 检查是否已经是标准格式
-            if isinstance(original_data, dict) and 'data' in original_data and ('status' in original_data or 'success' in original_data):
+            standardized_data = build_success_envelope(response.data, response.status_code)
+            if standardized_data is None:
                 # 已经是标准格式，不需要再处理
                 return
             
-            # 标准化响应格式
-            standardized_data = {
-                'success': True,
-                'status_code': response.status_code,
-                'data': original_data
-            }
-            
             # 更新响应数据
             response.data = standardized_data
             response._is_rendered = False
@@ -141,36 +152,12 @@ class RequestProcessorMiddleware:
     def _standardize_error_response(self, response):
         """标准化错误响应"""
         if hasattr(response, 'data'):
-            # 获取原始数据
-            original_data = response.data
-            
-            # 检查是否已经是标准格式
-            if isinstance(original_data, dict) and 'error' in original_data and ('message' in original_data or 'detail' in original_data):
+            standardized_data = build_error_envelope(response.data, response.status_code)
+            if standardized_data is None:
                 # 已经是标准格式，不需要再处理
                 return
             
-            # 准备错误消息
-            if isinstance(original_data, dict) and 'detail' in original_data:
-                error_message = original_data['detail']
-            elif isinstance(original_data, str):
-                error_message = original_data
-            else:
-                error_message = '请求处理出错'
-            
-            # 标准化响应格式
-            standardized_data = {
-                'error': True,
-                'status_code': response.status_code,
-                'message': error_message,
-            }
-            
-            # 如果原始数据是字典且包含额外信息，保留这些信息
-            if isinstance(original_data, dict):
-                for key, value in original_data.items():
-                    if key not in ['error', 'status_code', 'message', 'detail']:
-                        standardized_data[key] = value
-            
             # 更新响应数据
             response.data = standardized_data
             response._is_rendered = False
-            response.render() 
\ No newline at end of file
+            response.render()
@@ -0,0 +1,60 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+
+from apps.core.routing import get_route_info
+
+
+class RouteDispatchMiddleware:
+    """
+    按路由区分有状态请求和无状态请求
+
+    需放在会话、CSRF、认证、消息和点击劫持中间件之前，这些中间件使用apps.core.middleware中的
+    Stateful*子类（见stateful_middleware），根据本中间件设置的request.stateless_api决定是否跳过：
+    - 管理后台、可视化API（浏览器请求HTML）以及只携带会话Cookie的/api/请求执行全部中间件
+    - 无状态的/api/请求（携带Bearer令牌或没有会话Cookie）跳过有状态中间件，
+      request.user预先设为匿名用户，由DRF认证类覆盖
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 关闭时所有请求都执行有状态中间件
+        self.enabled = getattr(settings, 'STATELESS_API_ENABLED', True)
+        self.session_cookie = settings.SESSION_COOKIE_NAME
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.is_stateless(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        self.is_stateless(request)
+        return await self.get_response(request)
+
+    def is_stateless(self, request):
+        """判断请求是否跳过有状态中间件，结果保存在request.stateless_api中"""
+        stateless = self.enabled and self._is_stateless(request)
+        request.stateless_api = stateless
+        if stateless:
+            request.user = AnonymousUser()
+        return stateless
+
+    def _is_stateless(self, request):
+        route_info = get_route_info(request)
+        if not route_info.is_api or route_info.is_admin:
+            return False
+        # 浏览器访问可视化API时需要会话登录和CSRF令牌
+        if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+            return False
+        # 没有Bearer令牌时可能通过会话认证（SessionAuthentication）
+        if self.session_cookie in request.COOKIES:
+            return request.META.get('HTTP_AUTHORIZATION', '').startswith('Bearer ')
+        return True
@@ -0,0 +1,82 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from apps.core.timing import ServerTimer, activate_timer, deactivate_timer
+
+
+class ServerTimingMiddleware:
+    """
+    Server-Timing中间件
+
+    为开启计时的请求创建计时器，统计认证、权限检查、SQL、序列化和渲染各阶段的耗时，
+    并输出Server-Timing响应头。计时器同时保存在request.server_timing中，
+    供RequestLoggingMiddleware写入日志。
+    - SERVER_TIMING_ENABLED为True时所有请求都开启
+    - 否则只有携带SERVER_TIMING_REQUEST_HEADER请求头的请求开启
+    响应头包含内部耗时细节，只输出给DEBUG模式、管理员用户（is_staff）或SERVER_TIMING_ALLOWED_IPS中的客户端，
+    其余请求的计时只写入日志
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # 是否对所有请求开启计时
+        self.enabled = getattr(settings, 'SERVER_TIMING_ENABLED', False)
+        # 按请求开启计时的请求头，设为None时不允许客户端开启
+        self.request_header = getattr(settings, 'SERVER_TIMING_REQUEST_HEADER', 'X-Server-Timing')
+        # 允许查看Server-Timing响应头的客户端IP
+        self.allowed_ips = set(getattr(settings, 'SERVER_TIMING_ALLOWED_IPS', []))
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if not self._should_time(request):
+            return self.get_response(request)
+
+        timer = ServerTimer()
+        request.server_timing = timer
+        token = activate_timer(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate_timer(token)
+        if self._may_expose(request):
+            response['Server-Timing'] = timer.header_value()
+        return response
+
+    async def __acall__(self, request):
+        """异步调用入口"""
+        if not self._should_time(request):
+            return await self.get_response(request)
+
+        timer = ServerTimer()
+        request.server_timing = timer
+        # 上下文变量会随sync_to_async传递到线程池中执行的同步代码
+        token = activate_timer(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate_timer(token)
+        # 会话用户是惰性加载的，首次访问需要查询数据库，在线程池中执行
+        if await sync_to_async(self._may_expose)(request):
+            response['Server-Timing'] = timer.header_value()
+        return response
+
+    def _should_time(self, request):
+        """判断请求是否开启计时"""
+        if self.enabled:
+            return True
+        return bool(self.request_header and request.headers.get(self.request_header))
+
+    def _may_expose(self, request):
+        """判断是否向客户端输出Server-Timing响应头（在视图执行后调用，此时已完成认证）"""
+        if settings.DEBUG or request.META.get('REMOTE_ADDR') in self.allowed_ips:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
@@ -0,0 +1,44 @@
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+class StatefulOnlyMixin:
+    """
+    有状态中间件混入类：无状态的/api/请求（RouteDispatchMiddleware标记request.stateless_api）跳过本中间件
+
+    中间件仍然直接放在MIDDLEWARE中（子类），管理后台等依赖这些中间件的系统检查照常生效；
+    跳过时不执行process_request/process_response，也不执行process_view等钩子
+    """
+
+    def __call__(self, request):
+        if getattr(request, 'stateless_api', False):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class StatefulSessionMiddleware(StatefulOnlyMixin, SessionMiddleware):
+    """只对浏览器请求加载和保存会话"""
+
+
+class StatefulCsrfViewMiddleware(StatefulOnlyMixin, CsrfViewMiddleware):
+    """只对浏览器请求执行CSRF检查"""
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if getattr(request, 'stateless_api', False):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class StatefulAuthenticationMiddleware(StatefulOnlyMixin, AuthenticationMiddleware):
+    """只对浏览器请求通过会话解析用户，无状态请求的用户由DRF认证类设置"""
+
+
+class StatefulMessageMiddleware(StatefulOnlyMixin, MessageMiddleware):
+    """只对浏览器请求启用消息框架"""
+
+
+class StatefulXFrameOptionsMiddleware(StatefulOnlyMixin, XFrameOptionsMiddleware):
+    """只对浏览器请求添加X-Frame-Options响应头"""
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_rename_core_perfor_metric__595368_idx_perf_type_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usagestatistics',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='时间戳'),
+        ),
+    ]
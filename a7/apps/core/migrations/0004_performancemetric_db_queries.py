@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_usagestatistics_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='performancemetric',
+            name='metric_type',
+            field=models.CharField(choices=[('response_time', '响应时间'), ('api_latency', 'API延迟'), ('resource_usage', '资源使用'), ('error_rate', '错误率'), ('active_users', '活跃用户'), ('cpu_usage', 'CPU使用率'), ('memory_usage', '内存使用率'), ('db_queries', '数据库查询次数'), ('other', '其他')], max_length=50, verbose_name='指标类型'),
+        ),
+    ]
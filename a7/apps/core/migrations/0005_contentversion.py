@@ -0,0 +1,24 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_performancemetric_db_queries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('scope', models.CharField(max_length=191, primary_key=True, serialize=False, verbose_name='版本范围')),
+                ('version', models.BigIntegerField(help_text='最近一次修改的时间（纳秒）', verbose_name='版本戳')),
+            ],
+            options={
+                'verbose_name': '内容版本',
+                'verbose_name_plural': '内容版本',
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from users.models import User
 import json
@@ -41,8 +42,10 @@ class UsageStatistics(models.Model):
         verbose_name=_('用户代理'),
         help_text=_('浏览器和设备信息')
     )
+    # 使用default而不是auto_now_add，批量写入和重放时保留操作发生的时间
     timestamp = models.DateTimeField(
-        auto_now_add=True, 
+        default=timezone.now,
+        editable=False,
         verbose_name=_('时间戳')
     )
     
@@ -84,6 +87,7 @@ class PerformanceMetric(models.Model):
         ('active_users', _('活跃用户')),
         ('cpu_usage', _('CPU使用率')),
         ('memory_usage', _('内存使用率')),
+        ('db_queries', _('数据库查询次数')),
         ('other', _('其他')),
     )
     
@@ -140,4 +144,28 @@ class PerformanceMetric(models.Model):
         try:
             return json.loads(self.context)
         except json.JSONDecodeError:
-            return {'error': 'Invalid JSON data'} 
\ No newline at end of file
+            return {'error': 'Invalid JSON data'} 
+
+class ContentVersion(models.Model):
+    """
+    内容版本戳，条件请求（apps.core.conditional）根据版本戳生成ETag和Last-Modified
+
+    版本戳保存在数据库中：所有worker进程读到同一个版本，
+    且版本更新与数据修改在同一个事务中提交，事务提交前其他请求看到的仍是旧数据和旧版本
+    """
+    scope = models.CharField(
+        max_length=191,
+        primary_key=True,
+        verbose_name=_('版本范围')
+    )
+    version = models.BigIntegerField(
+        verbose_name=_('版本戳'),
+        help_text=_('最近一次修改的时间（纳秒）')
+    )
+    
+    class Meta:
+        verbose_name = _('内容版本')
+        verbose_name_plural = _('内容版本')
+    
+    def __str__(self):
+        return f"{self.scope} - {self.version}"
@@ -0,0 +1,18 @@
+from rest_framework.parsers import JSONParser
+
+
+class CachedJSONParser(JSONParser):
+    """
+    复用中间件已解析结果的JSON解析器
+
+    RequestProcessorMiddleware已将JSON请求体解析到request.json_data中，
+    此解析器直接返回该对象，避免DRF再次解析同一份请求体；
+    未经过中间件处理的请求（如排除路径）仍使用标准的JSON解析。
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        django_request = getattr(request, '_request', None)
+        if django_request is not None and hasattr(django_request, 'json_data'):
+            return django_request.json_data
+        return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,126 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# 当前请求的查询统计，未开启统计时为None
+_current_tracker = ContextVar('query_tracker', default=None)
+
+# 字符串和数字字面量
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# IN (%s, %s, ...) 参数列表，长度不同的列表视为同一种查询
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+# 连续空白
+_SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    计算SQL的指纹
+
+    去除字面量、折叠IN参数列表后得到查询的"形状"，
+    同一形状在一个请求中反复执行通常意味着N+1查询
+    """
+    sql = _LITERAL_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+@lru_cache(maxsize=1)
+def cache_tables():
+    """数据库缓存（DatabaseCache）使用的表"""
+    return tuple(
+        config['LOCATION'] for config in settings.CACHES.values()
+        if config['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+    )
+
+
+@lru_cache(maxsize=2048)
+def is_cache_query(sql):
+    """是否是读写数据库缓存表的查询"""
+    return any(table in sql for table in cache_tables())
+
+
+@receiver(setting_changed)
+def _reset_cache_tables(setting, **kwargs):
+    """缓存配置变更时（如测试中的override_settings）重新读取缓存表"""
+    if setting == 'CACHES':
+        cache_tables.cache_clear()
+        is_cache_query.cache_clear()
+
+
+class QueryTracker:
+    """
+    单个请求的SQL查询统计
+
+    记录查询次数、数据库总耗时和每种查询形状的执行次数。
+    共享缓存使用数据库缓存时，限流、用户缓存等中间件读写缓存表的查询单独计数（cache_count），
+    不计入查询次数，也不参与N+1检测（同一缓存操作在每个请求中都会重复执行）
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.cache_count = 0
+        self.fingerprints = Counter()
+
+    def record(self, sql, duration):
+        """记录一次查询"""
+        self.duration += duration
+        if is_cache_query(sql):
+            self.cache_count += 1
+            return
+        self.count += 1
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """返回执行次数达到阈值的查询形状 [(指纹, 次数), ...]，按次数倒序"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    def as_dict(self, threshold=2, limit=5):
+        """返回统计摘要，供日志记录使用"""
+        return {
+            'count': self.count,
+            'cache_count': self.cache_count,
+            'time': round(self.duration * 1000, 3),
+            'repeated': [
+                {'sql': sql[:200], 'count': count}
+                for sql, count in self.repeated(threshold)[:limit]
+            ],
+        }
+
+
+def activate_tracker(tracker):
+    """为当前上下文设置查询统计，返回用于恢复的token"""
+    return _current_tracker.set(tracker)
+
+
+def deactivate_tracker(token):
+    """恢复设置查询统计之前的状态"""
+    _current_tracker.reset(token)
+
+
+def query_tracking_wrapper(execute, sql, params, many, context):
+    """数据库执行包装器（connection.execute_wrapper），统计当前请求的查询"""
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.record(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def _install_query_tracking(sender, connection, **kwargs):
+    """为每个新建的数据库连接安装执行包装器"""
+    if query_tracking_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_tracking_wrapper)
@@ -0,0 +1,452 @@
+import hashlib
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from apps.core.request_body import get_json_body
+from apps.core.routing import PrefixMatcher
+
+logger = logging.getLogger('ratelimit')
+
+# 限流周期单位
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# 负载保护优先级
+PRIORITY_LOW = 'low'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_HIGH = 'high'
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'rule', 'limit', 'retry_after'])
+
+
+def parse_rate(rate):
+    """
+    解析限流速率
+
+    格式为 次数/周期，周期可以是 s、m、h、d 或带数字的形式（如 100/5m），
+    返回 (次数, 周期秒数)
+    """
+    count, period = rate.split('/')
+    unit = period[-1]
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), PERIODS[unit] * multiplier
+
+
+class RateLimitRule:
+    """
+    限流规则
+
+    - name: 规则名称，用作缓存键的一部分
+    - paths: 适用的URL前缀
+    - methods: 适用的请求方法，为空表示全部
+    - key: 限流维度，user（按用户，未认证时按IP）、ip-username（按IP和请求体中的用户名，用于登录）、
+      ip 或 route（整个路由共享）
+    - rate: 限流速率，如 "60/m"
+    """
+
+    def __init__(self, name, paths, rate, key='user', methods=None):
+        self.name = name
+        self.paths = paths
+        self.key = key
+        self.methods = {method.upper() for method in methods or ()}
+        self.limit, self.period = parse_rate(rate)
+
+    def applies_to(self, request):
+        return not self.methods or request.method in self.methods
+
+
+class SlidingWindowLimiter:
+    """
+    基于Django缓存的滑动窗口限流器
+
+    使用当前和上一个固定窗口的计数按时间加权估算滑动窗口内的请求数。
+    计数保存在RATELIMIT_CACHE指定的共享缓存中，多个worker进程共享同一份预算：
+    - sync_interval为0时每次检查直接在共享缓存中递增计数，适合RedisCache（递增是原子操作，每条规则一次往返）
+    - sync_interval大于0时（适合DatabaseCache）请求只在本进程内计数，每隔sync_interval秒把新增的计数
+      加到共享缓存并读回所有进程的合计（见sync()），其他进程的请求最多延迟sync_interval秒计入
+    请求不匹配任何规则时不访问共享缓存。
+    """
+
+    def __init__(self, rules, cache_alias='shared', key_prefix='ratelimit', trust_forwarded_for=False,
+                 sync_interval=0, exempt_paths=()):
+        self.rules = rules
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        self.trust_forwarded_for = trust_forwarded_for
+        self.sync_interval = sync_interval
+        self.matcher = PrefixMatcher(
+            (path, 1 << index) for index, rule in enumerate(rules) for path in rule.paths
+        )
+        # 不限流的路径（如健康检查），即使匹配规则也不计数
+        self.exempt = PrefixMatcher((path, 1) for path in exempt_paths)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        # 本进程尚未加到共享缓存的计数：缓存键 -> [次数, 缓存有效期, 过期时间]
+        self._pending = {}
+        # 最近一次同步读回的所有进程的计数：缓存键 -> (次数, 过期时间)
+        self._shared = {}
+
+    @classmethod
+    def from_settings(cls):
+        """
+        根据settings创建限流器
+
+        RATELIMIT_IP_RULES_ENABLED未开启时跳过key为ip的规则：反向代理之后所有客户端的IP相同，会共享同一份预算
+        """
+        ip_rules_enabled = getattr(settings, 'RATELIMIT_IP_RULES_ENABLED', False)
+        rules = [
+            RateLimitRule(**rule) for rule in getattr(settings, 'RATELIMIT_RULES', [])
+            if ip_rules_enabled or rule.get('key') != 'ip'
+        ]
+        return cls(
+            rules,
+            cache_alias=getattr(settings, 'RATELIMIT_CACHE', 'shared'),
+            trust_forwarded_for=getattr(settings, 'RATELIMIT_TRUST_X_FORWARDED_FOR', False),
+            sync_interval=getattr(settings, 'RATELIMIT_SYNC_INTERVAL', 0.5),
+            exempt_paths=getattr(settings, 'RATELIMIT_EXEMPT_PATHS', []),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def rules_for(self, request):
+        """返回请求适用的全部规则"""
+        path = PrefixMatcher.normalize(request.path_info)
+        flags = self.matcher.match(path)
+        if not flags or self.exempt.match(path):
+            return []
+        return [
+            rule for index, rule in enumerate(self.rules)
+            if flags & (1 << index) and rule.applies_to(request)
+        ]
+
+    def check(self, request):
+        """
+        检查请求是否超过限流，返回RateLimitResult；有多条规则时任一规则超限即拒绝
+
+        共享缓存不可用（如未执行createcachetable）时放行请求并记录日志
+        """
+        rules = self.rules_for(request)
+        if not rules:
+            return RateLimitResult(True, None, None, 0)
+        result = RateLimitResult(True, None, None, 0)
+        for rule in rules:
+            try:
+                retry_after = self.hit(f'{rule.name}:{self.identify(request, rule.key)}', rule.limit, rule.period)
+            except Exception:
+                logger.exception(f"限流计数失败，放行请求: 规则={rule.name}")
+                break
+            if retry_after:
+                result = RateLimitResult(False, rule.name, rule.limit, retry_after)
+                break
+        if self.sync_interval:
+            self.maybe_sync()
+        return result
+
+    def hit(self, key, limit, period, now=None):
+        """记录一次请求，未超限时返回0，超限时返回建议的重试等待秒数"""
+        now = time.time() if now is None else now
+        window = int(now // period)
+        current_key = f'{self.key_prefix}:{key}:{window}'
+        previous_key = f'{self.key_prefix}:{key}:{window - 1}'
+
+        if self.sync_interval:
+            current, previous = self._hit_local(current_key, previous_key, period, (window + 2) * period)
+        else:
+            current, previous = self._hit_shared(current_key, previous_key, period)
+
+        elapsed = (now % period) / period
+        estimated = previous * (1 - elapsed) + current
+        if estimated <= limit:
+            return 0
+        return max(1, math.ceil(period * (1 - elapsed)))
+
+    def _hit_shared(self, current_key, previous_key, period):
+        """在共享缓存中递增当前窗口的计数，返回(当前窗口计数, 上一个窗口计数)"""
+        cache = self.cache
+        # 计数保留两个周期，供下一个窗口估算使用
+        if cache.add(current_key, 1, timeout=period * 2):
+            current = 1
+        else:
+            try:
+                current = cache.incr(current_key)
+            except ValueError:
+                # 键在add和incr之间过期
+                cache.set(current_key, 1, timeout=period * 2)
+                current = 1
+        return current, cache.get(previous_key, 0)
+
+    def _hit_local(self, current_key, previous_key, period, expires):
+        """在本进程内递增计数，返回(当前窗口计数, 上一个窗口计数)，均包含其他进程最近同步的计数"""
+        with self._lock:
+            pending = self._pending.setdefault(current_key, [0, period * 2, expires])
+            pending[0] += 1
+            current = pending[0] + self._shared.get(current_key, (0,))[0]
+            previous = self._pending.get(previous_key, [0])[0] + self._shared.get(previous_key, (0,))[0]
+        return current, previous
+
+    def maybe_sync(self, now=None):
+        """距上次同步超过sync_interval秒时同步一次；其他线程正在同步时直接返回"""
+        now = time.monotonic() if now is None else now
+        if self._synced_at is None:
+            # 启动后的第一个周期只在本进程内计数
+            self._synced_at = now
+            return
+        if now - self._synced_at < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            self.sync()
+        except Exception:
+            # 共享缓存不可用时只按本进程的计数判断，不影响请求处理
+            logger.exception("限流同步计数失败")
+        finally:
+            self._sync_lock.release()
+
+    def sync(self):
+        """把本进程新增的计数加到共享缓存，并读回各窗口所有进程的计数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        cache = self.cache
+        for key, (count, timeout, expires) in pending.items():
+            # 上次同步时已存在的键直接递增，其余的键先尝试插入
+            if key not in self._shared and cache.add(key, count, timeout=timeout):
+                continue
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, timeout=timeout)
+
+        now = time.time()
+        expiry = {key: expires for key, (_, expires) in self._shared.items() if expires > now}
+        expiry.update((key, expires) for key, (_, _, expires) in pending.items() if expires > now)
+        values = cache.get_many(list(expiry)) if expiry else {}
+        with self._lock:
+            self._shared = {key: (values.get(key, 0), expires) for key, expires in expiry.items()}
+
+    def identify(self, request, key):
+        """获取请求在指定维度下的标识"""
+        if key == 'route':
+            return 'all'
+        if key == 'user':
+            # 只使用JWT认证中间件已解析的令牌，不为限流额外查询数据库
+            payload = getattr(request, 'token_payload', None)
+            user_id_claim = settings.SIMPLE_JWT.get('USER_ID_CLAIM', 'user_id')
+            if payload and payload.get(user_id_claim) is not None:
+                return f'user:{payload[user_id_claim]}'
+        if key == 'ip-username':
+            # 同一出口IP（如校园网NAT）后的不同用户分别计数，同一用户名的重复尝试仍受限制
+            username = hashlib.sha1(self.get_username(request).encode('utf-8')).hexdigest()[:16]
+            return f'ip:{self.get_client_ip(request)}:username:{username}'
+        return f'ip:{self.get_client_ip(request)}'
+
+    def get_username(self, request):
+        """获取登录请求体中的用户名（大小写不敏感），无法解析时返回空字符串"""
+        from django.contrib.auth import get_user_model
+
+        field = get_user_model().USERNAME_FIELD
+        if request.content_type == 'application/json':
+            try:
+                data = get_json_body(request)
+            except ValueError:
+                data = None
+        else:
+            data = request.POST
+        username = data.get(field) if isinstance(data, dict) else None
+        return str(username).strip().lower() if username else ''
+
+    def get_client_ip(self, request):
+        """获取客户端IP地址，只有在反向代理后部署时才信任X-Forwarded-For"""
+        if self.trust_forwarded_for:
+            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+            if x_forwarded_for:
+                return x_forwarded_for.split(',')[0].strip()
+        return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+class LoadShedder:
+    """
+    按优先级的负载保护
+
+    统计所有worker进程正在处理的请求数，超过对应优先级的阈值时直接拒绝新请求：
+    低优先级路由先被拒绝，高优先级路由（如登录）不受限制。
+    请求路径同时匹配多个优先级时取最高的优先级。
+    exempt_paths中的路径（如健康检查）不参与统计，也不触发同步。
+
+    每个进程在本地精确统计自己的处理中请求数，并每隔sync_interval秒通过共享缓存
+    发布自己的数量、读取其他进程发布的数量（见sync()），判断时使用本进程的数量加上其他进程最近发布的数量。
+    进程发布的数量在缓存中保存process_ttl秒，退出或被杀死的进程的数量随之过期。
+    """
+
+    LOW = 1
+    HIGH = 2
+    EXEMPT = 4
+
+    def __init__(self, limits, priorities, cache_alias='shared', sync_interval=0.5, process_ttl=10,
+                 key_prefix='load-shedding', exempt_paths=()):
+        # 优先级 -> 所有进程允许同时处理的最大请求数
+        self.limits = limits
+        prefix_flags = []
+        for prefix in priorities.get(PRIORITY_LOW, []):
+            prefix_flags.append((prefix, self.LOW))
+        for prefix in priorities.get(PRIORITY_HIGH, []):
+            prefix_flags.append((prefix, self.HIGH))
+        for prefix in exempt_paths:
+            prefix_flags.append((prefix, self.EXEMPT))
+        self.matcher = PrefixMatcher(prefix_flags)
+        self.cache_alias = cache_alias
+        self.sync_interval = sync_interval
+        self.process_ttl = process_ttl
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self.in_flight = 0
+        # 其他进程最近一次发布的处理中请求数之和
+        self.others_in_flight = 0
+        self.shed = 0
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建负载保护"""
+        return cls(
+            limits=getattr(settings, 'LOAD_SHEDDING_LIMITS', {}),
+            priorities=getattr(settings, 'LOAD_SHEDDING_PRIORITIES', {}),
+            cache_alias=getattr(settings, 'LOAD_SHEDDING_CACHE', 'shared'),
+            sync_interval=getattr(settings, 'LOAD_SHEDDING_SYNC_INTERVAL', 0.5),
+            exempt_paths=getattr(settings, 'LOAD_SHEDDING_EXEMPT_PATHS', []),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def registry_key(self):
+        return f'{self.key_prefix}:processes'
+
+    def process_key(self):
+        """当前进程发布处理中请求数使用的缓存键（fork后的子进程使用各自的键）"""
+        return f'{self.key_prefix}:{socket.gethostname()}:{os.getpid()}'
+
+    def total_in_flight(self):
+        """所有进程正在处理的请求数（其他进程的数量最多延迟sync_interval秒）"""
+        return self.in_flight + self.others_in_flight
+
+    def is_exempt(self, request):
+        """请求是否不参与负载保护"""
+        return bool(self.matcher.match(PrefixMatcher.normalize(request.path_info)) & self.EXEMPT)
+
+    def priority_for(self, request):
+        """获取请求的优先级"""
+        flags = self.matcher.match(PrefixMatcher.normalize(request.path_info))
+        if flags & self.HIGH:
+            return PRIORITY_HIGH
+        if flags & self.LOW:
+            return PRIORITY_LOW
+        return PRIORITY_NORMAL
+
+    def acquire(self, request, sync=True):
+        """
+        尝试开始处理请求，被拒绝时返回False；返回True时处理结束后必须调用release()
+
+        sync为False时不访问共享缓存，由调用方在sync_due()时自行调用maybe_sync()（如异步中间件在线程池中同步）
+        """
+        limit = self.limits.get(self.priority_for(request))
+        if sync:
+            self.maybe_sync()
+        with self._lock:
+            if limit is not None and self.in_flight + self.others_in_flight >= limit:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+        return True
+
+    def release(self, sync=True):
+        """请求处理结束"""
+        with self._lock:
+            self.in_flight -= 1
+        if sync:
+            self.maybe_sync()
+
+    def sync_due(self, now=None):
+        """距上次同步是否已超过sync_interval秒"""
+        now = time.monotonic() if now is None else now
+        return self._synced_at is None or now - self._synced_at >= self.sync_interval
+
+    def maybe_sync(self, now=None):
+        """距上次同步超过sync_interval秒时同步一次；其他线程正在同步时直接返回"""
+        now = time.monotonic() if now is None else now
+        if not self.sync_due(now):
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            self.sync()
+        except Exception:
+            # 共享缓存不可用时只按本进程的数量判断，不影响请求处理
+            logger.exception("负载保护同步处理中请求数失败")
+            self.others_in_flight = 0
+        finally:
+            self._sync_lock.release()
+
+    def sync(self):
+        """发布本进程的处理中请求数，并读取其他进程发布的数量"""
+        cache = self.cache
+        key = self.process_key()
+        now = time.time()
+        cache.set(key, self.in_flight, timeout=self.process_ttl)
+
+        # 登记表记录各进程的键和过期时间，过期的进程从登记表中移除
+        registry = cache.get(self.registry_key) or {}
+        registry = {name: expires for name, expires in registry.items() if expires > now}
+        if registry.get(key, 0) < now + self.process_ttl / 2:
+            registry[key] = now + self.process_ttl
+            cache.set(self.registry_key, registry, timeout=self.process_ttl * 2)
+
+        others = [name for name in registry if name != key]
+        self.others_in_flight = sum(cache.get_many(others).values()) if others else 0
+
+
+_limiter = None
+_shedder = None
+
+
+def get_rate_limiter():
+    """获取全局限流器（首次使用时构建）"""
+    global _limiter
+    if _limiter is None:
+        _limiter = SlidingWindowLimiter.from_settings()
+    return _limiter
+
+
+def get_load_shedder():
+    """获取全局负载保护（首次使用时构建）"""
+    global _shedder
+    if _shedder is None:
+        _shedder = LoadShedder.from_settings()
+    return _shedder
+
+
+@receiver(setting_changed)
+def _reset_ratelimit(setting, **kwargs):
+    """限流相关配置变更时（如测试中的override_settings）重建"""
+    global _limiter, _shedder
+    if setting.startswith('RATELIMIT_'):
+        _limiter = None
+    if setting.startswith('LOAD_SHEDDING_'):
+        _shedder = None
@@ -0,0 +1,101 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.routing import get_route_info
+from apps.core.timing import timed
+
+
+def build_success_envelope(data, status_code):
+    """
+    构建标准化成功响应格式 {success, status_code, data}
+
+    如果数据已经是标准格式，返回None
+    """
+    # 检查是否已经是标准格式
+    if isinstance(data, dict) and 'data' in data and ('status' in data or 'success' in data):
+        return None
+
+    return {
+        'success': True,
+        'status_code': status_code,
+        'data': data
+    }
+
+
+def build_error_envelope(data, status_code):
+    """
+    构建标准化错误响应格式 {error, status_code, message}
+
+    如果数据已经是标准格式，返回None
+    """
+    # 检查是否已经是标准格式
+    if isinstance(data, dict) and 'error' in data and ('message' in data or 'detail' in data):
+        return None
+
+    # 准备错误消息
+    if isinstance(data, dict) and 'detail' in data:
+        error_message = data['detail']
+    elif isinstance(data, str):
+        error_message = data
+    else:
+        error_message = '请求处理出错'
+
+    envelope = {
+        'error': True,
+        'status_code': status_code,
+        'message': error_message,
+    }
+
+    # 如果原始数据是字典且包含额外信息，保留这些信息
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key not in ['error', 'status_code', 'message', 'detail']:
+                envelope[key] = value
+
+    return envelope
+
+
+def build_envelope(data, status_code):
+    """根据状态码构建标准化响应，不需要包装时返回None"""
+    if 200 <= status_code < 300:
+        return build_success_envelope(data, status_code)
+    if status_code >= 400:
+        return build_error_envelope(data, status_code)
+    return None
+
+
+class EnvelopeJSONRenderer(JSONRenderer):
+    """
+    输出标准化响应格式的JSON渲染器
+
+    在STANDARDIZE_API_RESPONSE开启时，直接在渲染过程中包装响应数据，
+    替代RequestProcessorMiddleware在DRF渲染后再包装并重新渲染的做法，
+    每个API响应只序列化一次。
+    只包装由本渲染器输出的响应：BrowsableAPIRenderer生成内容预览时也会调用本渲染器，预览保持原始数据；
+    包装结果是新的字典，原始数据对象不被修改；本渲染器输出的响应同时把response.data指向包装结果，
+    与RequestProcessorMiddleware包装JSON响应时一致。
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        response = renderer_context.get('response')
+        request = renderer_context.get('request')
+
+        if response is not None and request is not None \
+                and getattr(response, 'accepted_renderer', None) is self and self._should_standardize(request):
+            envelope = build_envelope(data, response.status_code)
+            if envelope is not None:
+                data = envelope
+                # 响应正文就是包装结果，同步更新response.data（HTML渲染器不会再使用该响应）
+                response.data = envelope
+            # 标记已处理，中间件不再重复包装
+            response.envelope_rendered = True
+
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+    def _should_standardize(self, request):
+        if not getattr(settings, 'STANDARDIZE_API_RESPONSE', False):
+            return False
+        route_info = get_route_info(getattr(request, '_request', request))
+        return route_info.is_api and route_info.should_process
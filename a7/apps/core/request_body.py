@@ -0,0 +1,33 @@
+import json
+
+
+def _reject_constant(name):
+    """与DRF的严格JSON模式保持一致，拒绝NaN/Infinity等非标准常量"""
+    raise ValueError(f'不支持的JSON常量: {name}')
+
+
+def get_json_body(request):
+    """
+    解析并缓存请求体中的JSON数据
+
+    同一个请求的请求体只解码和解析一次，结果（或解析错误）缓存在请求对象上，
+    请求处理中间件、请求日志中间件和DRF解析器共享同一份结果。
+    - 请求体为空时返回None
+    - 解析失败时抛出ValueError（包括JSONDecodeError和UnicodeDecodeError）
+    """
+    cached = getattr(request, '_json_body_cache', None)
+    if cached is None:
+        body = request.body
+        if not body:
+            cached = (None, None)
+        else:
+            try:
+                cached = (json.loads(body.decode('utf-8'), parse_constant=_reject_constant), None)
+            except ValueError as e:
+                cached = (None, e)
+        request._json_body_cache = cached
+
+    data, error = cached
+    if error is not None:
+        raise error
+    return data
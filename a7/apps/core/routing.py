@@ -0,0 +1,169 @@
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# 路由分类标志位
+LOG_EXCLUDED = 1  # 不记录请求日志
+PROCESS_EXCLUDED = 2  # 不进行请求/响应处理
+AUTH_EXEMPT = 4  # 不进行JWT认证
+PERMISSION_EXEMPT = 8  # 不进行角色权限检查
+API = 16  # API请求
+ADMIN = 32  # 管理后台请求
+
+# 各分类使用的配置项及默认值
+ROUTE_SETTINGS = (
+    (LOG_EXCLUDED, 'REQUEST_LOG_EXCLUDE_PATHS', [
+        '/admin/jsi18n/',
+        '/static/',
+        '/media/',
+        '/health-check/',
+    ]),
+    (PROCESS_EXCLUDED, 'PROCESSOR_EXCLUDE_PATHS', [
+        '/admin/',
+        '/static/',
+        '/media/',
+    ]),
+    (AUTH_EXEMPT, 'JWT_AUTH_EXEMPT_PATHS', [
+        '/admin/',
+        '/static/',
+        '/media/',
+        '/api-auth/',
+        '/api/token/',
+        '/api/login/',
+        '/swagger/',
+        '/redoc/',
+        '/health-check/',
+    ]),
+    (PERMISSION_EXEMPT, 'PERMISSION_EXEMPT_PATHS', [
+        '/admin/',
+        '/static/',
+        '/media/',
+        '/api-auth/',
+        '/api/token/',
+        '/api/login/',
+        '/swagger/',
+        '/redoc/',
+    ]),
+    (API, 'API_PATH_PREFIXES', ['/api/']),
+    (ADMIN, 'ADMIN_PATH_PREFIXES', ['/admin/']),
+)
+
+
+RouteInfo = namedtuple('RouteInfo', [
+    'should_log',
+    'should_process',
+    'auth_exempt',
+    'permission_exempt',
+    'is_api',
+    'is_admin',
+])
+
+
+class PrefixMatcher:
+    """
+    URL前缀匹配器
+
+    将多组URL前缀编译为单个正则表达式，一次匹配即可得到路径命中的所有分类标志。
+    每个前缀预先合并了作为其前缀的其他前缀的标志，
+    按长度倒序排列后，第一个命中的分支就是最长匹配，其标志即为全部命中标志的并集。
+    """
+
+    def __init__(self, prefix_flags):
+        self.prefix_flags = {}
+        for prefix, flags in prefix_flags:
+            prefix = self.normalize(prefix)
+            self.prefix_flags[prefix] = self.prefix_flags.get(prefix, 0) | flags
+
+        # 合并祖先前缀的标志
+        merged = {}
+        for prefix in self.prefix_flags:
+            flags = 0
+            for other, other_flags in self.prefix_flags.items():
+                if prefix.startswith(other):
+                    flags |= other_flags
+            merged[prefix] = flags
+
+        ordered = sorted(merged, key=len, reverse=True)
+        self._group_flags = {}
+        branches = []
+        for index, prefix in enumerate(ordered):
+            group = f'p{index}'
+            self._group_flags[group] = merged[prefix]
+            branches.append(f'(?P<{group}>{re.escape(prefix)})')
+        self._regex = re.compile('|'.join(branches)) if branches else None
+
+    @staticmethod
+    def normalize(path):
+        """统一为以/开头的路径"""
+        return '/' + path.lstrip('/')
+
+    def match(self, path):
+        """返回路径命中的分类标志"""
+        if self._regex is None:
+            return 0
+        m = self._regex.match(path)
+        if m is None:
+            return 0
+        return self._group_flags[m.lastgroup]
+
+
+class RouteClassifier:
+    """
+    请求路由分类器
+
+    根据settings中的各类路径配置构建一次，供所有自定义中间件共享
+    """
+
+    def __init__(self, route_settings=ROUTE_SETTINGS):
+        prefix_flags = []
+        for flag, setting_name, default in route_settings:
+            for prefix in getattr(settings, setting_name, default):
+                prefix_flags.append((prefix, flag))
+        self.matcher = PrefixMatcher(prefix_flags)
+
+    def classify(self, path):
+        """对路径进行分类"""
+        flags = self.matcher.match(PrefixMatcher.normalize(path))
+        return RouteInfo(
+            should_log=not flags & LOG_EXCLUDED,
+            should_process=not flags & PROCESS_EXCLUDED,
+            auth_exempt=bool(flags & AUTH_EXEMPT),
+            permission_exempt=bool(flags & PERMISSION_EXEMPT),
+            is_api=bool(flags & API),
+            is_admin=bool(flags & ADMIN),
+        )
+
+
+_classifier = None
+
+
+def get_route_classifier():
+    """获取全局路由分类器（首次使用时构建）"""
+    global _classifier
+    if _classifier is None:
+        _classifier = RouteClassifier()
+    return _classifier
+
+
+def get_route_info(request):
+    """
+    获取请求的路由分类结果
+
+    每个请求只分类一次，结果保存在request.route_info中供后续中间件读取
+    """
+    info = getattr(request, 'route_info', None)
+    if info is None:
+        info = get_route_classifier().classify(request.path_info)
+        request.route_info = info
+    return info
+
+
+@receiver(setting_changed)
+def _reset_route_classifier(setting, **kwargs):
+    """路径相关配置变更时（如测试中的override_settings）重建分类器"""
+    global _classifier
+    if any(setting == setting_name for _, setting_name, _ in ROUTE_SETTINGS):
+        _classifier = None
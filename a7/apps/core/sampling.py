@@ -0,0 +1,76 @@
+import hmac
+import random
+
+from django.conf import settings
+from django.utils.functional import empty
+
+from apps.core.metrics import get_route_name
+
+
+class LogSampler:
+    """
+    请求日志尾部采样策略
+
+    在请求处理完成、状态码和耗时已知之后决定是否保留日志：
+    - 错误响应（4xx/5xx）总是保留
+    - 管理员用户（is_staff）携带调试请求头，或调试请求头的值与debug_secret一致的请求总是保留，
+      其他客户端携带调试请求头不影响采样，避免借此绕过采样刷写日志
+    - 耗时超过路由延迟预算的慢请求总是保留
+    - 其余正常请求按sample_rate随机采样
+    """
+
+    def __init__(self, sample_rate=1.0, slow_threshold=1.0, route_budgets=None, debug_header=None,
+                 debug_secret=None):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        # 路由名称（如 "GET knowledgepoint-list" 或 "knowledgepoint-list"）-> 延迟预算（秒）
+        self.route_budgets = route_budgets or {}
+        self.debug_header = debug_header
+        self.debug_secret = debug_secret
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建采样策略"""
+        return cls(
+            sample_rate=getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0),
+            slow_threshold=getattr(settings, 'REQUEST_LOG_SLOW_THRESHOLD', 1.0),
+            route_budgets=getattr(settings, 'REQUEST_LOG_ROUTE_BUDGETS', {}),
+            debug_header=getattr(settings, 'REQUEST_LOG_DEBUG_HEADER', 'X-Debug-Log'),
+            debug_secret=getattr(settings, 'REQUEST_LOG_DEBUG_SECRET', None),
+        )
+
+    def budget_for(self, request):
+        """获取请求所在路由的延迟预算（秒）"""
+        if not self.route_budgets:
+            return self.slow_threshold
+        route = get_route_name(request)
+        budget = self.route_budgets.get(route)
+        if budget is None:
+            # 不区分请求方法的配置
+            budget = self.route_budgets.get(route.split(' ', 1)[1], self.slow_threshold)
+        return budget
+
+    def keep_reason(self, request, status_code, duration):
+        """返回保留日志的原因（error/debug/slow/sampled），不保留时返回None"""
+        if status_code >= 400:
+            return 'error'
+        if self.debug_header and self.is_debug_request(request):
+            return 'debug'
+        if duration > self.budget_for(request):
+            return 'slow'
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def is_debug_request(self, request):
+        """请求是否携带有效的调试请求头（在视图执行后调用，此时已完成认证）"""
+        value = request.headers.get(self.debug_header)
+        if not value:
+            return False
+        if self.debug_secret and hmac.compare_digest(value.encode(), self.debug_secret.encode()):
+            return True
+        user = getattr(request, 'user', None)
+        # 会话中间件提供的惰性用户对象如果还未加载，不为采样单独查询数据库
+        if user is None or getattr(user, '_wrapped', None) is empty:
+            return False
+        return bool(user.is_authenticated and user.is_staff)
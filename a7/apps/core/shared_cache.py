@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, Tags, register
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+# 只在当前进程内有效的缓存后端，不能保存需要在多个worker进程间共享的数据
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# 数据库缓存后端，每次读写都是一次SQL查询
+DATABASE_BACKEND = 'django.core.cache.backends.db.DatabaseCache'
+
+# 保存需要在多个worker进程间共享的数据的缓存配置项 -> 默认缓存
+SHARED_CACHE_SETTINGS = {
+    'RATELIMIT_CACHE': 'shared',
+    'LOAD_SHEDDING_CACHE': 'shared',
+    'USER_CACHE_ALIAS': 'shared',
+    'TOKEN_BLACKLIST_FILTER_CACHE': 'shared',
+    'TOKEN_PURGE_LOCK_CACHE': 'shared',
+    'ROLE_PROPAGATION_CACHE': 'shared',
+}
+
+
+def is_shared_cache(alias):
+    """判断缓存是否在多个进程间共享"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def is_database_cache(alias):
+    """判断缓存是否使用数据库缓存表"""
+    return settings.CACHES[alias]['BACKEND'] == DATABASE_BACKEND
+
+
+def database_cache_tables():
+    """返回使用数据库缓存的缓存 -> 缓存表名"""
+    return {
+        alias: config['LOCATION']
+        for alias, config in settings.CACHES.items()
+        if is_database_cache(alias)
+    }
+
+
+def missing_cache_tables(using=DEFAULT_DB_ALIAS):
+    """返回数据库中尚未创建缓存表的缓存 -> 缓存表名（按数据库路由不在该数据库中的缓存表不计入）"""
+    tables = database_cache_tables()
+    if not tables:
+        return {}
+    existing = set(connections[using].introspection.table_names())
+    missing = {}
+    for alias, table in tables.items():
+        # 与createcachetable一致，按缓存表对应的模型判断是否应在该数据库中创建
+        if table not in existing and router.allow_migrate_model(using, caches[alias].cache_model_class):
+            missing[alias] = table
+    return missing
+
+
+def create_cache_tables(using=DEFAULT_DB_ALIAS, verbosity=1, **kwargs):
+    """
+    post_migrate信号处理：创建数据库缓存使用的缓存表
+
+    只执行migrate的部署也能直接使用共享缓存；缓存表已存在时不做任何修改
+    """
+    if database_cache_tables():
+        call_command('createcachetable', database=using, verbosity=verbosity)
+
+
+def process_local_cache_settings():
+    """返回使用了只在当前进程内有效的缓存的配置项 -> 缓存"""
+    result = {}
+    for name, default in SHARED_CACHE_SETTINGS.items():
+        alias = getattr(settings, name, default)
+        if alias in settings.CACHES and not is_shared_cache(alias):
+            result[name] = alias
+    return result
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    部署检查（manage.py check --deploy）：多进程共享的数据不能使用进程内缓存
+
+    否则限流计数、版本戳等只在写入的worker进程中生效
+    """
+    errors = []
+    for name, alias in process_local_cache_settings().items():
+        errors.append(Error(
+            f"{name}使用的缓存'{alias}'只在当前进程内有效，多个worker进程之间不共享",
+            hint='将该缓存配置为DatabaseCache、RedisCache等共享后端',
+            id='core.E001',
+        ))
+    for name, default in SHARED_CACHE_SETTINGS.items():
+        alias = getattr(settings, name, default)
+        if alias not in settings.CACHES:
+            errors.append(Error(
+                f"{name}使用的缓存'{alias}'未在CACHES中配置",
+                id='core.E002',
+            ))
+    return errors
+
+
+@register(Tags.caches, Tags.database, deploy=True)
+def check_cache_tables(app_configs, databases=None, **kwargs):
+    """
+    部署检查（manage.py check --deploy --database default）：数据库缓存使用的缓存表必须已创建
+
+    缓存表在migrate时创建（见create_cache_tables），缺少时限流、负载保护、用户缓存和后台任务的每次同步都会失败
+    """
+    errors = []
+    for using in databases or ():
+        for alias, table in missing_cache_tables(using).items():
+            errors.append(Error(
+                f"缓存'{alias}'使用的缓存表'{table}'在数据库'{using}'中不存在",
+                hint='执行 manage.py migrate 或 manage.py createcachetable 创建缓存表',
+                id='core.E003',
+            ))
+    return errors
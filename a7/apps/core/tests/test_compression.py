@@ -0,0 +1,115 @@
+import gzip
+import json
+from unittest.mock import patch
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.compression import GzipCodec, build_codecs, parse_accept_encoding
+from apps.core.middleware.compression_middleware import CompressionMiddleware
+
+LARGE_JSON = json.dumps({'results': [{'content': '课件内容段落。' * 50} for _ in range(20)]}).encode('utf-8')
+
+
+class CompressionCodecTest(SimpleTestCase):
+    """压缩编码测试"""
+
+    def test_parse_accept_encoding(self):
+        """测试解析Accept-Encoding，忽略q=0的编码"""
+        self.assertEqual(parse_accept_encoding('gzip, deflate, br;q=0'), {'gzip', 'deflate'})
+        self.assertEqual(parse_accept_encoding('GZIP;q=0.5'), {'gzip'})
+        self.assertEqual(parse_accept_encoding(''), set())
+
+    def test_gzip_round_trip(self):
+        """测试gzip压缩结果可以正常解压，且长度带有随机性"""
+        codec = GzipCodec(level=5)
+        compressed = codec.compress(LARGE_JSON)
+        self.assertEqual(gzip.decompress(compressed), LARGE_JSON)
+        lengths = {len(codec.compress(LARGE_JSON)) for _ in range(10)}
+        self.assertGreater(len(lengths), 1)
+
+    def test_stream_round_trip(self):
+        """测试流式压缩结果可以正常解压"""
+        compressor = GzipCodec().compressor()
+        data = b''.join([compressor.process(LARGE_JSON[:500]), compressor.process(LARGE_JSON[500:]), compressor.finish()])
+        self.assertEqual(gzip.decompress(data), LARGE_JSON)
+
+    def test_unavailable_codecs_ignored(self):
+        """测试未安装的可选编码被忽略"""
+        with patch('apps.core.compression.brotli', None):
+            self.assertEqual([codec.encoding for codec in build_codecs(['br', 'gzip'])], ['gzip'])
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTest(SimpleTestCase):
+    """响应压缩中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _run(self, response, accept_encoding='gzip, deflate'):
+        request = self.factory.get('/api/coursewares/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return request, CompressionMiddleware(lambda r: response)(request)
+
+    def test_large_json_compressed(self):
+        """测试超过阈值的JSON响应被压缩，并记录压缩统计"""
+        response = HttpResponse(LARGE_JSON, content_type='application/json')
+        response['ETag'] = '"abc"'
+        request, response = self._run(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), LARGE_JSON)
+        self.assertEqual(request.compression['original'], len(LARGE_JSON))
+        self.assertGreater(request.compression['ratio'], 1)
+        self.assertIn('cpu_ms', request.compression)
+
+    def test_small_response_not_compressed(self):
+        """测试小于阈值的响应不压缩"""
+        request, response = self._run(HttpResponse(b'{"ok": true}', content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(hasattr(request, 'compression'))
+
+    def test_excluded_type_not_compressed(self):
+        """测试已压缩的内容类型不再压缩"""
+        _, response = self._run(HttpResponse(b'\x89PNG' * 1000, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_client_without_gzip(self):
+        """测试客户端不接受gzip时不压缩，但声明Vary"""
+        _, response = self._run(HttpResponse(LARGE_JSON, content_type='application/json'), 'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streaming_response(self):
+        """测试流式响应被逐块压缩"""
+        chunks = [LARGE_JSON[i:i + 300] for i in range(0, len(LARGE_JSON), 300)]
+        request, response = self._run(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), LARGE_JSON)
+        self.assertTrue(request.compression['streaming'])
+
+    async def test_async_streaming_response(self):
+        """测试异步流式响应被逐块压缩"""
+        async def chunks():
+            for i in range(0, len(LARGE_JSON), 300):
+                yield LARGE_JSON[i:i + 300]
+
+        async def get_response(request):
+            return StreamingHttpResponse(chunks(), content_type='application/json')
+
+        middleware = CompressionMiddleware(get_response)
+        response = await middleware(self.factory.get('/api/coursewares/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        data = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(data), LARGE_JSON)
+
+    @override_settings(COMPRESSION_ENABLED=False)
+    def test_disabled(self):
+        """测试关闭压缩"""
+        _, response = self._run(HttpResponse(LARGE_JSON, content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core.health import HealthChecker, get_health_checker
+from apps.core.ratelimit import get_load_shedder
+from apps.core.tests.utils import DatabaseSharedCacheMixin
+
+
+class HealthCheckerTest(SimpleTestCase):
+    """就绪检查器测试"""
+
+    def test_result_cached_within_ttl(self):
+        """测试缓存有效期内不重复执行探针"""
+        calls = []
+        checker = HealthChecker({'db': lambda: calls.append(1)}, ttl=5)
+
+        self.assertFalse(checker.check(now=100.0)['cached'])
+        self.assertTrue(checker.check(now=104.0)['cached'])
+        self.assertEqual(len(calls), 1)
+        checker.check(now=105.0)
+        self.assertEqual(len(calls), 2)
+
+    def test_failure_counts(self):
+        """测试记录失败次数和连续失败次数，恢复后连续失败清零"""
+        state = {'fail': True}
+
+        def probe():
+            if state['fail']:
+                raise OperationalError('connection lost')
+
+        checker = HealthChecker({'db': probe}, ttl=0)
+        checker.check()
+        result = checker.check()
+        self.assertFalse(result['ready'])
+        self.assertEqual(result['checks']['db']['failures'], 2)
+        self.assertEqual(result['checks']['db']['consecutive_failures'], 2)
+        self.assertIn('connection lost', result['checks']['db']['error'])
+
+        state['fail'] = False
+        result = checker.check()
+        self.assertTrue(result['ready'])
+        self.assertEqual(result['checks']['db']['failures'], 2)
+        self.assertEqual(result['checks']['db']['consecutive_failures'], 0)
+        self.assertIn('latency_ms', result['checks']['db'])
+
+    def test_non_critical_failure_degraded(self):
+        """测试非关键探针失败时仍然就绪，状态为degraded"""
+        def fail():
+            raise RuntimeError('积压')
+
+        checker = HealthChecker({'db': lambda: None, 'log_sinks': fail}, critical=['db'])
+        result = checker.check()
+        self.assertTrue(result['ready'])
+        self.assertEqual(result['status'], 'degraded')
+
+
+class HealthCheckViewTest(TestCase):
+    """健康检查端点测试"""
+
+    def setUp(self):
+        cache.clear()
+        get_health_checker()._result = None
+
+    def test_liveness_no_io(self):
+        """测试存活检查不访问数据库"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/health/live/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(HEALTH_CHECK_DETAIL_ALLOWED_IPS=['127.0.0.1'])
+    def test_readiness_probes_dependencies(self):
+        """测试就绪检查返回各项依赖的结果，缓存期内不再查询数据库"""
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        checks = response.json()['checks']
+        self.assertEqual(set(checks), {'database', 'cache', 'log_sinks', 'token_blacklist', 'user_cache', 'permission_cache', 'token_blacklist_filter'})
+        self.assertTrue(all(check['ok'] for check in checks.values()))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/health/ready/')
+        self.assertTrue(response.json()['cached'])
+
+    @override_settings(HEALTH_CHECK_DETAIL_ALLOWED_IPS=['127.0.0.1'])
+    def test_readiness_database_failure(self):
+        """测试数据库不可用时返回503，响应体是检查结果而不是标准化错误格式"""
+        with patch.dict(get_health_checker().probes, {'database': self._fail}):
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertFalse(data['ready'])
+        self.assertNotIn('message', data)
+        self.assertIn('database is locked', data['checks']['database']['error'])
+
+    def test_readiness_localhost_not_trusted_by_default(self):
+        """测试默认配置下来自127.0.0.1的匿名请求（如本机反向代理转发的请求）不返回详细结果"""
+        with patch.dict(get_health_checker().probes, {'database': self._fail}):
+            response = self.client.get('/api/health/ready/', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(set(response.json()), {'ready', 'status', 'checks'})
+        self.assertNotIn('database is locked', response.content.decode())
+
+    def test_readiness_public_summary(self):
+        """测试非内部网络的匿名请求只返回是否就绪和各项检查是否通过，不暴露错误信息"""
+        with patch.dict(get_health_checker().probes, {'database': self._fail}):
+            response = self.client.get('/api/health/ready/', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(set(data), {'ready', 'status', 'checks'})
+        self.assertFalse(data['checks']['database'])
+        self.assertTrue(data['checks']['cache'])
+        self.assertNotIn('database is locked', response.content.decode())
+
+    @staticmethod
+    def _fail():
+        raise OperationalError('database is locked')
+
+
+class HealthCheckSharedCacheTest(DatabaseSharedCacheMixin, TestCase):
+    """共享缓存为数据库缓存时的健康检查端点测试"""
+
+    def setUp(self):
+        super().setUp()
+        get_health_checker()._result = None
+
+    def test_liveness_zero_queries(self):
+        """测试存活检查不经过限流和负载保护，不查询数据库和缓存表"""
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/health/live/').status_code, 200)
+        self.assertEqual(get_load_shedder().in_flight, 0)
+
+    def test_readiness_probes_shared_cache(self):
+        """测试就绪检查的缓存探针读写共享缓存"""
+        with self.assertSharedCacheQueries(100) as context:
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('a7_test_shared_cache' in query['sql'] for query in context.captured_queries))
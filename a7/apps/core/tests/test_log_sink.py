@@ -0,0 +1,147 @@
+import logging
+import os
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from apps.core.log_sink import AsyncLogSink, QueuedFileHandler, get_log_sink_stats
+
+
+class AsyncLogSinkTest(SimpleTestCase):
+    """异步日志管道测试"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, 'test.log')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _make_sink(self, **options):
+        sink = AsyncLogSink(
+            name='test',
+            filename=self.filename,
+            formatter=logging.Formatter('{levelname} {message}', style='{'),
+            **options
+        )
+        self.addCleanup(sink.close)
+        return sink
+
+    def _record(self, message):
+        return {'msg': message, 'levelname': 'INFO', 'levelno': logging.INFO}
+
+    def _read_lines(self):
+        with open(self.filename, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def test_records_written_after_close(self):
+        """测试关闭管道时队列中的记录全部写入磁盘"""
+        sink = self._make_sink()
+        for i in range(20):
+            sink.enqueue(self._record(f'message {i}'))
+        sink.close()
+
+        lines = self._read_lines()
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(lines[0], 'INFO message 0')
+        self.assertEqual(sink.stats()['written'], 20)
+
+    def test_drop_oldest_policy(self):
+        """测试drop_oldest策略在队列满时丢弃最旧的记录"""
+        sink = self._make_sink(max_queue_size=3, policy='drop_oldest')
+        # 不启动写入线程，模拟磁盘阻塞导致队列积压
+        sink._pid = os.getpid()
+        sink._thread = threading.current_thread()
+        for i in range(5):
+            self.assertTrue(sink.enqueue(self._record(f'message {i}')))
+
+        stats = sink.stats()
+        self.assertEqual(stats['queue_depth'], 3)
+        self.assertEqual(stats['dropped'], 2)
+        self.assertEqual(stats['overflows'], 2)
+        self.assertEqual(sink._queue[0]['msg'], 'message 2')
+
+    def test_block_policy_drops_after_timeout(self):
+        """测试block策略等待超时后丢弃新记录"""
+        sink = self._make_sink(max_queue_size=1, policy='block', block_timeout=0.01)
+        sink._pid = os.getpid()
+        sink._thread = threading.current_thread()
+
+        self.assertTrue(sink.enqueue(self._record('first')))
+        self.assertFalse(sink.enqueue(self._record('second')))
+        self.assertEqual(sink.stats()['dropped'], 1)
+
+    def test_sample_policy_under_pressure(self):
+        """测试sample策略在积压超过水位线后按比例丢弃"""
+        sink = self._make_sink(max_queue_size=10, policy='sample', sample_rate=0.0, sample_watermark=0.5)
+        sink._pid = os.getpid()
+        sink._thread = threading.current_thread()
+
+        accepted = sum(sink.enqueue(self._record(str(i))) for i in range(10))
+        self.assertEqual(accepted, 5)
+        self.assertEqual(sink.stats()['sampled_out'], 5)
+
+    def test_rotation(self):
+        """测试文件超过大小限制时轮转"""
+        sink = self._make_sink(max_bytes=100, backup_count=2, batch_size=1)
+        for i in range(30):
+            sink.enqueue(self._record('x' * 20))
+        sink.close()
+
+        self.assertTrue(os.path.exists(f'{self.filename}.1'))
+        self.assertFalse(os.path.exists(f'{self.filename}.3'))
+        self.assertGreater(sink.stats()['rotations'], 0)
+
+    def test_rotation_by_other_process(self):
+        """测试其他进程轮转文件后重新打开，不重复轮转"""
+        sink = self._make_sink(max_bytes=1000, backup_count=2)
+        sink._write_batch([self._record('before')])
+        # 模拟另一个进程完成轮转
+        os.replace(self.filename, f'{self.filename}.1')
+        sink._write_batch([self._record('after')])
+        sink._write_batch([self._record('reopened')])
+        sink.close()
+
+        self.assertEqual(self._read_lines(), ['INFO reopened'])
+        self.assertEqual(sink.stats()['rotations'], 0)
+        self.assertFalse(os.path.exists(f'{self.filename}.2'))
+
+    def test_unformattable_batch_writes_nothing(self):
+        """测试整批记录都无法格式化时不写入空行"""
+        sink = self._make_sink()
+        sink.formatter = logging.Formatter('{missing}', style='{')
+        sink._write_batch([self._record('x')])
+        sink.close()
+
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertEqual(sink.stats()['write_errors'], 1)
+
+    def test_invalid_policy(self):
+        """测试未知背压策略会抛出异常"""
+        with self.assertRaises(ValueError):
+            AsyncLogSink(name='bad', filename=self.filename, policy='unknown')
+
+
+class QueuedFileHandlerTest(SimpleTestCase):
+    """队列日志处理器测试"""
+
+    def test_handler_formats_in_writer_thread(self):
+        """测试处理器通过管道写入格式化后的日志并注册统计信息"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'handler.log')
+            handler = QueuedFileHandler(filename)
+            handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+
+            test_logger = logging.getLogger('log_sink_test')
+            test_logger.addHandler(handler)
+            test_logger.propagate = False
+            try:
+                test_logger.warning('用户 %s 登录', 'alice')
+            finally:
+                test_logger.removeHandler(handler)
+                handler.close()
+
+            with open(filename, encoding='utf-8') as f:
+                self.assertEqual(f.read().strip(), 'WARNING 用户 alice 登录')
+            self.assertIn('handler.log', get_log_sink_stats())
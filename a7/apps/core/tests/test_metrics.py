@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, SimpleTestCase, RequestFactory
+from django.http import JsonResponse
+
+from apps.core.metrics import LatencyHistogram, LatencyAggregator, RouteMetricAggregator
+from apps.core.middleware.request_logging_middleware import RequestLoggingMiddleware
+from apps.core.models import PerformanceMetric
+from apps.core.routing import get_route_info
+
+
+class LatencyHistogramTest(SimpleTestCase):
+    """延迟直方图测试"""
+
+    def test_percentiles_within_precision(self):
+        """测试百分位数的相对误差在精度范围内"""
+        histogram = LatencyHistogram()
+        for value in range(1, 10001):
+            histogram.record(value * 100)
+
+        self.assertEqual(histogram.count, 10000)
+        for percent, expected in ((50, 500000), (90, 900000), (99, 990000)):
+            actual = histogram.percentile(percent)
+            self.assertLess(abs(actual - expected) / expected, 0.02)
+        self.assertEqual(histogram.percentile(100), 1000000)
+
+    def test_small_values_exact(self):
+        """测试小数值精确记录"""
+        histogram = LatencyHistogram()
+        for value in (1, 2, 3, 4):
+            histogram.record(value)
+        self.assertEqual(histogram.percentile(50), 2)
+        self.assertEqual(histogram.summary()['count'], 4)
+
+    def test_empty_histogram(self):
+        """测试空直方图"""
+        self.assertEqual(LatencyHistogram().percentile(99), 0)
+
+
+class LatencyAggregatorTest(TestCase):
+    """延迟聚合器测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.aggregator = LatencyAggregator()
+
+    def _request(self, path, view_name):
+        request = self.factory.get(path)
+        request.resolver_match = MagicMock(view_name=view_name)
+        get_route_info(request)
+        return request
+
+    def test_flush_writes_one_row_per_route_and_status_class(self):
+        """测试每个路由和状态码类别每个窗口只写入一行"""
+        for i in range(50):
+            self.aggregator.record(self._request(f'/api/courses/{i}/', 'course-detail'), 200, 0.010)
+        self.aggregator.record(self._request('/api/courses/999/', 'course-detail'), 404, 0.002)
+
+        written = self.aggregator.flush()
+
+        self.assertEqual(written, 2)
+        metric = PerformanceMetric.objects.get(related_entity='GET course-detail 2xx')
+        self.assertEqual(metric.metric_type, 'api_latency')
+        self.assertEqual(metric.unit, 'ms')
+        context = metric.get_context_dict()
+        self.assertEqual(context['count'], 50)
+        for key in ('p50', 'p90', 'p99', 'max', 'window_start', 'window_end'):
+            self.assertIn(key, context)
+        self.assertAlmostEqual(context['p99'], 10.0, delta=0.2)
+
+    def test_query_count_rollup(self):
+        """测试查询次数按原始数值汇总，不做毫秒换算"""
+        aggregator = RouteMetricAggregator('test-queries', unit='queries', scale=1)
+        for count in (3, 3, 25):
+            aggregator.add(self._request('/api/knowledge-points/', 'knowledgepoint-list'), 200, 'db_queries', count)
+
+        self.assertEqual(aggregator.flush(), 1)
+        metric = PerformanceMetric.objects.get(metric_type='db_queries')
+        self.assertEqual(metric.unit, 'queries')
+        self.assertEqual(metric.value, 25)
+        self.assertEqual(metric.get_context_dict()['p50'], 3)
+
+    def test_flush_empty_window(self):
+        """测试空窗口不写入数据库"""
+        self.assertEqual(self.aggregator.flush(), 0)
+        self.assertFalse(PerformanceMetric.objects.exists())
+
+    def test_unresolved_requests_grouped(self):
+        """测试未解析路由的请求归为同一维度"""
+        request = self.factory.get('/random/path/')
+        self.aggregator.record(request, 404, 0.001)
+        _, _, histograms = self.aggregator.snapshot()
+        self.assertEqual(list(histograms), [('GET unresolved', '4xx', 'response_time')])
+
+    def test_logging_middleware_records_latency(self):
+        """测试请求日志中间件记录延迟而不写数据库"""
+        middleware = RequestLoggingMiddleware(MagicMock(return_value=JsonResponse({}, status=200)))
+        with patch('apps.core.middleware.request_logging_middleware.latency_aggregator') as mock_aggregator, \
+                patch('apps.core.middleware.request_logging_middleware.logger'):
+            with self.assertNumQueries(0):
+                middleware(self.factory.get('/api/courses/'))
+        mock_aggregator.record.assert_called_once()
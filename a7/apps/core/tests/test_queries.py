@@ -0,0 +1,136 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core.middleware.query_tracking_middleware import QueryTrackingMiddleware
+from apps.core.queries import QueryTracker, fingerprint
+from apps.core.tests.utils import SHARED_CACHE_TABLE, DatabaseSharedCacheMixin
+from users.tokens import PermissionRefreshToken
+
+User = get_user_model()
+
+
+class FingerprintTest(SimpleTestCase):
+    """SQL指纹测试"""
+
+    def test_literals_replaced(self):
+        """测试字面量被替换，参数占位符保留"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t1 WHERE a = 10 AND b = 'x''y' AND c = %s LIMIT 21"),
+            "SELECT * FROM t1 WHERE a = ? AND b = ? AND c = %s LIMIT ?",
+        )
+
+    def test_in_lists_collapsed(self):
+        """测试长度不同的IN参数列表得到相同指纹"""
+        self.assertEqual(
+            fingerprint('SELECT id FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT id FROM t WHERE id IN (%s,%s,%s)'),
+        )
+
+
+class QueryTrackerTest(SimpleTestCase):
+    """查询统计测试"""
+
+    def test_repeated(self):
+        """测试按查询形状统计执行次数"""
+        tracker = QueryTracker()
+        for i in range(3):
+            tracker.record('SELECT * FROM users_user WHERE id = %s', 0.001)
+        tracker.record('SELECT COUNT(*) FROM courses_course', 0.002)
+
+        self.assertEqual(tracker.count, 4)
+        self.assertEqual(tracker.repeated(3), [('SELECT * FROM users_user WHERE id = %s', 3)])
+        summary = tracker.as_dict()
+        self.assertEqual(summary['time'], 5.0)
+        self.assertEqual(summary['repeated'][0]['count'], 3)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'shared_cache'},
+    })
+    def test_cache_table_queries_counted_separately(self):
+        """测试数据库缓存表的查询单独计数，不参与N+1检测"""
+        tracker = QueryTracker()
+        for _ in range(6):
+            tracker.record('SELECT "cache_key", "value" FROM "shared_cache" WHERE "cache_key" = %s', 0.001)
+        tracker.record('SELECT COUNT(*) FROM courses_course', 0.001)
+
+        self.assertEqual(tracker.count, 1)
+        self.assertEqual(tracker.cache_count, 6)
+        self.assertEqual(tracker.repeated(5), [])
+
+
+@override_settings(LATENCY_METRICS_ENABLED=False)
+class QueryTrackingMiddlewareTest(TestCase):
+    """查询统计中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.users = [User.objects.create_user(username=f'user{i}', password='password') for i in range(6)]
+
+    def _view(self, request):
+        # 逐个查询用户，模拟N+1
+        for user in self.users:
+            User.objects.get(pk=user.pk)
+        return JsonResponse({})
+
+    @patch('apps.core.middleware.query_tracking_middleware.logger')
+    def test_n_plus_one_logged(self, mock_logger):
+        """测试重复查询达到阈值时记录N+1警告"""
+        request = self.factory.get('/api/users/')
+        request.resolver_match = MagicMock(view_name='user-list')
+
+        QueryTrackingMiddleware(self._view)(request)
+
+        self.assertEqual(request.query_tracker.count, 6)
+        mock_logger.warning.assert_called_once()
+        message = mock_logger.warning.call_args[0][0]
+        self.assertIn('N+1', message)
+        self.assertIn('GET user-list', message)
+        self.assertIn('重复次数=6', message)
+
+    @patch('apps.core.middleware.query_tracking_middleware.logger')
+    @override_settings(N_PLUS_ONE_THRESHOLD=10)
+    def test_below_threshold_not_logged(self, mock_logger):
+        """测试未达到阈值时不记录警告"""
+        QueryTrackingMiddleware(self._view)(self.factory.get('/api/users/'))
+        mock_logger.warning.assert_not_called()
+
+    @override_settings(LATENCY_METRICS_ENABLED=True)
+    def test_query_count_aggregated(self):
+        """测试查询次数按路由汇总"""
+        with patch('apps.core.middleware.query_tracking_middleware.query_aggregator') as mock_aggregator, \
+                patch('apps.core.middleware.query_tracking_middleware.logger'):
+            QueryTrackingMiddleware(self._view)(self.factory.get('/api/users/'))
+        args = mock_aggregator.add.call_args[0]
+        self.assertEqual(args[1:], (200, 'db_queries', 6))
+
+    def test_queries_outside_request_not_tracked(self):
+        """测试请求结束后的查询不再计入统计"""
+        request = self.factory.get('/api/users/')
+        QueryTrackingMiddleware(lambda r: JsonResponse({}))(request)
+        User.objects.count()
+        self.assertEqual(request.query_tracker.count, 0)
+
+
+@override_settings(LATENCY_METRICS_ENABLED=False)
+class QueryTrackingStackTest(DatabaseSharedCacheMixin, TestCase):
+    """完整中间件栈下的查询统计测试（共享缓存为数据库缓存）"""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='student', password='password', role='student')
+        self.auth = f'Bearer {PermissionRefreshToken.for_user(user).access_token}'
+
+    @patch('apps.core.middleware.query_tracking_middleware.logger')
+    def test_clean_view_not_reported(self, mock_logger):
+        """测试中间件读写缓存表不会被误报为N+1查询"""
+        with self.assertSharedCacheQueries(100) as context:
+            for _ in range(3):
+                response = self.client.get('/api/courses/', HTTP_AUTHORIZATION=self.auth)
+                self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(any(SHARED_CACHE_TABLE in query['sql'] for query in context.captured_queries))
+        mock_logger.warning.assert_not_called()
@@ -0,0 +1,302 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core.middleware.load_shedding_middleware import LoadSheddingMiddleware
+from apps.core.middleware.rate_limit_middleware import RateLimitMiddleware
+from apps.core.ratelimit import (
+    LoadShedder, RateLimitRule, SlidingWindowLimiter, get_load_shedder, parse_rate
+)
+from apps.core.tests.utils import DatabaseSharedCacheMixin
+
+TEST_RULES = [
+    {'name': 'token', 'paths': ['/api/token/'], 'methods': ['POST'], 'key': 'ip', 'rate': '2/m'},
+    {'name': 'api-user', 'paths': ['/api/'], 'key': 'user', 'rate': '3/m'},
+]
+
+
+class SlidingWindowLimiterTest(SimpleTestCase):
+    """滑动窗口限流器测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.limiter = SlidingWindowLimiter([RateLimitRule(**rule) for rule in TEST_RULES])
+
+    def test_parse_rate(self):
+        """测试解析限流速率"""
+        self.assertEqual(parse_rate('60/m'), (60, 60))
+        self.assertEqual(parse_rate('100/5m'), (100, 300))
+        self.assertEqual(parse_rate('1000/d'), (1000, 86400))
+
+    def test_window_weighting(self):
+        """测试上一个窗口的计数按剩余比例计入当前窗口"""
+        for _ in range(4):
+            self.assertEqual(self.limiter.hit('k', 4, 60, now=119.0), 0)
+        # 新窗口过去一半时，上一个窗口的4次按一半计入
+        self.assertEqual(self.limiter.hit('k', 4, 60, now=150.0), 0)
+        self.assertEqual(self.limiter.hit('k', 4, 60, now=150.0), 0)
+        self.assertEqual(self.limiter.hit('k', 4, 60, now=150.0), 30)
+
+    def test_rules_for_request(self):
+        """测试按路径和方法匹配规则"""
+        post = self.factory.post('/api/token/')
+        get = self.factory.get('/api/token/')
+        self.assertEqual([rule.name for rule in self.limiter.rules_for(post)], ['token', 'api-user'])
+        self.assertEqual([rule.name for rule in self.limiter.rules_for(get)], ['api-user'])
+        self.assertEqual(self.limiter.rules_for(self.factory.get('/admin/')), [])
+
+    def test_exempt_paths_not_counted(self):
+        """测试不限流的路径即使匹配规则也不计数"""
+        limiter = SlidingWindowLimiter(
+            [RateLimitRule(**rule) for rule in TEST_RULES], exempt_paths=['/api/health/']
+        )
+        self.assertEqual(limiter.rules_for(self.factory.get('/api/health/live/')), [])
+        self.assertEqual(len(limiter.rules_for(self.factory.get('/api/courses/'))), 1)
+
+    def test_user_key_falls_back_to_ip(self):
+        """测试未认证请求按IP限流，认证请求按用户限流"""
+        request = self.factory.get('/api/courses/')
+        self.assertEqual(self.limiter.identify(request, 'user'), 'ip:127.0.0.1')
+        request.token_payload = {'user_id': 7}
+        self.assertEqual(self.limiter.identify(request, 'user'), 'user:7')
+
+    def test_ip_username_key(self):
+        """测试登录规则按IP和用户名计数，用户名大小写不敏感"""
+        alice = self.factory.post('/api/token/', {'username': 'Alice'}, content_type='application/json')
+        alice_lower = self.factory.post('/api/token/', {'username': 'alice'})
+        bob = self.factory.post('/api/token/', {'username': 'bob'}, content_type='application/json')
+        key = self.limiter.identify(alice, 'ip-username')
+        self.assertTrue(key.startswith('ip:127.0.0.1:username:'))
+        self.assertEqual(key, self.limiter.identify(alice_lower, 'ip-username'))
+        self.assertNotEqual(key, self.limiter.identify(bob, 'ip-username'))
+
+    @override_settings(RATELIMIT_RULES=TEST_RULES)
+    def test_ip_rules_opt_in(self):
+        """测试默认跳过按IP的规则，开启RATELIMIT_IP_RULES_ENABLED后生效"""
+        self.assertEqual([rule.name for rule in SlidingWindowLimiter.from_settings().rules], ['api-user'])
+        with self.settings(RATELIMIT_IP_RULES_ENABLED=True):
+            self.assertEqual(
+                [rule.name for rule in SlidingWindowLimiter.from_settings().rules], ['token', 'api-user']
+            )
+
+    def test_cache_failure_allows_request(self):
+        """测试共享缓存不可用时放行请求"""
+        with patch.object(SlidingWindowLimiter, 'hit', side_effect=ConnectionError), \
+                patch('apps.core.ratelimit.logger'):
+            self.assertTrue(self.limiter.check(self.factory.post('/api/token/')).allowed)
+
+    def test_forwarded_for_not_trusted_by_default(self):
+        """测试默认不信任X-Forwarded-For，避免伪造请求头绕过限流"""
+        request = self.factory.get('/api/courses/', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(self.limiter.get_client_ip(request), '127.0.0.1')
+
+
+class RateLimitMiddlewareTest(SimpleTestCase):
+    """限流中间件测试"""
+
+    def setUp(self):
+        cache.clear()
+        # 每个测试重新创建限流器，清除上一个测试在进程内累计的计数
+        override = override_settings(
+            RATELIMIT_ENABLED=True, RATELIMIT_RULES=TEST_RULES, RATELIMIT_IP_RULES_ENABLED=True
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.factory = RequestFactory()
+        self.middleware = RateLimitMiddleware(MagicMock(return_value=JsonResponse({})))
+
+    @patch('apps.core.middleware.rate_limit_middleware.logger')
+    def test_returns_429_after_limit(self, mock_logger):
+        """测试超过限制后返回429和Retry-After"""
+        for _ in range(2):
+            self.assertEqual(self.middleware(self.factory.post('/api/token/')).status_code, 200)
+
+        response = self.middleware(self.factory.post('/api/token/'))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        data = json.loads(response.content)
+        self.assertTrue(data['error'])
+        self.assertEqual(data['status_code'], 429)
+        mock_logger.warning.assert_called_once()
+
+    @patch('apps.core.middleware.rate_limit_middleware.logger')
+    def test_users_limited_separately(self, mock_logger):
+        """测试不同用户的计数互不影响"""
+        for user_id in (1, 2):
+            for _ in range(3):
+                request = self.factory.get('/api/courses/')
+                request.token_payload = {'user_id': user_id}
+                self.assertEqual(self.middleware(request).status_code, 200)
+        mock_logger.warning.assert_not_called()
+
+    @override_settings(RATELIMIT_ENABLED=False)
+    def test_disabled(self):
+        """测试关闭限流后不检查"""
+        middleware = RateLimitMiddleware(MagicMock(return_value=JsonResponse({})))
+        for _ in range(5):
+            self.assertEqual(middleware(self.factory.post('/api/token/')).status_code, 200)
+
+
+class SharedCounterSyncTest(DatabaseSharedCacheMixin, TestCase):
+    """共享缓存为数据库缓存时的限流计数测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def _limiter(self):
+        return SlidingWindowLimiter([RateLimitRule(**rule) for rule in TEST_RULES], sync_interval=0.5)
+
+    def test_requests_do_not_query_shared_cache(self):
+        """测试同步周期内的请求只在进程内计数，不查询缓存表"""
+        limiter = self._limiter()
+        with self.assertNumQueries(0):
+            results = [limiter.check(self.factory.post('/api/token/')) for _ in range(3)]
+            limiter.check(self.factory.get('/admin/'))
+        self.assertEqual([result.allowed for result in results], [True, True, False])
+
+    def test_sync_query_budget(self):
+        """测试一次同步的查询数只与新增计数的键数有关，与请求数无关"""
+        limiter = self._limiter()
+        for _ in range(10):
+            limiter.check(self.factory.get('/api/courses/'))
+        # 1个键：写入计数（不存在时插入）+ 一次批量读取
+        with self.assertSharedCacheQueries(4):
+            limiter.sync()
+        for _ in range(10):
+            limiter.check(self.factory.get('/api/courses/'))
+        # 键已存在时直接递增（读取 + 更新）
+        with self.assertSharedCacheQueries(5):
+            limiter.sync()
+        self.assertEqual(limiter._shared[next(iter(limiter._shared))][0], 20)
+
+    def test_other_process_counts_after_sync(self):
+        """测试其他进程的计数在同步后计入预算"""
+        other = self._limiter()
+        for _ in range(2):
+            self.assertTrue(other.check(self.factory.post('/api/token/')).allowed)
+        other.sync()
+
+        limiter = self._limiter()
+        self.assertTrue(limiter.check(self.factory.post('/api/token/')).allowed)
+        limiter.sync()
+        result = limiter.check(self.factory.post('/api/token/'))
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.rule, 'token')
+
+
+@override_settings(
+    LOAD_SHEDDING_LIMITS={'low': 1, 'normal': 2},
+    LOAD_SHEDDING_PRIORITIES={'low': ['/api/knowledge-points/'], 'high': ['/api/token/']},
+)
+class LoadSheddingTest(SimpleTestCase):
+    """负载保护测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_priority_for(self):
+        """测试按路径获取优先级"""
+        shedder = LoadShedder.from_settings()
+        self.assertEqual(shedder.priority_for(self.factory.get('/api/knowledge-points/1/')), 'low')
+        self.assertEqual(shedder.priority_for(self.factory.get('/api/token/refresh/')), 'high')
+        self.assertEqual(shedder.priority_for(self.factory.get('/api/courses/')), 'normal')
+
+    def test_low_priority_shed_first(self):
+        """测试低优先级请求先被拒绝，高优先级请求不受限制"""
+        shedder = LoadShedder.from_settings()
+        self.assertTrue(shedder.acquire(self.factory.get('/api/courses/')))
+        self.assertFalse(shedder.acquire(self.factory.get('/api/knowledge-points/')))
+        self.assertTrue(shedder.acquire(self.factory.get('/api/courses/')))
+        self.assertFalse(shedder.acquire(self.factory.get('/api/courses/')))
+        self.assertTrue(shedder.acquire(self.factory.get('/api/token/')))
+        self.assertEqual(shedder.in_flight, 3)
+        self.assertEqual(shedder.shed, 2)
+
+    @patch('apps.core.middleware.load_shedding_middleware.logger')
+    def test_middleware_returns_503(self, mock_logger):
+        """测试负载过高时中间件返回503"""
+        shedder = get_load_shedder()
+        self.assertTrue(shedder.acquire(self.factory.get('/api/courses/')))
+        try:
+            middleware = LoadSheddingMiddleware(MagicMock(return_value=JsonResponse({})))
+            response = middleware(self.factory.get('/api/knowledge-points/'))
+        finally:
+            shedder.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content)['status_code'], 503)
+
+    def test_counts_other_processes(self):
+        """测试其他进程通过共享缓存发布的处理中请求数计入阈值"""
+        other = LoadShedder.from_settings()
+        other.process_key = lambda: 'load-shedding:other-host:1'
+        self.assertTrue(other.acquire(self.factory.get('/api/courses/')))
+        other.sync()
+
+        shedder = LoadShedder.from_settings()
+        self.assertFalse(shedder.acquire(self.factory.get('/api/knowledge-points/')))
+        self.assertEqual(shedder.others_in_flight, 1)
+        self.assertEqual(shedder.in_flight, 0)
+
+        # 其他进程处理结束后，下一次同步时恢复
+        other.release()
+        other.sync()
+        shedder.sync()
+        self.assertTrue(shedder.acquire(self.factory.get('/api/knowledge-points/')))
+
+    @override_settings(LOAD_SHEDDING_EXEMPT_PATHS=['/api/health/'])
+    def test_exempt_paths_bypass(self):
+        """测试不参与负载保护的路径在超过阈值时也放行，且不计数"""
+        shedder = get_load_shedder()
+        for _ in range(2):
+            self.assertTrue(shedder.acquire(self.factory.get('/api/courses/')))
+        middleware = LoadSheddingMiddleware(MagicMock(return_value=JsonResponse({})))
+        self.assertEqual(middleware(self.factory.get('/api/health/live/')).status_code, 200)
+        self.assertEqual(shedder.in_flight, 2)
+        self.assertTrue(shedder.is_exempt(self.factory.get('/api/health/ready/')))
+
+    def test_release_on_exception(self):
+        """测试视图抛出异常时也会释放计数"""
+        middleware = LoadSheddingMiddleware(MagicMock(side_effect=RuntimeError))
+        with self.assertRaises(RuntimeError):
+            middleware(self.factory.get('/api/courses/'))
+        self.assertEqual(get_load_shedder().in_flight, 0)
+
+
+@override_settings(
+    LOAD_SHEDDING_LIMITS={'low': 1, 'normal': 2},
+    LOAD_SHEDDING_PRIORITIES={'low': ['/api/knowledge-points/'], 'high': ['/api/token/']},
+)
+class AsyncLoadSheddingTest(DatabaseSharedCacheMixin, TestCase):
+    """共享缓存为数据库缓存时异步负载保护中间件的测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    async def async_get_response(self, request):
+        return JsonResponse({})
+
+    @patch('apps.core.middleware.load_shedding_middleware.logger')
+    @patch('apps.core.ratelimit.logger')
+    async def test_async_middleware_counts_other_processes(self, mock_ratelimit_logger, mock_logger):
+        """测试异步模式下在线程池中同步共享缓存，其他进程的处理中请求数计入阈值"""
+        other = LoadShedder.from_settings()
+        other.process_key = lambda: 'load-shedding:other-host:1'
+        self.assertTrue(await sync_to_async(other.acquire)(self.factory.get('/api/courses/')))
+        await sync_to_async(other.sync)()
+
+        middleware = LoadSheddingMiddleware(self.async_get_response)
+        response = await middleware(self.factory.get('/api/knowledge-points/'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(get_load_shedder().others_in_flight, 1)
+        mock_ratelimit_logger.exception.assert_not_called()
@@ -0,0 +1,87 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from apps.core.middleware.request_processor_middleware import RequestProcessorMiddleware
+from apps.core.renderers import EnvelopeJSONRenderer, build_error_envelope
+
+
+@override_settings(STANDARDIZE_API_RESPONSE=True)
+class EnvelopeJSONRendererTest(SimpleTestCase):
+    """标准化响应渲染器测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.renderer = EnvelopeJSONRenderer()
+
+    def _render(self, path, data, status=200):
+        response = Response(data, status=status)
+        response.accepted_renderer = self.renderer
+        context = {'request': Request(self.factory.get(path)), 'response': response}
+        content = self.renderer.render(data, 'application/json', context)
+        return response, json.loads(content)
+
+    def test_success_envelope(self):
+        """测试成功响应在渲染时被包装"""
+        response, body = self._render('/api/courses/', [{'id': 1}])
+        self.assertEqual(body, {'success': True, 'status_code': 200, 'data': [{'id': 1}]})
+        self.assertEqual(response.data, body)
+        self.assertTrue(response.envelope_rendered)
+
+    def test_browsable_preview_not_wrapped(self):
+        """测试可视化API渲染器调用本渲染器生成内容预览时不包装"""
+        response = Response({'id': 1})
+        response.accepted_renderer = BrowsableAPIRenderer()
+        context = {'request': Request(self.factory.get('/api/courses/')), 'response': response}
+        body = json.loads(self.renderer.render({'id': 1}, 'application/json', context))
+        self.assertEqual(body, {'id': 1})
+        self.assertEqual(response.data, {'id': 1})
+        self.assertFalse(getattr(response, 'envelope_rendered', False))
+
+    def test_error_envelope(self):
+        """测试错误响应在渲染时被包装"""
+        _, body = self._render('/api/courses/1/', {'detail': '未找到。'}, status=404)
+        self.assertEqual(body, {'error': True, 'status_code': 404, 'message': '未找到。'})
+
+    def test_already_standard_data_not_wrapped(self):
+        """测试已经是标准格式的数据不会被再次包装"""
+        data = {'success': True, 'data': []}
+        _, body = self._render('/api/coursewares/by_course/', data)
+        self.assertEqual(body, data)
+
+    def test_non_api_path_not_wrapped(self):
+        """测试非API路径不进行包装"""
+        _, body = self._render('/swagger/', {'a': 1})
+        self.assertEqual(body, {'a': 1})
+
+    @override_settings(STANDARDIZE_API_RESPONSE=False)
+    def test_disabled_by_setting(self):
+        """测试关闭配置后不进行包装"""
+        _, body = self._render('/api/courses/', {'a': 1})
+        self.assertEqual(body, {'a': 1})
+
+    def test_error_envelope_keeps_extra_fields(self):
+        """测试错误包装保留额外字段"""
+        envelope = build_error_envelope({'detail': '无效', 'title': ['必填']}, 400)
+        self.assertEqual(envelope['message'], '无效')
+        self.assertEqual(envelope['title'], ['必填'])
+
+    def test_middleware_skips_rendered_envelope(self):
+        """测试中间件不会对渲染器已包装的响应重新渲染"""
+        request = self.factory.get('/api/courses/')
+        response = Response({'id': 1})
+        response.accepted_renderer = self.renderer
+        response.accepted_media_type = 'application/json'
+        response.renderer_context = {'request': Request(request), 'response': response}
+        response.render()
+
+        middleware = RequestProcessorMiddleware(MagicMock(return_value=response))
+        with patch.object(EnvelopeJSONRenderer, 'render') as mock_render:
+            result = middleware(request)
+
+        mock_render.assert_not_called()
+        self.assertEqual(json.loads(result.content)['data'], {'id': 1})
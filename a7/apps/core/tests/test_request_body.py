@@ -0,0 +1,76 @@
+import json
+from unittest.mock import patch
+
+from django.http import JsonResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from rest_framework.request import Request
+
+from apps.core.middleware.request_logging_middleware import RequestLoggingMiddleware
+from apps.core.middleware.request_processor_middleware import RequestProcessorMiddleware
+from apps.core.parsers import CachedJSONParser
+from apps.core.request_body import get_json_body
+
+
+class RequestBodyCacheTest(SimpleTestCase):
+    """请求体缓存测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_body_parsed_once(self):
+        """测试同一请求的请求体只解析一次"""
+        request = self.factory.post('/api/courses/', data={'title': '数学'}, content_type='application/json')
+        with patch('apps.core.request_body.json.loads', wraps=json.loads) as mock_loads:
+            first = get_json_body(request)
+            second = get_json_body(request)
+        self.assertEqual(first, {'title': '数学'})
+        self.assertIs(first, second)
+        mock_loads.assert_called_once()
+
+    def test_parse_error_cached(self):
+        """测试解析错误同样被缓存"""
+        request = self.factory.post('/api/courses/', data='{invalid', content_type='application/json')
+        with self.assertRaises(ValueError):
+            get_json_body(request)
+        with self.assertRaises(ValueError):
+            get_json_body(request)
+
+    def test_non_standard_constant_rejected(self):
+        """测试NaN等非标准常量被拒绝，与DRF严格模式一致"""
+        request = self.factory.post('/api/courses/', data='{"score": NaN}', content_type='application/json')
+        with self.assertRaises(ValueError):
+            get_json_body(request)
+
+    def test_empty_body(self):
+        """测试空请求体返回None"""
+        request = self.factory.post('/api/courses/', data='', content_type='application/json')
+        self.assertIsNone(get_json_body(request))
+
+    @override_settings(LOG_REQUEST_BODY=True)
+    def test_middlewares_and_parser_share_parsed_body(self):
+        """测试日志中间件、处理中间件和DRF解析器共享同一次解析结果"""
+        payload = {'title': '课件', 'password': 'secret'}
+        request = self.factory.post('/api/coursewares/', data=payload, content_type='application/json')
+        seen = {}
+
+        def view(req):
+            drf_request = Request(req, parsers=[CachedJSONParser()])
+            seen['data'] = drf_request.data
+            return JsonResponse({'ok': True})
+
+        processor = RequestProcessorMiddleware(view)
+        logging_middleware = RequestLoggingMiddleware(processor)
+        with patch('apps.core.request_body.json.loads', wraps=json.loads) as mock_loads, \
+                patch('apps.core.middleware.request_logging_middleware.logger'):
+            logging_middleware(request)
+
+        mock_loads.assert_called_once()
+        self.assertIs(seen['data'], request.json_data)
+        # 日志中的脱敏处理不能影响视图获得的数据
+        self.assertEqual(seen['data']['password'], 'secret')
+
+    def test_parser_falls_back_without_cached_body(self):
+        """测试没有中间件解析结果时解析器使用标准解析"""
+        request = self.factory.post('/admin/', data={'a': 1}, content_type='application/json')
+        drf_request = Request(request, parsers=[CachedJSONParser()])
+        self.assertEqual(drf_request.data, {'a': 1})
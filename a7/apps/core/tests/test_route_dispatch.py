@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.checks import run_checks
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core.middleware import (
+    RouteDispatchMiddleware,
+    StatefulCsrfViewMiddleware,
+    StatefulSessionMiddleware,
+    StatefulXFrameOptionsMiddleware,
+)
+
+
+def view(request):
+    return HttpResponse('ok')
+
+
+class RouteDispatchMiddlewareTest(SimpleTestCase):
+    """按路由跳过有状态中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = self._chain()
+
+    def _chain(self):
+        return RouteDispatchMiddleware(StatefulSessionMiddleware(StatefulXFrameOptionsMiddleware(view)))
+
+    def test_stateless_api_skips_stateful_middleware(self):
+        """测试携带Bearer令牌的API请求跳过会话等中间件"""
+        request = self.factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token')
+        response = self.middleware(request)
+
+        self.assertTrue(request.stateless_api)
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(request.user.is_authenticated)
+        self.assertNotIn('X-Frame-Options', response)
+
+    def test_admin_runs_stateful_middleware(self):
+        """测试管理后台请求执行有状态中间件"""
+        request = self.factory.get('/admin/')
+        response = self.middleware(request)
+
+        self.assertFalse(request.stateless_api)
+        self.assertTrue(hasattr(request, 'session'))
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    def test_browsable_api_runs_stateful_middleware(self):
+        """测试浏览器访问可视化API时执行有状态中间件"""
+        request = self.factory.get('/api/courses/', HTTP_ACCEPT='text/html,application/xhtml+xml')
+        self.middleware(request)
+        self.assertFalse(request.stateless_api)
+
+    def test_session_cookie_without_token_runs_stateful_middleware(self):
+        """测试只携带会话Cookie的API请求执行有状态中间件，同时携带Bearer令牌时跳过"""
+        self.factory.cookies[settings.SESSION_COOKIE_NAME] = 'session-key'
+
+        request = self.factory.get('/api/courses/')
+        self.middleware(request)
+        self.assertFalse(request.stateless_api)
+
+        request = self.factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token')
+        self.middleware(request)
+        self.assertTrue(request.stateless_api)
+
+    @override_settings(STATELESS_API_ENABLED=False)
+    def test_disabled(self):
+        """测试关闭后所有请求都执行有状态中间件"""
+        middleware = self._chain()
+        request = self.factory.get('/api/courses/', HTTP_AUTHORIZATION='Bearer token')
+        middleware(request)
+        self.assertFalse(request.stateless_api)
+        self.assertTrue(hasattr(request, 'session'))
+
+    def test_csrf_view_hook_skipped_for_stateless(self):
+        """测试CSRF中间件的process_view钩子只对有状态请求执行检查"""
+        csrf = StatefulCsrfViewMiddleware(view)
+
+        request = self.factory.post('/admin/login/')
+        RouteDispatchMiddleware(csrf)(request)
+        self.assertEqual(csrf.process_view(request, view, (), {}).status_code, 403)
+
+        request = self.factory.post('/api/courses/', HTTP_AUTHORIZATION='Bearer token')
+        RouteDispatchMiddleware(csrf)(request)
+        self.assertIsNone(csrf.process_view(request, view, (), {}))
+
+    def test_admin_checks_pass(self):
+        """测试有状态中间件仍在MIDDLEWARE中，管理后台的中间件检查不需要忽略"""
+        self.assertFalse(set(getattr(settings, 'SILENCED_SYSTEM_CHECKS', [])) & {'admin.E408', 'admin.E409', 'admin.E410'})
+        self.assertEqual([e.id for e in run_checks(tags=['admin'])], [])
+
+
+class RouteDispatchIntegrationTest(TestCase):
+    """完整请求流程中的中间件链选择测试"""
+
+    def test_admin_csrf_enforced(self):
+        """测试管理后台仍然执行CSRF检查"""
+        client = Client(enforce_csrf_checks=True)
+        response = client.post('/admin/login/', {'username': 'admin', 'password': 'admin'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_login_page(self):
+        """测试管理后台登录页正常使用会话和CSRF令牌"""
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_stateless_api_request(self):
+        """测试无状态API请求不设置会话和CSRF Cookie"""
+        response = self.client.get('/api/health/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from apps.core.routing import (
+    PrefixMatcher, get_route_classifier, get_route_info,
+    LOG_EXCLUDED, PROCESS_EXCLUDED, AUTH_EXEMPT,
+)
+
+
+class PrefixMatcherTest(SimpleTestCase):
+    """前缀匹配器测试"""
+
+    def test_longest_match_merges_parent_flags(self):
+        """测试最长匹配同时包含所有祖先前缀的标志"""
+        matcher = PrefixMatcher([
+            ('/admin/', PROCESS_EXCLUDED),
+            ('/admin/jsi18n/', LOG_EXCLUDED),
+            ('api/token/', AUTH_EXEMPT),
+        ])
+        self.assertEqual(matcher.match('/admin/jsi18n/'), PROCESS_EXCLUDED | LOG_EXCLUDED)
+        self.assertEqual(matcher.match('/admin/login/'), PROCESS_EXCLUDED)
+        self.assertEqual(matcher.match('/api/token/refresh/'), AUTH_EXEMPT)
+        self.assertEqual(matcher.match('/api/users/'), 0)
+
+    def test_empty_matcher(self):
+        """测试没有配置前缀时不命中任何分类"""
+        self.assertEqual(PrefixMatcher([]).match('/api/'), 0)
+
+
+class RouteClassifierTest(SimpleTestCase):
+    """路由分类器测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_classify_api_request(self):
+        """测试API请求的分类结果"""
+        info = get_route_classifier().classify('/api/courses/')
+        self.assertTrue(info.should_log)
+        self.assertTrue(info.should_process)
+        self.assertFalse(info.auth_exempt)
+        self.assertTrue(info.is_api)
+        self.assertFalse(info.is_admin)
+
+    def test_classify_exempt_paths(self):
+        """测试豁免路径的分类结果"""
+        info = get_route_classifier().classify('/admin/jsi18n/')
+        self.assertFalse(info.should_log)
+        self.assertFalse(info.should_process)
+        self.assertTrue(info.auth_exempt)
+        self.assertTrue(info.permission_exempt)
+        self.assertTrue(info.is_admin)
+
+        token_info = get_route_classifier().classify('/api/token/')
+        self.assertTrue(token_info.auth_exempt)
+        self.assertTrue(token_info.is_api)
+
+    def test_route_info_cached_on_request(self):
+        """测试每个请求只分类一次"""
+        request = self.factory.get('/api/courses/')
+        info = get_route_info(request)
+        self.assertIs(request.route_info, info)
+        self.assertIs(get_route_info(request), info)
+
+    @override_settings(REQUEST_LOG_EXCLUDE_PATHS=['/api/courses/'])
+    def test_classifier_rebuilt_on_settings_change(self):
+        """测试配置变更后分类器会重建"""
+        self.assertFalse(get_route_classifier().classify('/api/courses/').should_log)
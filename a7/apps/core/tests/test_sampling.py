@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock, patch
+
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.middleware.request_logging_middleware import RequestLoggingMiddleware
+from apps.core.sampling import LogSampler
+
+
+class LogSamplerTest(SimpleTestCase):
+    """请求日志采样策略测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.sampler = LogSampler(
+            sample_rate=0.0,
+            slow_threshold=1.0,
+            route_budgets={'GET knowledgepoint-list': 0.2, 'course-detail': 0.5},
+            debug_header='X-Debug-Log',
+            debug_secret='s3cret',
+        )
+
+    def _request(self, view_name='knowledgepoint-list', **extra):
+        request = self.factory.get('/api/knowledge-points/', **extra)
+        request.resolver_match = MagicMock(view_name=view_name)
+        return request
+
+    def test_errors_always_kept(self):
+        """测试错误响应总是保留"""
+        self.assertEqual(self.sampler.keep_reason(self._request(), 500, 0.01), 'error')
+        self.assertEqual(self.sampler.keep_reason(self._request(), 404, 0.01), 'error')
+
+    def test_debug_header_kept(self):
+        """测试管理员或携带正确密钥的调试请求头的请求总是保留"""
+        request = self._request(HTTP_X_DEBUG_LOG='1')
+        request.user = MagicMock(is_authenticated=True, is_staff=True)
+        self.assertEqual(self.sampler.keep_reason(request, 200, 0.01), 'debug')
+        self.assertEqual(self.sampler.keep_reason(self._request(HTTP_X_DEBUG_LOG='s3cret'), 200, 0.01), 'debug')
+
+    def test_debug_header_ignored_for_other_clients(self):
+        """测试非管理员携带调试请求头（密钥错误）时仍按比例采样"""
+        self.assertIsNone(self.sampler.keep_reason(self._request(HTTP_X_DEBUG_LOG='1'), 200, 0.01))
+        request = self._request(HTTP_X_DEBUG_LOG='1')
+        request.user = MagicMock(is_authenticated=True, is_staff=False)
+        self.assertIsNone(self.sampler.keep_reason(request, 200, 0.01))
+        self.assertIsNone(LogSampler(sample_rate=0.0, debug_header='X-Debug-Log').keep_reason(
+            self._request(HTTP_X_DEBUG_LOG='1'), 200, 0.01
+        ))
+
+    def test_route_budget(self):
+        """测试超过路由延迟预算的请求保留"""
+        self.assertEqual(self.sampler.keep_reason(self._request(), 200, 0.3), 'slow')
+        # 不区分请求方法的预算
+        self.assertIsNone(self.sampler.keep_reason(self._request('course-detail'), 200, 0.3))
+        self.assertEqual(self.sampler.keep_reason(self._request('course-detail'), 200, 0.6), 'slow')
+        # 未配置的路由使用默认预算
+        self.assertIsNone(self.sampler.keep_reason(self._request('user-list'), 200, 0.6))
+
+    def test_sample_rate(self):
+        """测试正常请求按比例采样"""
+        sampler = LogSampler(sample_rate=0.5)
+        with patch('apps.core.sampling.random.random', return_value=0.3):
+            self.assertEqual(sampler.keep_reason(self._request(), 200, 0.01), 'sampled')
+        with patch('apps.core.sampling.random.random', return_value=0.7):
+            self.assertIsNone(sampler.keep_reason(self._request(), 200, 0.01))
+
+
+@override_settings(LATENCY_METRICS_ENABLED=False)
+class SampledRequestLoggingTest(SimpleTestCase):
+    """请求日志中间件采样测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _middleware(self, status=200):
+        return RequestLoggingMiddleware(MagicMock(return_value=JsonResponse({}, status=status)))
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0.0)
+    @patch('apps.core.middleware.request_logging_middleware.logger')
+    def test_dropped_request_skips_payload(self, mock_logger):
+        """测试未被采样的请求不记录日志，也不构建请求数据"""
+        middleware = self._middleware()
+        with patch.object(middleware, '_get_request_data') as mock_request_data:
+            middleware(self.factory.get('/api/courses/'))
+        mock_request_data.assert_not_called()
+        mock_logger.info.assert_not_called()
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0.0)
+    @patch('apps.core.middleware.request_logging_middleware.logger')
+    def test_error_kept(self, mock_logger):
+        """测试采样比例为0时错误响应仍被记录"""
+        self._middleware(status=500)(self.factory.get('/api/courses/'))
+        mock_logger.warning.assert_called_once()
+        self.assertEqual(mock_logger.warning.call_args[1]['extra']['data']['response']['sample'], 'error')
+
+    @override_settings(REQUEST_LOG_LEVEL='WARNING')
+    @patch('apps.core.middleware.request_logging_middleware.logger')
+    def test_level_filters_before_payload(self, mock_logger):
+        """测试日志级别不会输出的请求不构建请求数据"""
+        middleware = self._middleware()
+        with patch.object(middleware, '_get_request_data') as mock_request_data:
+            middleware(self.factory.get('/api/courses/'))
+        mock_request_data.assert_not_called()
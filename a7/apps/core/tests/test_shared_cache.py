@@ -0,0 +1,54 @@
+from django.core.checks import run_checks
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core.shared_cache import (
+    check_cache_tables, check_shared_caches, create_cache_tables, is_shared_cache, missing_cache_tables
+)
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+DATABASE = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'a7_shared_cache'}
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """共享缓存部署检查测试"""
+
+    @override_settings(CACHES={'default': LOCMEM, 'shared': DATABASE})
+    def test_shared_backend_passes(self):
+        """测试共享数据使用数据库缓存时检查通过"""
+        self.assertTrue(is_shared_cache('shared'))
+        self.assertFalse(is_shared_cache('default'))
+        self.assertEqual(check_shared_caches(None), [])
+
+    @override_settings(CACHES={'default': LOCMEM, 'shared': DATABASE}, RATELIMIT_CACHE='default')
+    def test_process_local_backend_reported(self):
+        """测试共享数据误用进程内缓存时部署检查报错"""
+        errors = run_checks(include_deployment_checks=True, tags=['caches'])
+        self.assertEqual([(e.id, e.msg.split('使用')[0]) for e in errors], [('core.E001', 'RATELIMIT_CACHE')])
+
+    @override_settings(CACHES={'default': LOCMEM}, RATELIMIT_CACHE='missing', LOAD_SHEDDING_CACHE='default')
+    def test_missing_alias_reported(self):
+        """测试配置了不存在的缓存时部署检查报错"""
+        ids = [e.id for e in check_shared_caches(None)]
+        self.assertIn('core.E002', ids)
+        self.assertIn('core.E001', ids)
+
+
+@override_settings(CACHES={
+    'default': LOCMEM,
+    'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'a7_test_missing_cache'},
+})
+class CacheTableTest(TestCase):
+    """数据库缓存表创建和检查测试"""
+
+    def test_missing_table_reported(self):
+        """测试缓存表不存在时部署检查报错，只检查指定的数据库"""
+        self.assertEqual(missing_cache_tables(), {'shared': 'a7_test_missing_cache'})
+        self.assertEqual([e.id for e in check_cache_tables(None, databases=['default'])], ['core.E003'])
+        self.assertEqual(check_cache_tables(None), [])
+
+    def test_created_on_migrate(self):
+        """测试post_migrate时创建缓存表，重复执行不报错"""
+        create_cache_tables(using='default', verbosity=0)
+        create_cache_tables(using='default', verbosity=0)
+        self.assertEqual(missing_cache_tables(), {})
+        self.assertEqual(check_cache_tables(None, databases=['default']), [])
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from courses.models import Course, KnowledgePoint
+from apps.core.middleware.server_timing_middleware import ServerTimingMiddleware
+from apps.core.timing import (
+    ServerTimer, activate_timer, deactivate_timer, get_current_timer, timed
+)
+
+User = get_user_model()
+
+
+class ServerTimerTest(SimpleTestCase):
+    """请求阶段计时器测试"""
+
+    def test_header_value(self):
+        """测试生成的Server-Timing头包含各阶段和总耗时"""
+        timer = ServerTimer()
+        timer.add('db', 0.002)
+        timer.add('db', 0.001)
+        timer.add('render', 0.0005)
+
+        header = timer.header_value()
+        self.assertIn('db;dur=3.000;desc="2"', header)
+        self.assertIn('render;dur=0.500;desc="1"', header)
+        self.assertIn('total;dur=', header)
+        self.assertEqual(timer.as_dict()['db'], {'dur': 3.0, 'count': 2})
+        self.assertEqual(timer.summary(), 'db=3.00ms/2 render=0.50ms')
+
+    def test_timed_without_timer(self):
+        """测试没有计时器时timed不做任何统计"""
+        self.assertIsNone(get_current_timer())
+        with timed('db'):
+            pass
+
+    def test_nested_phase_counted_once(self):
+        """测试同一阶段嵌套调用时只统计最外层"""
+        timer = ServerTimer()
+        token = activate_timer(timer)
+        try:
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+                with timed('db'):
+                    pass
+        finally:
+            deactivate_timer(token)
+
+        self.assertEqual(timer.phases['serialize'][1], 1)
+        self.assertEqual(timer.phases['db'][1], 1)
+        self.assertIsNone(get_current_timer())
+
+
+class ServerTimingMiddlewareTest(SimpleTestCase):
+    """Server-Timing中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _view(self, request):
+        # 视图中可以读取当前计时器
+        self.timer = get_current_timer()
+        return HttpResponse('ok')
+
+    def test_disabled_by_default(self):
+        """测试默认不输出Server-Timing头"""
+        response = ServerTimingMiddleware(self._view)(self.factory.get('/api/users/'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIsNone(self.timer)
+
+    @override_settings(SERVER_TIMING_ALLOWED_IPS=['127.0.0.1'])
+    def test_enabled_by_request_header(self):
+        """测试携带请求头时输出Server-Timing头，并保存计时器到请求中"""
+        request = self.factory.get('/api/users/', HTTP_X_SERVER_TIMING='1')
+        response = ServerTimingMiddleware(self._view)(request)
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIs(request.server_timing, self.timer)
+        self.assertIsNone(get_current_timer())
+
+    @override_settings(SERVER_TIMING_REQUEST_HEADER=None)
+    def test_request_header_can_be_disabled(self):
+        """测试不允许客户端开启时忽略请求头"""
+        request = self.factory.get('/api/users/', HTTP_X_SERVER_TIMING='1')
+        response = ServerTimingMiddleware(self._view)(request)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING_ENABLED=True, DEBUG=True)
+    def test_enabled_by_setting(self):
+        """测试配置开启后所有请求都输出Server-Timing头"""
+        response = ServerTimingMiddleware(self._view)(self.factory.get('/api/users/'))
+        self.assertIn('Server-Timing', response)
+
+    def test_header_hidden_from_untrusted_clients(self):
+        """测试非管理员、不在允许列表中的客户端只记录计时，不输出响应头"""
+        request = self.factory.get('/api/users/', HTTP_X_SERVER_TIMING='1')
+        request.user = AnonymousUser()
+        response = ServerTimingMiddleware(self._view)(request)
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertIs(request.server_timing, self.timer)
+
+    def test_header_exposed_to_staff(self):
+        """测试管理员用户可以查看Server-Timing响应头"""
+        request = self.factory.get('/api/users/', HTTP_X_SERVER_TIMING='1')
+        request.user = User(username='staff', is_staff=True)
+        response = ServerTimingMiddleware(self._view)(request)
+        self.assertIn('Server-Timing', response)
+
+
+class ServerTimingIntegrationTest(TestCase):
+    """Server-Timing端到端测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='timing', password='password', role='admin', is_staff=True)
+        course = Course.objects.create(title='数学', description='数学课程', teacher=self.user)
+        KnowledgePoint.objects.create(title='函数', course=course)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_phases_in_header(self):
+        """测试API请求的Server-Timing头包含认证、权限、数据库、序列化和渲染阶段"""
+        response = self.client.get(
+            '/api/knowledge-points/',
+            HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            HTTP_X_SERVER_TIMING='1',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for phase in ('auth', 'permission', 'db', 'serialize', 'render', 'total'):
+            self.assertIn(f'{phase};dur=', header)
+
+    def test_db_wrapper_installed(self):
+        """测试数据库连接安装了计时包装器"""
+        from apps.core.timing import db_timing_wrapper
+        connection.ensure_connection()
+        self.assertIn(db_timing_wrapper, connection.execute_wrappers)
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError
+from django.test import TestCase, override_settings
+
+from apps.core.models import UsageStatistics
+from apps.core.usage import UsageBuffer, build_usage_entry, rejected_file
+from users.models import User
+
+
+class UsageBufferTest(TestCase):
+    """使用统计缓冲写入测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='usage_user', password='testpassword')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.spill_file = os.path.join(self.tmpdir.name, 'usage_spill.jsonl')
+        self.buffer = UsageBuffer(max_size=3, spill_file=self.spill_file)
+
+    def test_flush_by_size(self):
+        """测试达到数量阈值时批量写入"""
+        self.buffer.add(build_usage_entry(self.user, 'course', 'view', course_id=1))
+        self.buffer.add(build_usage_entry(self.user, 'course', 'view', course_id=2))
+        self.assertEqual(UsageStatistics.objects.count(), 0)
+
+        with self.assertNumQueries(3):  # SAVEPOINT + 批量INSERT + RELEASE
+            self.buffer.add(build_usage_entry(self.user, 'exercise', 'submit', exercise_id=5))
+
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(UsageStatistics.objects.count(), 3)
+        record = UsageStatistics.objects.get(module='exercise')
+        self.assertEqual(record.user, self.user)
+        self.assertEqual(record.get_details_dict(), {'exercise_id': 5})
+
+    def test_anonymous_user_recorded_without_user(self):
+        """测试匿名用户的操作记录不关联用户"""
+        self.buffer.add(build_usage_entry(AnonymousUser(), 'course', 'list', ip_address='10.0.0.1'))
+        self.buffer.flush()
+        record = UsageStatistics.objects.get()
+        self.assertIsNone(record.user)
+        self.assertEqual(record.ip_address, '10.0.0.1')
+        self.assertIsNone(record.details)
+
+    def test_original_timestamp_preserved(self):
+        """测试批量写入保留操作发生的时间"""
+        entry = build_usage_entry(self.user, 'course', 'view')
+        entry['timestamp'] = '2025-01-01T08:00:00+00:00'
+        self.buffer.add(entry)
+        self.buffer.flush()
+        self.assertEqual(UsageStatistics.objects.get().timestamp.year, 2025)
+
+    def test_spill_and_replay_when_database_unavailable(self):
+        """测试数据库不可用时转存到本地文件，并可通过命令重放"""
+        self.buffer.add(build_usage_entry(self.user, 'course', 'view', course_id=1))
+        with patch('apps.core.models.UsageStatistics.objects.bulk_create', side_effect=OperationalError('db down')):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer.spilled, 1)
+        with open(self.spill_file, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['module'], 'course')
+
+        out = StringIO()
+        call_command('replay_usage_spill', file=self.spill_file, stdout=out)
+        self.assertIn('已重放1条', out.getvalue())
+        self.assertEqual(UsageStatistics.objects.get().get_details_dict(), {'course_id': 1})
+        self.assertFalse(os.path.exists(self.spill_file))
+
+    @override_settings(BACKGROUND_WORKERS_ENABLED=True)
+    def test_full_buffer_flushed_by_worker(self):
+        """测试达到数量阈值时唤醒后台任务刷新，不在当前线程写入"""
+        flushed = threading.Event()
+        self.buffer.worker.target = flushed.set
+        self.addCleanup(self.buffer.worker.stop, run_once=False)
+
+        with self.assertNumQueries(0):
+            for i in range(3):
+                self.buffer.add(build_usage_entry(self.user, 'course', 'view', course_id=i))
+
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(self.buffer.pending(), 3)
+
+    def test_constraint_violation_rejected_not_spilled(self):
+        """测试违反约束的记录写入隔离文件，其余记录正常写入"""
+        self.buffer.add(build_usage_entry(self.user, 'course', 'view'))
+        bad = build_usage_entry(self.user, 'course', 'view')
+        bad['module'] = None
+        self.buffer.add(bad)
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(UsageStatistics.objects.count(), 1)
+        self.assertEqual(self.buffer.rejected, 1)
+        self.assertFalse(os.path.exists(self.spill_file))
+        with open(rejected_file(self.spill_file), encoding='utf-8') as f:
+            self.assertIsNone(json.loads(f.readline())['module'])
+
+    def test_replay_skips_rejected_entries(self):
+        """测试重放时违反约束的记录移到隔离文件，不阻塞后续记录"""
+        bad = build_usage_entry(self.user, 'course', 'view')
+        bad['module'] = None
+        entries = [bad, build_usage_entry(self.user, 'course', 'view', course_id=2)]
+        with open(self.spill_file, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+        out = StringIO()
+        call_command('replay_usage_spill', file=self.spill_file, stdout=out)
+
+        self.assertIn('已重放1条', out.getvalue())
+        self.assertEqual(UsageStatistics.objects.get().get_details_dict(), {'course_id': 2})
+        self.assertTrue(os.path.exists(rejected_file(self.spill_file)))
+        self.assertFalse(os.path.exists(f'{self.spill_file}.replaying'))
+
+    def test_integrity_error_not_spilled(self):
+        """测试批量写入违反约束时不转存到本地文件"""
+        self.buffer.add(build_usage_entry(self.user, 'course', 'view'))
+        with patch('apps.core.models.UsageStatistics.objects.bulk_create', side_effect=IntegrityError('fk')):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.spilled, 0)
+        self.assertEqual(UsageStatistics.objects.count(), 1)
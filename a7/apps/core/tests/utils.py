@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+SHARED_CACHE_TABLE = 'a7_test_shared_cache'
+
+# 与settings中的部署配置相同，共享缓存使用数据库缓存表，用于检查共享缓存产生的SQL查询数
+DATABASE_SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'a7-default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': SHARED_CACHE_TABLE,
+    },
+}
+
+
+class DatabaseSharedCacheMixin:
+    """
+    共享缓存使用数据库缓存的测试混入类（需与TestCase一起使用）
+
+    测试配置（a7.test_settings）中共享缓存是进程内缓存，不会产生SQL查询
+    """
+
+    def setUp(self):
+        override = override_settings(CACHES=DATABASE_SHARED_CACHES)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('createcachetable', SHARED_CACHE_TABLE, verbosity=0)
+        super().setUp()
+
+    @contextmanager
+    def assertSharedCacheQueries(self, budget):
+        """断言代码块中访问缓存表的SQL查询不超过budget次（不计事务保存点）"""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = [query['sql'] for query in context.captured_queries if SHARED_CACHE_TABLE in query['sql']]
+        self.assertLessEqual(len(queries), budget, '\n'.join(queries))
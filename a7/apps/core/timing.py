@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# 当前请求的计时器，未开启Server-Timing的请求为None
+_current_timer = ContextVar('server_timing', default=None)
+
+
+class ServerTimer:
+    """
+    请求阶段计时器
+
+    按阶段（认证、权限、数据库、序列化、渲染）累计耗时和次数，
+    生成符合规范的Server-Timing响应头。
+    各阶段可能相互包含（如序列化过程中的数据库查询同时计入db和serialize），
+    同一阶段嵌套调用时只统计最外层。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # 阶段名称 -> [累计耗时（秒）, 次数]
+        self.phases = {}
+        self._active = set()
+
+    def add(self, name, duration):
+        """累计一个阶段的耗时（秒）"""
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [duration, 1]
+        else:
+            phase[0] += duration
+            phase[1] += 1
+
+    def total(self):
+        """请求开始至今的耗时（秒）"""
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        """返回各阶段耗时（毫秒）和次数，供日志记录使用"""
+        return {
+            name: {'dur': round(duration * 1000, 3), 'count': count}
+            for name, (duration, count) in self.phases.items()
+        }
+
+    def summary(self):
+        """返回简短的文本摘要，如 auth=1.20ms db=3.41ms/4"""
+        parts = []
+        for name, (duration, count) in self.phases.items():
+            part = f'{name}={duration * 1000:.2f}ms'
+            if count > 1:
+                part += f'/{count}'
+            parts.append(part)
+        return ' '.join(parts)
+
+    def header_value(self):
+        """生成Server-Timing响应头的值"""
+        parts = []
+        for name, (duration, count) in self.phases.items():
+            parts.append(f'{name};dur={duration * 1000:.3f};desc="{count}"')
+        parts.append(f'total;dur={self.total() * 1000:.3f}')
+        return ', '.join(parts)
+
+
+def activate_timer(timer):
+    """为当前上下文设置计时器，返回用于恢复的token"""
+    return _current_timer.set(timer)
+
+
+def deactivate_timer(token):
+    """恢复设置计时器之前的状态"""
+    _current_timer.reset(token)
+
+
+def get_current_timer():
+    """获取当前上下文的计时器"""
+    return _current_timer.get()
+
+
+@contextmanager
+def timed(name):
+    """统计代码块的耗时并计入当前请求的计时器；没有计时器时几乎没有开销"""
+    timer = _current_timer.get()
+    if timer is None or name in timer._active:
+        yield
+        return
+    timer._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer._active.discard(name)
+        timer.add(name, time.perf_counter() - start)
+
+
+def db_timing_wrapper(execute, sql, params, many, context):
+    """数据库执行包装器（connection.execute_wrapper），统计SQL执行耗时"""
+    if _current_timer.get() is None:
+        return execute(sql, params, many, context)
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_db_timing(sender, connection, **kwargs):
+    """为每个新建的数据库连接安装执行包装器，异步视图在线程池中使用的连接也能被统计"""
+    if db_timing_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_timing_wrapper)
+
+
+class ServerTimingViewMixin:
+    """
+    DRF视图计时混入类
+
+    统计认证和权限检查阶段的耗时，需要计时的视图继承该类（放在APIView/ViewSet等基类之前）
+    """
+
+    def perform_authentication(self, request):
+        with timed('auth'):
+            return super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timed('permission'):
+            return super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('permission'):
+            return super().check_object_permissions(request, obj)
+
+
+class ServerTimingSerializerMixin:
+    """
+    DRF序列化器计时混入类
+
+    统计序列化阶段的耗时；列表序列化时每个对象计一次，嵌套的序列化器只统计最外层
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
@@ -0,0 +1,65 @@
+"""
+模型字段变化跟踪
+
+从数据库加载对象时记录已加载字段的值，保存时据此判断哪些字段发生了变化、
+信号处理器据此取得字段的原值，不需要在保存前再查询一次数据库
+"""
+
+
+class TrackedFieldsMixin:
+    """
+    记录字段加载值的模型混入类，需放在模型基类之前
+
+    加载（from_db）、保存和refresh_from_db之后，当前字段值成为下次判断变化的基准；
+    保存信号（pre_save/post_save）中get_loaded_value()返回的仍是保存前的值
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """从数据库加载对象时记录已加载字段的值"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            f.attname: instance.__dict__[f.attname]
+            for f in cls._meta.concrete_fields if f.attname in instance.__dict__
+        }
+        return instance
+
+    @property
+    def changed_fields(self):
+        """
+        自加载（或上次保存）以来值发生变化的字段名称集合
+
+        不是从数据库加载的对象（如直接构造的对象）没有记录，返回None；
+        外键使用字段名（如role_obj），延迟加载后被赋值的字段视为已变化
+        """
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None:
+            return None
+        return {
+            f.name for f in self._meta.concrete_fields
+            if f.attname in self.__dict__
+            and (f.attname not in loaded or loaded[f.attname] != self.__dict__[f.attname])
+        }
+
+    def get_loaded_value(self, field_name, default=None):
+        """返回字段在加载（或上次保存）时的值"""
+        attname = self._meta.get_field(field_name).attname
+        return self.__dict__.get('_loaded_values', {}).get(attname, default)
+
+    def _record_loaded_values(self, fields=None):
+        """把当前字段值记录为已加载的值，fields为None时记录全部已加载字段"""
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for f in self._meta.concrete_fields:
+            if fields is not None and f.name not in fields and f.attname not in fields:
+                continue
+            if f.attname in self.__dict__:
+                loaded[f.attname] = self.__dict__[f.attname]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # 保存后的值成为下次判断变化的基准
+        self._record_loaded_values(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._record_loaded_values(fields)
@@ -6,4 +6,6 @@ app_name = 'core'
 urlpatterns = [
     # 示例路由，实际开发时可以替换
     path('health/', views.HealthCheckView.as_view(), name='health_check'),
+    path('health/live/', views.HealthCheckView.as_view(), name='health_live'),
+    path('health/ready/', views.ReadinessCheckView.as_view(), name='health_ready'),
 ] 
\ No newline at end of file
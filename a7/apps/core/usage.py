@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.background import PeriodicWorker
+
+logger = logging.getLogger('django')
+
+
+class UsageBuffer:
+    """
+    使用统计写入缓冲区
+
+    record_usage只把操作记录追加到进程内缓冲区，
+    达到数量阈值或时间阈值时由后台任务通过bulk_create批量写入UsageStatistics。
+    - 进程退出时由后台任务执行最后一次刷新
+    - 数据库不可用（连接失败等）时写入本地追加文件，之后用replay_usage_spill命令重放
+    - 违反数据库约束的个别记录（如关联的用户已删除）写入隔离文件（转存文件名加.rejected），不再重试
+    """
+
+    def __init__(self, max_size=500, flush_interval=5, spill_file=None):
+        self.max_size = max_size
+        self.spill_file = spill_file
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._entries = []
+        self.flushed = 0
+        self.spilled = 0
+        self.rejected = 0
+        self.worker = PeriodicWorker('usage-statistics', flush_interval, self.flush)
+
+    def add(self, entry):
+        """追加一条记录，达到数量阈值时唤醒后台任务刷新"""
+        with self._lock:
+            self._entries.append(entry)
+            full = len(self._entries) >= self.max_size
+        running = self.worker.start()
+        if full:
+            if running:
+                self.worker.trigger()
+            else:
+                # 后台任务未启用时（如测试配置中）只能在当前线程写入，避免缓冲区无限增长
+                self.flush()
+
+    def pending(self):
+        """缓冲区中尚未写入的记录数"""
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self):
+        """写入缓冲区中的全部记录，返回写入数据库的条数"""
+        with self._lock:
+            entries = self._entries
+            self._entries = []
+        if not entries:
+            return 0
+
+        try:
+            written, rejected = write_usage_entries(entries)
+        except (OperationalError, InterfaceError) as e:
+            # 只有数据库暂时不可用时才转存，重放时可以写入
+            logger.warning(f"使用统计写入数据库失败，转存到本地文件: {str(e)}")
+            self.spill(entries)
+            return 0
+
+        if rejected:
+            self.reject(rejected)
+        self.flushed += written
+        return written
+
+    def spill(self, entries):
+        """将记录追加写入本地文件"""
+        if not self.spill_file:
+            logger.error(f"未配置USAGE_SPILL_FILE，丢弃{len(entries)}条使用统计")
+            return
+        with self._spill_lock:
+            append_usage_entries(self.spill_file, entries)
+        self.spilled += len(entries)
+
+    def reject(self, entries):
+        """将违反数据库约束的记录写入隔离文件"""
+        logger.error(f"{len(entries)}条使用统计违反数据库约束，无法写入")
+        if not self.spill_file:
+            return
+        with self._spill_lock:
+            append_usage_entries(rejected_file(self.spill_file), entries)
+        self.rejected += len(entries)
+
+
+def build_usage_entry(user, module, action, ip_address=None, user_agent=None, **details):
+    """构建可序列化的使用统计记录"""
+    user_id = user.pk if user is not None and getattr(user, 'is_authenticated', False) else None
+    return {
+        'user_id': user_id,
+        'module': module,
+        'action': action,
+        'details': json.dumps(details, ensure_ascii=False, default=str) if details else None,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def rejected_file(spill_file):
+    """违反数据库约束的记录的隔离文件路径"""
+    return f'{spill_file}.rejected'
+
+
+def append_usage_entries(path, entries):
+    """将记录按行追加写入文件"""
+    lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_usage_entries(entries):
+    """
+    将记录批量写入数据库，返回(写入条数, 违反约束无法写入的记录)
+
+    批量写入违反约束时改为逐条写入，只剔除有问题的记录；数据库不可用等错误直接抛出
+    """
+    from apps.core.models import UsageStatistics
+
+    objects = [
+        UsageStatistics(
+            user_id=entry['user_id'],
+            module=entry['module'],
+            action=entry['action'],
+            details=entry['details'],
+            ip_address=entry['ip_address'],
+            user_agent=entry['user_agent'],
+            timestamp=parse_datetime(entry['timestamp']),
+        )
+        for entry in entries
+    ]
+    # 在同一事务中写入，失败时整体回滚，避免转存后重放产生重复记录
+    try:
+        with transaction.atomic():
+            UsageStatistics.objects.bulk_create(objects, batch_size=500)
+        return len(objects), []
+    except (IntegrityError, DataError):
+        pass
+
+    written = 0
+    rejected = []
+    for entry, obj in zip(entries, objects):
+        # 外键约束可能在提交时才检查，批量写入已设置的主键需要清除
+        obj.pk = None
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=True)
+            written += 1
+        except (IntegrityError, DataError):
+            rejected.append(entry)
+    return written, rejected
+
+
+usage_buffer = UsageBuffer(
+    max_size=getattr(settings, 'USAGE_BUFFER_SIZE', 500),
+    flush_interval=getattr(settings, 'USAGE_FLUSH_INTERVAL', 5),
+    spill_file=getattr(settings, 'USAGE_SPILL_FILE', None),
+)
+
+
+def record_usage(user, module, action, ip_address=None, user_agent=None, **details):
+    """
+    记录用户操作
+
+    例如：record_usage(request.user, 'course', 'view', course_id=1)
+    其余关键字参数作为details以JSON格式保存
+    """
+    usage_buffer.add(build_usage_entry(
+        user, module, action,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        **details
+    ))
@@ -1,13 +1,23 @@
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.health import get_health_checker
 
 class HealthCheckView(APIView):
     """
-    一个简单的API健康检查端点
+    一个简单的API健康检查端点（存活检查）
+
+    不访问数据库、缓存等任何外部依赖，只表示进程可以处理请求
     """
     permission_classes = [AllowAny]
+    authentication_classes = []
+    # 健康检查的响应不包装为标准化格式（/api/health/在PROCESSOR_EXCLUDE_PATHS中）
+    renderer_classes = [JSONRenderer]
     
     def get(self, request, *args, **kwargs):
         """
@@ -16,4 +26,49 @@ class HealthCheckView(APIView):
         return Response(
             {"status": "healthy", "message": "API服务运行正常"},
             status=status.HTTP_200_OK
-        ) 
\ No newline at end of file
+        )
+
+
+class ReadinessCheckView(APIView):
+    """
+    就绪检查端点
+
+    检查数据库、缓存、日志管道和令牌黑名单表，关键依赖不可用时返回503，
+    负载均衡器据此暂停向该进程转发请求。检查结果缓存HEALTH_CHECK_CACHE_TTL秒。
+    详细结果（耗时、失败次数、错误信息和统计）只返回给管理员用户（is_staff）或
+    HEALTH_CHECK_DETAIL_ALLOWED_IPS中的客户端，其余请求只返回是否就绪和各项检查是否通过。
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def perform_authentication(self, request):
+        # 负载均衡器的探测不携带令牌，只在需要判断是否为管理员时才认证
+        pass
+
+    def get(self, request, *args, **kwargs):
+        """
+        返回各项依赖的检查结果
+        """
+        result = get_health_checker().check()
+        if not self._may_view_details(request):
+            result = {
+                'ready': result['ready'],
+                'status': result['status'],
+                'checks': {name: check['ok'] for name, check in result['checks'].items()},
+            }
+        return Response(
+            result,
+            status=status.HTTP_200_OK if result['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    def _may_view_details(self, request):
+        """判断是否返回详细检查结果"""
+        allowed_ips = getattr(settings, 'HEALTH_CHECK_DETAIL_ALLOWED_IPS', [])
+        if request.META.get('REMOTE_ADDR') in allowed_ips:
+            return True
+        try:
+            user = request.user
+        except APIException:
+            # 令牌无效时按匿名用户处理，不影响就绪检查本身
+            return False
+        return bool(user is not None and user.is_authenticated and user.is_staff)
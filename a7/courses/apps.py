@@ -5,3 +5,7 @@ class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
     verbose_name = '课程管理'
+    
+    def ready(self):
+        # 导入信号处理器
+        import courses.signals
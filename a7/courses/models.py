@@ -1,10 +1,47 @@
 from django.db import models
 from users.models import User
 
+from apps.core.tracking import TrackedFieldsMixin
+
+from .versions import content_changed
+
+
+class ContentQuerySet(models.QuerySet):
+    """
+    课程内容查询集
+
+    update()和bulk_create()不发送保存信号，写入后为涉及的对象发送content_changed信号，
+    由courses.signals更新版本戳（bulk_update()内部通过update()写入，同样会发送）。
+    查询集的delete()会逐个发送删除信号，不需要额外处理
+    """
+
+    def update(self, **kwargs):
+        # 只记录更新前的主键和外键（不加载content等大字段），外键变化时原来所属范围的版本也需要更新
+        fields = ['pk'] + [f.attname for f in self.model._meta.concrete_fields if f.is_relation]
+        previous = {row[0]: dict(zip(fields[1:], row[1:])) for row in self._chain().values_list(*fields)}
+        rows = super().update(**kwargs)
+        if previous:
+            instances = list(
+                self.model._base_manager.using(self.db).filter(pk__in=previous).only(*fields)
+            )
+            for instance in instances:
+                # 以更新前的外键值作为加载值，信号处理器通过get_loaded_value()取得原值
+                instance._loaded_values = previous[instance.pk]
+            content_changed.send(sender=self.model, instances=instances, created=False)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            content_changed.send(sender=self.model, instances=objs, created=True)
+        return objs
+
 class Course(models.Model):
     """
     课程模型，表示教育系统中的一个课程
     """
+    objects = ContentQuerySet.as_manager()
+
     title = models.CharField(max_length=100, verbose_name='课程标题')
     description = models.TextField(blank=True, verbose_name='课程描述')
     subject = models.CharField(max_length=50, verbose_name='学科')
@@ -31,10 +68,12 @@ class Course(models.Model):
         return self.title
 
 
-class KnowledgePoint(models.Model):
+class KnowledgePoint(TrackedFieldsMixin, models.Model):
     """
     知识点模型，表示课程中的知识点，可以有层次结构
     """
+    objects = ContentQuerySet.as_manager()
+
     course = models.ForeignKey(
         Course, 
         on_delete=models.CASCADE,  # 保持CASCADE，删除课程时连带删除知识点
@@ -70,10 +109,12 @@ class KnowledgePoint(models.Model):
         return self.title
 
 
-class Courseware(models.Model):
+class Courseware(TrackedFieldsMixin, models.Model):
     """
     课件模型，表示课程相关的教学资料
     """
+    objects = ContentQuerySet.as_manager()
+
     COURSEWARE_TYPES = (
         ('document', '文档'),
         ('video', '视频'),
@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from users.tokens import get_request_role
+
 class IsTeacherOrAdmin(permissions.BasePermission):
     """
     只允许教师或管理员访问
@@ -9,8 +11,8 @@ class IsTeacherOrAdmin(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        # 检查用户是否是管理员或者教师
-        return request.user.is_staff or request.user.role == 'teacher'
+        # 检查用户是否是管理员或者教师（角色优先从访问令牌的授权声明中读取）
+        return request.user.is_staff or get_request_role(request) == 'teacher'
 
 
 class IsCourseTeacherOrAdmin(permissions.BasePermission):
@@ -1,10 +1,12 @@
 from rest_framework import serializers
+
+from apps.core.timing import ServerTimingSerializerMixin
 from .models import Course, KnowledgePoint, Courseware
 from users.models import User
 from .validations import ValidationUtils
 from django.utils.translation import gettext_lazy as _
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课程序列化器，用于读取课程信息"""
     
     teacher_name = serializers.SerializerMethodField()
@@ -22,7 +24,7 @@ class CourseSerializer(serializers.ModelSerializer):
         return ""
 
 
-class CourseCreateSerializer(serializers.ModelSerializer):
+class CourseCreateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课程创建序列化器"""
     
     class Meta:
@@ -64,7 +66,7 @@ class CourseCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CourseUpdateSerializer(serializers.ModelSerializer):
+class CourseUpdateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课程更新序列化器"""
     
     class Meta:
@@ -102,7 +104,7 @@ class CourseUpdateSerializer(serializers.ModelSerializer):
         return data
 
 # KnowledgePoint序列化器类
-class KnowledgePointSerializer(serializers.ModelSerializer):
+class KnowledgePointSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """知识点序列化器，用于读取知识点信息"""
     
     course_title = serializers.SerializerMethodField()
@@ -135,7 +137,7 @@ class KnowledgePointSerializer(serializers.ModelSerializer):
         return [{'id': child.id, 'title': child.title} for child in children]
 
 
-class KnowledgePointCreateSerializer(serializers.ModelSerializer):
+class KnowledgePointCreateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """知识点创建序列化器"""
     
     class Meta:
@@ -187,7 +189,7 @@ class KnowledgePointCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class KnowledgePointUpdateSerializer(serializers.ModelSerializer):
+class KnowledgePointUpdateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """知识点更新序列化器"""
     
     class Meta:
@@ -254,7 +256,7 @@ class KnowledgePointUpdateSerializer(serializers.ModelSerializer):
         return False 
 
 # Courseware序列化器
-class CoursewareSerializer(serializers.ModelSerializer):
+class CoursewareSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课件序列化器，用于读取课件信息"""
     
     course_title = serializers.SerializerMethodField()
@@ -284,7 +286,7 @@ class CoursewareSerializer(serializers.ModelSerializer):
         return obj.get_type_display()
 
 
-class CoursewareCreateSerializer(serializers.ModelSerializer):
+class CoursewareCreateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课件创建序列化器"""
     
     class Meta:
@@ -343,7 +345,7 @@ class CoursewareCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CoursewareUpdateSerializer(serializers.ModelSerializer):
+class CoursewareUpdateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """课件更新序列化器"""
     
     class Meta:
@@ -0,0 +1,155 @@
+"""
+课程内容版本戳信号处理器
+
+保存和删除信号、以及ContentQuerySet批量写入后发送的content_changed信号到达时，
+更新数据所属的版本范围；外键原值取自字段跟踪记录（TrackedFieldsMixin），不额外查询数据库。
+
+未处理的写入方式：
+- loaddata等raw保存不更新版本，导入数据后如需使客户端缓存失效，修改任意一条相关数据即可
+- 课程内容模型没有多对多字段；用户的多对多字段（groups、user_permissions）不出现在课程数据中，
+  因此不需要处理m2m_changed
+- 绕过ORM的原始SQL写入不会更新版本
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.core.conditional import bump_versions
+
+from .models import Course, Courseware, KnowledgePoint
+from .versions import (
+    COURSES, COURSEWARES, KNOWLEDGE_POINTS, USERS, content_changed, course_content_scope, object_scope
+)
+
+User = get_user_model()
+
+
+def _current_and_loaded(instance, field_name):
+    """外键的当前值和加载时的值（对象移动时原来所属的范围也需要更新）"""
+    return {getattr(instance, f'{field_name}_id'), instance.get_loaded_value(field_name)} - {None}
+
+
+def course_scopes(courses):
+    """课程变化时需要更新的版本范围：课程集合、课程对象和课程内容"""
+    scopes = [COURSES]
+    for course in courses:
+        if course.pk is not None:
+            scopes.extend([object_scope(COURSES, course.pk), course_content_scope(course.pk)])
+    return scopes
+
+
+def knowledge_point_scopes(points, children=()):
+    """
+    知识点变化时需要更新的版本范围
+
+    知识点数据中包含父知识点标题和子知识点列表，因此同时更新父知识点和子知识点的版本
+    """
+    scopes = [KNOWLEDGE_POINTS]
+    for point in points:
+        if point.pk is not None:
+            scopes.append(object_scope(KNOWLEDGE_POINTS, point.pk))
+        scopes.extend(course_content_scope(pk) for pk in _current_and_loaded(point, 'course'))
+        scopes.extend(object_scope(KNOWLEDGE_POINTS, pk) for pk in _current_and_loaded(point, 'parent'))
+    scopes.extend(object_scope(KNOWLEDGE_POINTS, pk) for pk in children)
+    return scopes
+
+
+def courseware_scopes(coursewares):
+    """课件变化时需要更新的版本范围：课件集合、课件对象和所属课程内容"""
+    scopes = [COURSEWARES]
+    for courseware in coursewares:
+        if courseware.pk is not None:
+            scopes.append(object_scope(COURSEWARES, courseware.pk))
+        scopes.extend(course_content_scope(pk) for pk in _current_and_loaded(courseware, 'course'))
+    return scopes
+
+
+def _children_of(points):
+    pks = [point.pk for point in points if point.pk is not None]
+    if not pks:
+        return []
+    return list(KnowledgePoint.objects.filter(parent_id__in=pks).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_versions(sender, instance, **kwargs):
+    """课程变化时更新课程集合、课程对象和课程内容的版本"""
+    if kwargs.get('raw', False):
+        return
+    bump_versions(*course_scopes([instance]))
+
+
+@receiver(pre_delete, sender=KnowledgePoint)
+def remember_knowledge_point_children(sender, instance, **kwargs):
+    """删除前记录子知识点，子知识点返回的数据中包含父知识点标题"""
+    instance._version_children = list(instance.children.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=KnowledgePoint)
+@receiver(post_delete, sender=KnowledgePoint)
+def bump_knowledge_point_versions(sender, instance, **kwargs):
+    """知识点变化时更新版本"""
+    if kwargs.get('raw', False):
+        return
+    if 'created' not in kwargs:
+        # 删除
+        children = getattr(instance, '_version_children', [])
+    elif kwargs['created']:
+        children = []
+    else:
+        children = _children_of([instance])
+    bump_versions(*knowledge_point_scopes([instance], children))
+
+
+@receiver(post_save, sender=Courseware)
+@receiver(post_delete, sender=Courseware)
+def bump_courseware_versions(sender, instance, **kwargs):
+    """课件变化时更新课件集合、课件对象和所属课程内容的版本"""
+    if kwargs.get('raw', False):
+        return
+    bump_versions(*courseware_scopes([instance]))
+
+
+@receiver(content_changed, sender=Course)
+@receiver(content_changed, sender=KnowledgePoint)
+@receiver(content_changed, sender=Courseware)
+def bump_bulk_versions(sender, instances, created, **kwargs):
+    """批量写入后一次更新所有涉及对象的版本"""
+    if sender is Course:
+        scopes = course_scopes(instances)
+    elif sender is KnowledgePoint:
+        scopes = knowledge_point_scopes(instances, [] if created else _children_of(instances))
+    else:
+        scopes = courseware_scopes(instances)
+    bump_versions(*scopes)
+
+
+# 课程数据中包含的用户字段（教师名称、课件创建者名称）
+USER_PAYLOAD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def bump_user_versions(sender, instance, created, **kwargs):
+    """
+    课程数据中包含的用户字段变化时更新用户版本
+
+    新用户在被设为教师或创建者（更新课程内容版本）之前不出现在课程数据中；
+    登录、角色同步、权限版本等其他字段的变化不影响课程数据
+    """
+    if kwargs.get('raw', False) or created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        changed = set(update_fields)
+    else:
+        # 没有加载记录的对象（如直接构造后保存）无法判断，按全部字段处理
+        changed = instance.changed_fields
+    if changed is None or changed & USER_PAYLOAD_FIELDS:
+        bump_versions(USERS)
+
+
+@receiver(post_delete, sender=User)
+def bump_deleted_user_versions(sender, instance, **kwargs):
+    """删除用户时课程的教师、课件的创建者被置空（不发送保存信号），更新用户版本"""
+    bump_versions(USERS)
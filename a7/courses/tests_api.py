@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -6,6 +6,8 @@ from .models import Course, KnowledgePoint, Courseware
 from users.models import User, Role
 import json
 
+# 测试客户端的请求都来自同一个IP，关闭限流
+@override_settings(RATELIMIT_ENABLED=False)
 class CourseAPITests(TestCase):
     """测试课程API的功能"""
     
@@ -276,6 +278,7 @@ class CourseAPITests(TestCase):
         self.assertNotIn('另一个教师的课程', titles)
 
 
+@override_settings(RATELIMIT_ENABLED=False)
 class KnowledgePointAPITests(TestCase):
     """测试知识点API的功能"""
     
@@ -678,6 +681,7 @@ class KnowledgePointAPITests(TestCase):
         self.assertEqual(results[2]['importance'], 3)
 
 
+@override_settings(RATELIMIT_ENABLED=False)
 class CoursewareAPITests(TestCase):
     """测试课件API的功能"""
     
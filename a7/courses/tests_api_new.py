@@ -1,5 +1,5 @@
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
@@ -24,6 +24,8 @@ def print_debug(response_data, title="Debug Response"):
 User = get_user_model()
 
 
+# 测试客户端的请求都来自同一个IP，关闭限流
+@override_settings(RATELIMIT_ENABLED=False)
 class CourseAPIBaseTestCase(APITestCase):
     """
     API测试基类，用于设置基本测试环境和用户
@@ -0,0 +1,193 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Course, Courseware, KnowledgePoint
+
+User = get_user_model()
+
+
+class ConditionalGetTestCase(APITestCase):
+    """课程内容条件请求（ETag/304）测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='teacher123', role='teacher')
+        self.course = Course.objects.create(title='数学', description='数学课程', teacher=self.teacher)
+        self.other_course = Course.objects.create(title='物理', description='物理课程', teacher=self.teacher)
+        self.parent = KnowledgePoint.objects.create(title='函数', course=self.course)
+        self.child = KnowledgePoint.objects.create(title='一次函数', course=self.course, parent=self.parent)
+        self.other_point = KnowledgePoint.objects.create(title='力学', course=self.other_course)
+        self.courseware = Courseware.objects.create(
+            title='函数讲义', content='内容', course=self.course, created_by=self.teacher
+        )
+        self.client.force_authenticate(user=self.teacher)
+
+    def _etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+
+    def test_not_modified_skips_queryset(self):
+        """测试ETag匹配时返回304，只查询一次版本戳，不查询课程数据"""
+        url = '/api/knowledge-points/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_collection_changes_invalidate(self):
+        """测试知识点变化后列表ETag改变"""
+        etag = self._etag('/api/knowledge-points/')
+        self.other_point.title = '运动学'
+        self.other_point.save()
+        self.assertNotEqual(self._etag('/api/knowledge-points/'), etag)
+
+    def test_course_filtered_list_uses_course_version(self):
+        """测试按课程过滤的列表只受该课程内容变化影响"""
+        url = f'/api/knowledge-points/?course={self.course.pk}'
+        etag = self._etag(url)
+
+        self.other_point.title = '运动学'
+        self.other_point.save()
+        self.assertEqual(self._etag(url), etag)
+
+        self.child.importance = 8
+        self.child.save()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_query_string_in_etag(self):
+        """测试不同查询参数得到不同的ETag"""
+        self.assertNotEqual(
+            self._etag('/api/knowledge-points/?ordering=title'),
+            self._etag('/api/knowledge-points/?ordering=-title'),
+        )
+
+    def test_child_change_invalidates_parent_detail(self):
+        """测试子知识点变化后父知识点详情的ETag改变"""
+        url = f'/api/knowledge-points/{self.parent.pk}/'
+        etag = self._etag(url)
+        self.child.title = '线性函数'
+        self.child.save()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_course_change_invalidates_dependents(self):
+        """测试课程标题变化后知识点详情和课件列表的ETag改变"""
+        point_url = f'/api/knowledge-points/{self.child.pk}/'
+        courseware_url = f'/api/coursewares/by_course/?course={self.course.pk}'
+        point_etag = self._etag(point_url)
+        courseware_etag = self._etag(courseware_url)
+
+        self.course.title = '高等数学'
+        self.course.save()
+
+        self.assertNotEqual(self._etag(point_url), point_etag)
+        self.assertNotEqual(self._etag(courseware_url), courseware_etag)
+
+    def test_moved_courseware_invalidates_old_course(self):
+        """测试课件移动到其他课程时原课程的列表ETag也会改变"""
+        url = f'/api/coursewares/?course={self.course.pk}'
+        etag = self._etag(url)
+        self.courseware.course = self.other_course
+        self.courseware.save()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_last_login_does_not_invalidate(self):
+        """测试登录更新last_login不影响课程数据的ETag，修改用户名会影响"""
+        url = f'/api/courses/{self.course.pk}/'
+        etag = self._etag(url)
+
+        self.teacher.last_login = timezone.now()
+        self.teacher.save(update_fields=['last_login'])
+        self.assertEqual(self._etag(url), etag)
+
+        self.teacher.first_name = '张'
+        self.teacher.save()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_user_fields_outside_payload_do_not_invalidate(self):
+        """测试角色、激活状态、权限版本等不在课程数据中的用户字段变化不影响ETag"""
+        url = '/api/courses/'
+        etag = self._etag(url)
+        student = User.objects.create_user(username='student', password='student123', role='student')
+        student.role = 'teacher'
+        student.is_active = False
+        student.save()
+        self.teacher.email = 'teacher@example.com'
+        self.teacher.save()
+        self.assertEqual(self._etag(url), etag)
+
+        student.delete()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_missing_course_param_not_conditional(self):
+        """测试缺少必要参数时照常返回错误，不附带ETag"""
+        response = self.client.get('/api/coursewares/by_course/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+    def test_unauthenticated_not_modified_denied(self):
+        """测试未认证请求即使携带ETag也返回401"""
+        etag = self._etag('/api/courses/')
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_versions_survive_cache_clear(self):
+        """测试版本戳保存在数据库中，清空缓存（或换一个worker进程）后ETag不变"""
+        url = f'/api/courses/{self.course.pk}/'
+        etag = self._etag(url)
+        cache.clear()
+        self.assertEqual(self._etag(url), etag)
+
+    def test_save_does_not_query_previous_values(self):
+        """测试保存课件时外键原值取自加载记录，只执行更新语句和版本更新"""
+        courseware = Courseware.objects.get(pk=self.courseware.pk)
+        courseware.course = self.other_course
+        with self.assertNumQueries(2):
+            courseware.save()
+
+    def test_queryset_update_invalidates(self):
+        """测试queryset.update()移动知识点时新旧课程的列表ETag都会改变"""
+        old_url = f'/api/knowledge-points/?course={self.course.pk}'
+        new_url = f'/api/knowledge-points/?course={self.other_course.pk}'
+        old_etag, new_etag = self._etag(old_url), self._etag(new_url)
+
+        KnowledgePoint.objects.filter(pk=self.child.pk).update(course=self.other_course, parent=None)
+
+        self.assertNotEqual(self._etag(old_url), old_etag)
+        self.assertNotEqual(self._etag(new_url), new_etag)
+
+    def test_queryset_update_loads_only_keys(self):
+        """测试queryset.update()记录原值时只读取主键和外键，不加载content等字段"""
+        with CaptureQueriesContext(connection) as context:
+            Courseware.objects.filter(course=self.course).update(title='讲义')
+        selects = [q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNotIn('"content"', sql)
+            self.assertNotIn('"title"', sql)
+
+    def test_bulk_create_and_bulk_update_invalidate(self):
+        """测试bulk_create()和bulk_update()也会更新版本"""
+        url = f'/api/coursewares/?course={self.course.pk}'
+        etag = self._etag(url)
+        Courseware.objects.bulk_create([
+            Courseware(title='练习', content='内容', course=self.course, created_by=self.teacher)
+        ])
+        self.assertNotEqual(self._etag(url), etag)
+
+        url = f'/api/courses/{self.course.pk}/'
+        etag = self._etag(url)
+        self.course.title = '高等数学'
+        Course.objects.bulk_update([self.course], ['title'])
+        self.assertNotEqual(self._etag(url), etag)
@@ -1,10 +1,12 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from users.models import User
 from .models import Course, KnowledgePoint, Courseware
 
+# 测试客户端的请求都来自同一个IP，关闭限流
+@override_settings(RATELIMIT_ENABLED=False)
 class CourseApiValidationTests(TestCase):
     """测试课程API验证逻辑"""
 
@@ -125,6 +127,7 @@ class CourseApiValidationTests(TestCase):
         self.assertEqual(Course.objects.get(id=self.course.id).title, 'Updated Course Title')
         
 
+@override_settings(RATELIMIT_ENABLED=False)
 class KnowledgePointApiValidationTests(TestCase):
     """测试知识点API验证逻辑"""
 
@@ -259,6 +262,7 @@ class KnowledgePointApiValidationTests(TestCase):
         self.assertIn('parent', str(content))
 
 
+@override_settings(RATELIMIT_ENABLED=False)
 class CoursewareApiValidationTests(TestCase):
     """测试课件API验证逻辑"""
 
@@ -0,0 +1,28 @@
+"""
+课程内容版本范围
+
+视图根据请求依赖的版本范围生成ETag，信号处理器在数据变化时更新对应范围的版本戳
+"""
+from django.dispatch import Signal
+
+# 集合版本范围：对应模型的任意数据变化时更新
+COURSES = 'course'
+KNOWLEDGE_POINTS = 'knowledgepoint'
+COURSEWARES = 'courseware'
+# 用户信息变化（课程教师名称、课件创建者名称依赖该范围）
+USERS = 'user'
+
+
+def object_scope(collection, pk):
+    """单个对象的版本范围"""
+    return f'{collection}:{pk}'
+
+
+def course_content_scope(course_id):
+    """课程内容的版本范围：课程本身及其知识点、课件的任意变化时更新"""
+    return f'course-content:{course_id}'
+
+
+# 批量写入（queryset.update()、bulk_create()、bulk_update()）不发送保存信号，
+# 由courses.models.ContentQuerySet在写入后发送，参数：instances（写入后的对象）、created
+content_changed = Signal()
@@ -4,6 +4,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.timing import ServerTimingViewMixin
+
+from . import versions
 from .models import Course, KnowledgePoint, Courseware
 from .serializers import (
     CourseSerializer, 
@@ -25,7 +29,15 @@ from .permissions import (
 from .utils import validate_required_params
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+def get_course_param(request):
+    """获取course查询参数，不是有效的课程ID时返回None"""
+    course_id = request.query_params.get('course')
+    if course_id and course_id.isdigit():
+        return int(course_id)
+    return None
+
+
+class CourseViewSet(ServerTimingViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     课程视图集，提供课程的增删改查功能
     """
@@ -46,6 +58,16 @@ class CourseViewSet(viewsets.ModelViewSet):
             return CourseUpdateSerializer
         return CourseSerializer
     
+    def get_version_scopes(self):
+        """
+        条件请求依赖的版本范围（课程数据中包含教师名称，因此同时依赖用户版本）
+        """
+        if self.action in ['list', 'my_courses']:
+            return [versions.COURSES, versions.USERS]
+        if self.action == 'retrieve':
+            return [versions.object_scope(versions.COURSES, self.kwargs['pk']), versions.USERS]
+        return None
+    
     def get_permissions(self):
         """
         根据操作类型设置不同的权限
@@ -85,7 +107,7 @@ class CourseViewSet(viewsets.ModelViewSet):
             )
 
 
-class KnowledgePointViewSet(viewsets.ModelViewSet):
+class KnowledgePointViewSet(ServerTimingViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     知识点视图集，提供知识点的增删改查功能
     """
@@ -129,6 +151,23 @@ class KnowledgePointViewSet(viewsets.ModelViewSet):
             return KnowledgePointUpdateSerializer
         return KnowledgePointSerializer
     
+    def get_version_scopes(self):
+        """
+        条件请求依赖的版本范围：
+        - 按课程过滤的列表只依赖该课程的内容版本
+        - 知识点详情依赖知识点自身（父子知识点变化时也会更新）和课程标题
+        """
+        if self.action in ['list', 'top_level']:
+            course_id = get_course_param(self.request)
+            if course_id is not None:
+                return [versions.course_content_scope(course_id)]
+            return [versions.KNOWLEDGE_POINTS, versions.COURSES]
+        if self.action == 'retrieve':
+            return [versions.object_scope(versions.KNOWLEDGE_POINTS, self.kwargs['pk']), versions.COURSES]
+        if self.action == 'children':
+            return [versions.KNOWLEDGE_POINTS, versions.COURSES]
+        return None
+    
     def get_permissions(self):
         """
         根据操作类型设置不同的权限
@@ -204,7 +243,7 @@ class KnowledgePointViewSet(viewsets.ModelViewSet):
             )
 
 
-class CoursewareViewSet(viewsets.ModelViewSet):
+class CoursewareViewSet(ServerTimingViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     课件视图集，提供课件的增删改查功能
     """
@@ -245,6 +284,22 @@ class CoursewareViewSet(viewsets.ModelViewSet):
             return CoursewareUpdateSerializer
         return CoursewareSerializer
     
+    def get_version_scopes(self):
+        """
+        条件请求依赖的版本范围（课件数据中包含创建者名称，因此同时依赖用户版本）
+        """
+        if self.action in ['list', 'by_course']:
+            course_id = get_course_param(self.request)
+            if course_id is not None:
+                return [versions.course_content_scope(course_id), versions.USERS]
+            if self.action == 'by_course':
+                # 缺少必要参数，由视图返回错误
+                return None
+            return [versions.COURSEWARES, versions.COURSES, versions.USERS]
+        if self.action == 'retrieve':
+            return [versions.object_scope(versions.COURSEWARES, self.kwargs['pk']), versions.COURSES, versions.USERS]
+        return None
+    
     def get_permissions(self):
         """
         根据操作类型设置不同的权限
@@ -6,6 +6,7 @@ from django.db.models import Q
 
 from .models import User, Role
 from .permission_utils import sync_role_permissions
+from .role_propagation import get_role_propagator
 
 
 class CustomUserAdmin(UserAdmin):
@@ -66,7 +67,7 @@ class CustomUserAdmin(UserAdmin):
 
 class RoleAdmin(admin.ModelAdmin):
     """角色管理界面"""
-    list_display = ('name', 'description', 'get_permissions_count', 'get_users_count')
+    list_display = ('name', 'description', 'get_permissions_count', 'get_users_count', 'get_propagation_status')
     search_fields = ('name', 'description')
     filter_horizontal = ('permissions',)
     actions = ['sync_users_with_this_role']
@@ -81,22 +82,33 @@ class RoleAdmin(admin.ModelAdmin):
     
     get_users_count.short_description = '用户数量'
     
+    def get_propagation_status(self, obj):
+        """显示角色最近一次批量同步用户的进度"""
+        progress = get_role_propagator().get_progress(obj.pk)
+        if not progress:
+            return '-'
+        status = {'pending': '等待中', 'running': '同步中', 'done': '已完成', 'failed': '失败'}.get(progress['status'], progress['status'])
+        return f"{status} {progress['updated']}/{progress['total']}"
+    
+    get_propagation_status.short_description = '用户同步'
+    
     def sync_users_with_this_role(self, request, queryset):
-        """同步选定角色的所有用户的权限"""
+        """
+        同步选定角色的所有用户的权限
+        
+        用户的权限由角色提供，只需同步role/role_obj与角色不一致的用户（见users.role_propagation），
+        用户较多时在后台分批执行，上次同步失败时从中断处继续
+        """
+        propagator = get_role_propagator()
         for role in queryset:
-            users_updated = 0
-            # 更新使用此角色的所有用户
-            for user in User.objects.filter(role_obj=role):
-                user.user_permissions.set(role.permissions.all())
-                users_updated += 1
-            
-            # 同时更新使用角色名称但未设置role_obj的用户
-            for user in User.objects.filter(role=role.name, role_obj__isnull=True):
-                user.role_obj = role
-                user.user_permissions.set(role.permissions.all())
-                user.save(syncing_roles=True)
-                users_updated += 1
-                
+            users_updated = propagator.pending_users(role).count()
+            if propagator.schedule(role, resume=True):
+                self.message_user(
+                    request,
+                    f'正在后台同步角色 "{role.name}" 的 {users_updated} 个用户，可在角色列表中查看进度',
+                    messages.INFO
+                )
+                continue
             self.message_user(
                 request,
                 f'已同步角色 "{role.name}" 的权限到 {users_updated} 个用户。',
@@ -109,14 +121,14 @@ class RoleAdmin(admin.ModelAdmin):
         """保存模型时同步权限"""
         super().save_model(request, obj, form, change)
         
-        # 如果权限发生了变化，同步到所有使用此角色的用户
+        # 使用该角色的用户较多时在后台同步，页面立即返回
+        progress = get_role_propagator().get_progress(obj.pk)
+        if progress and progress['status'] in ('pending', 'running'):
+            messages.info(request, f"正在后台同步 {progress['total']} 个用户的角色，可在角色列表中查看进度")
+        
+        # 角色权限对所有使用此角色的用户立即生效（m2m_changed信号更新权限版本），无需逐个写入用户权限
         if change and 'permissions' in form.changed_data:
-            users_count = 0
-            # 更新使用此角色的所有用户
-            for user in User.objects.filter(Q(role_obj=obj) | Q(role=obj.name)):
-                user.user_permissions.set(obj.permissions.all())
-                users_count += 1
-                
+            users_count = User.objects.filter(Q(role_obj=obj) | Q(role=obj.name)).count()
             messages.info(request, f'已同步角色权限到 {users_count} 个用户')
 
 
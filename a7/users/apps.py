@@ -7,5 +7,15 @@ class UsersConfig(AppConfig):
     verbose_name = '用户管理'
     
     def ready(self):
-        # 导入信号处理器
+        # 导入信号处理器（过期令牌的定时清理在处理第一个请求时启动）
         import users.signals
+        import users.token_purge
+
+        # 在就绪检查中导出用户缓存、权限缓存和令牌黑名单过滤器的统计信息
+        from apps.core.health import register_probe
+        from users.blacklist import blacklist_filter_probe
+        from users.permission_cache import permission_cache_probe
+        from users.user_cache import user_cache_probe
+        register_probe('user_cache', user_cache_probe)
+        register_probe('permission_cache', permission_cache_probe)
+        register_probe('token_blacklist_filter', blacklist_filter_probe)
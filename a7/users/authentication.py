@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .user_cache import get_user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    复用JWTAuthMiddleware认证结果的JWT认证类
+
+    中间件已经校验过令牌并查询了用户时，直接返回保存在request.jwt_auth中的(user, token)，
+    避免同一个请求重复解码令牌和查询用户；没有中间件结果（如豁免路径、中间件未启用）时按原方式认证。
+    令牌中的用户通过两级用户缓存（users.user_cache）解析，缓存命中时不查询数据库。
+    """
+
+    def authenticate(self, request):
+        cached = getattr(request, 'jwt_auth', None)
+        if cached is not None:
+            header = self.get_header(request)
+            # 只在请求头中的令牌与中间件校验的令牌一致时复用
+            if header is not None and self.get_raw_token(header) == cached[1].token:
+                return cached
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        # 需要校验密码哈希或不按主键识别用户时，快照中没有所需字段，直接查询数据库
+        if (not getattr(settings, 'USER_CACHE_ENABLED', True)
+                or api_settings.CHECK_REVOKE_TOKEN
+                or api_settings.USER_ID_FIELD not in ('id', 'pk')):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_user_cache().get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
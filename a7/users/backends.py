@@ -0,0 +1,37 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .permission_cache import get_permission_resolver
+
+
+class RolePermissionBackend(ModelBackend):
+    """
+    基于角色的权限后端
+
+    认证与ModelBackend相同。用户的有效权限 = 角色（role_obj）权限 ∪ 直接权限 ∪ 组权限，
+    由权限解析器（users.permission_cache）一次查询或从缓存得到，
+    因此不再需要把角色的权限逐个写入每个用户的user_permissions，user_permissions只保存单独授予的权限。
+    User.has_perm和User.has_module_perms通过AUTHENTICATION_BACKENDS调用本后端。
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super().get_all_permissions(user_obj, obj)
+        return set(get_permission_resolver().get(user_obj).names)
+
+    def has_perm(self, user_obj, perm, obj=None):
+        """权限格式可能是app.codename或直接是codename，与原User.has_perm一样只比较codename"""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return False
+        if user_obj.is_superuser:
+            return True
+        codename = perm.split('.', 1)[-1]
+        return codename in get_permission_resolver().get(user_obj).codenames
+
+    def has_module_perms(self, user_obj, app_label):
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return False
+        if user_obj.is_superuser:
+            return True
+        return app_label in get_permission_resolver().get(user_obj).app_labels
@@ -0,0 +1,281 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.core.background import PeriodicWorker
+from apps.core.shared_cache import is_shared_cache
+
+# 共享缓存中记录黑名单写入次数的键，各进程据此判断是否需要增量同步
+GENERATION_KEY = 'token-blacklist:generation'
+
+
+class BloomFilter:
+    """
+    布隆过滤器
+
+    按预期容量和误判率计算位数组大小和哈希次数；使用blake2b摘要的两个64位整数做双重哈希
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistFilter:
+    """
+    令牌黑名单查询加速器
+
+    布隆过滤器保存上次全量重建时所有未过期的黑名单JTI，重建之后新增的JTI保存在精确集合中：
+    - 两者都不包含的JTI一定不在黑名单中，不查询数据库
+    - 精确集合中的JTI一定在黑名单中，不查询数据库
+    - 只命中布隆过滤器的JTI查询数据库确认（布隆过滤器存在误判）
+    黑名单写入时（信号）更新本进程的过滤器，事务提交后增加共享缓存中的代数，各进程在查询时发现代数变化后
+    从数据库增量加载最近写入的JTI；后台任务每隔rebuild_interval秒全量重建，清除已过期的令牌。
+
+    - 首次查询时唤醒后台任务构建过滤器，构建完成前直接查询数据库，不在请求线程中全量加载
+    - check_interval大于0时（适合DatabaseCache）每个进程每隔check_interval秒才读取一次代数，
+      其他进程写入的黑名单最迟check_interval秒后生效（本进程的写入立即生效）
+    - verify_negatives为True时（保存代数的缓存不在进程间共享，其他进程的写入无法及时同步），
+      两者都不包含的JTI同样查询数据库确认，过滤器只用于减少已加入黑名单的令牌的查询
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01, rebuild_interval=300, sync_margin=60,
+                 cache_alias='shared', verify_negatives=False, check_interval=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.sync_margin = sync_margin
+        self.cache_alias = cache_alias
+        self.verify_negatives = verify_negatives
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._checked_at = None
+        self._bloom = None
+        self._recent = set()
+        self._generation = None
+        self._synced_at = None
+        self._build_requested_pid = None
+        self.built_at = None
+
+        # 统计计数器
+        self.lookups = 0
+        self.negatives = 0
+        self.recent_hits = 0
+        self.db_checks = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self.syncs = 0
+
+        self.worker = PeriodicWorker('token-blacklist-filter', rebuild_interval, self.rebuild, final_run=False)
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建过滤器，保存代数的缓存只在进程内有效时查询数据库确认否定结果"""
+        cache_alias = getattr(settings, 'TOKEN_BLACKLIST_FILTER_CACHE', 'shared')
+        return cls(
+            capacity=getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 100000),
+            error_rate=getattr(settings, 'TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.01),
+            rebuild_interval=getattr(settings, 'TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL', 300),
+            cache_alias=cache_alias,
+            verify_negatives=not is_shared_cache(cache_alias),
+            check_interval=getattr(settings, 'TOKEN_BLACKLIST_FILTER_CHECK_INTERVAL', 0),
+        )
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def is_blacklisted(self, jti):
+        """判断JTI是否在黑名单中，只有布隆过滤器命中时才查询数据库"""
+        if self._bloom is None:
+            self._request_build()
+        else:
+            self.maybe_sync()
+
+        with self._lock:
+            self.lookups += 1
+            bloom = self._bloom
+            if bloom is not None and jti in self._recent:
+                self.recent_hits += 1
+                return True
+            maybe_blacklisted = bloom is None or jti in bloom
+            if not maybe_blacklisted and not self.verify_negatives:
+                self.negatives += 1
+                return False
+            self.db_checks += 1
+
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if not blacklisted and bloom is not None and maybe_blacklisted:
+            with self._lock:
+                self.false_positives += 1
+        return blacklisted
+
+    def _request_build(self):
+        """唤醒后台任务构建过滤器（每个进程只唤醒一次）；后台任务未启用时在当前线程中构建"""
+        pid = os.getpid()
+        if self._build_requested_pid == pid:
+            return
+        self._build_requested_pid = pid
+        if not self.worker.trigger():
+            self.rebuild()
+
+    def add(self, jti):
+        """记录本进程新加入黑名单的JTI"""
+        with self._lock:
+            if self._bloom is not None:
+                self._recent.add(jti)
+
+    def notify(self):
+        """增加共享缓存中的代数，通知所有进程增量同步（需在写入事务提交后调用）"""
+        try:
+            self.shared.incr(GENERATION_KEY)
+        except ValueError:
+            # 缓存中还没有代数（或已被淘汰）
+            if not self.shared.add(GENERATION_KEY, 1, timeout=None):
+                self.shared.incr(GENERATION_KEY)
+
+    def rebuild(self):
+        """从数据库全量重建过滤器，只包含未过期的令牌"""
+        generation = self.shared.get(GENERATION_KEY)
+        started = timezone.now()
+        entries = (
+            BlacklistedToken.objects
+            .filter(token__expires_at__gt=started)
+            .values_list('token__jti', flat=True)
+        )
+        count = entries.count()
+        bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+        for jti in entries.iterator(chunk_size=5000):
+            bloom.add(jti)
+
+        with self._lock:
+            self._bloom = bloom
+            self._recent = set()
+            self._generation = generation
+            self._synced_at = started
+            self.built_at = time.time()
+            self.rebuilds += 1
+
+    def maybe_sync(self, now=None):
+        """距上次读取代数超过check_interval秒时检查一次；其他线程正在检查时直接返回"""
+        now = time.monotonic() if now is None else now
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            self._sync_if_changed()
+        finally:
+            self._check_lock.release()
+
+    def _sync_if_changed(self):
+        """共享缓存中的代数变化时，从数据库增量加载最近加入黑名单的JTI"""
+        generation = self.shared.get(GENERATION_KEY)
+        if generation == self._generation:
+            return
+        with self._lock:
+            since = self._synced_at - timedelta(seconds=self.sync_margin)
+        started = timezone.now()
+        # 按写入时间加载并向前多取sync_margin秒，避免遗漏提交较晚的事务中的记录
+        jtis = list(
+            BlacklistedToken.objects
+            .filter(blacklisted_at__gte=since)
+            .values_list('token__jti', flat=True)
+        )
+        with self._lock:
+            self._recent.update(jtis)
+            self._generation = generation
+            self._synced_at = started
+            self.syncs += 1
+
+    def stats(self):
+        """返回过滤器统计信息"""
+        with self._lock:
+            return {
+                'bloom_entries': self._bloom.count if self._bloom is not None else 0,
+                'verify_negatives': self.verify_negatives,
+                'recent_entries': len(self._recent),
+                'lookups': self.lookups,
+                'negatives': self.negatives,
+                'recent_hits': self.recent_hits,
+                'db_checks': self.db_checks,
+                'false_positives': self.false_positives,
+                'rebuilds': self.rebuilds,
+                'syncs': self.syncs,
+                'built_at': self.built_at,
+            }
+
+
+def is_token_blacklisted(jti):
+    """判断JTI是否在黑名单中，关闭过滤器时直接查询数据库"""
+    if not getattr(settings, 'TOKEN_BLACKLIST_FILTER_ENABLED', True):
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+    return get_blacklist_filter().is_blacklisted(jti)
+
+
+class FilteredBlacklistMixin:
+    """
+    令牌类混入：使用黑名单过滤器检查令牌是否已加入黑名单
+
+    需要放在simplejwt的BlacklistMixin（RefreshToken等）之前
+    """
+
+    def check_blacklist(self):
+        if is_token_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+
+_filter = None
+
+
+def get_blacklist_filter():
+    """获取全局黑名单过滤器（首次使用时构建）"""
+    global _filter
+    if _filter is None:
+        _filter = BlacklistFilter.from_settings()
+    return _filter
+
+
+def blacklist_filter_probe():
+    """健康检查中导出黑名单过滤器的统计信息"""
+    return get_blacklist_filter().stats()
+
+
+@receiver(setting_changed)
+def _reset_blacklist_filter(setting, **kwargs):
+    """过滤器配置变更时（如测试中的override_settings）重建"""
+    global _filter
+    if setting.startswith('TOKEN_BLACKLIST_FILTER_'):
+        _filter = None
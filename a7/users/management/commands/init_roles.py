@@ -1,10 +1,12 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from django.contrib.auth import get_user_model
 
-from users.permission_utils import sync_role_permissions, assign_role_permissions
+from users.permission_utils import sync_default_roles
+from users.role_sync import (
+    CheckpointMismatch, ParallelSyncUnsupported, RoleSyncer, check_workers, role_statistics, web_worker_notice,
+)
 
-User = get_user_model()
 
 class Command(BaseCommand):
     help = '初始化角色和权限，同时更新现有用户的权限'
@@ -14,35 +16,80 @@ class Command(BaseCommand):
             '--force',
             action='store_true',
             dest='force',
-            help='强制重置所有角色和权限',
+            help='强制重置所有角色和权限（以用户的role字段为准重新关联角色对象）',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='每批更新的用户数（默认使用ROLE_SYNC_CHUNK_SIZE）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='并行处理的工作进程数，默认在当前进程中顺序处理',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只列出需要更新的用户，不写入数据库',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='忽略已有的检查点，从头开始更新',
         )
     
     def handle(self, *args, **options):
         force = options.get('force', False)
+        dry_run = options['dry_run']
+        try:
+            check_workers(options['workers'])
+        except ParallelSyncUnsupported as exc:
+            raise CommandError(str(exc))
         
-        with transaction.atomic():
-            # 同步角色和权限
-            roles = sync_role_permissions()
+        if not dry_run:
+            # 同步角色和权限（只涉及少量记录，使用单独的事务）
+            with transaction.atomic():
+                sync_default_roles()
             self.stdout.write(self.style.SUCCESS('√ 角色和权限同步成功'))
-            
-            # 打印角色信息
-            for role_name, role in roles.items():
-                perm_count = role.permissions.count()
-                self.stdout.write(
-                    self.style.SUCCESS(f'- {role_name}: {role.description} ({perm_count}个权限)')
-                )
-            
-            # 更新用户权限
-            users = User.objects.all()
-            updated_count = 0
-            
-            for user in users:
-                # 如果强制更新或用户没有任何权限
-                if force or not user.user_permissions.exists():
-                    result = assign_role_permissions(user)
-                    if result:
-                        updated_count += 1
-            
+        
+        # 打印角色信息（一次聚合查询）
+        for role in role_statistics():
             self.stdout.write(
-                self.style.SUCCESS(f'√ 已更新{updated_count}/{users.count()}个用户的权限')
-            ) 
\ No newline at end of file
+                self.style.SUCCESS(f"- {role['name']}: {role['description']} ({role['permission_count']}个权限)")
+            )
+        
+        # 更新用户的角色对象（用户的权限由角色提供），每批用户在单独的事务中更新
+        syncer = RoleSyncer(
+            'init_roles',
+            chunk_size=options['chunk_size'] or getattr(settings, 'ROLE_SYNC_CHUNK_SIZE', 1000),
+            checkpoint_file=getattr(settings, 'ROLE_SYNC_CHECKPOINT_FILE', None),
+            workers=options['workers'],
+            prefer_role_field=force,
+            dry_run=dry_run,
+        )
+        if not dry_run and options['restart']:
+            syncer.clear_checkpoint()
+        try:
+            checkpoint = None if dry_run else syncer.load_checkpoint()
+        except CheckpointMismatch as exc:
+            raise CommandError(f'{exc}，使用--restart从头开始更新')
+        if checkpoint:
+            self.stdout.write(f'从检查点继续: 主键>{checkpoint}')
+        stats = syncer.run()
+        
+        if dry_run:
+            for pk, username, field, old, new in stats['changes']:
+                self.stdout.write(f"  - {username}(#{pk}): {field} {old or '-'} -> {new}")
+            self.stdout.write(self.style.WARNING(
+                f"[dry-run] {stats['updated']}/{stats['scanned']}个用户需要更新"
+            ))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"√ 已更新{stats['updated']}/{stats['scanned']}个用户的权限")
+        )
+        notice = web_worker_notice() if stats['updated'] else None
+        if notice:
+            self.stdout.write(self.style.WARNING(notice))
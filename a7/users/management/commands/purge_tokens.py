@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.token_purge import TokenPurger, acquire_purge_lock, refresh_purge_lock, release_purge_lock
+
+
+class Command(BaseCommand):
+    help = '分批删除已过期的OutstandingToken和BlacklistedToken记录，支持中断后从检查点继续'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='每批删除的令牌数（默认使用TOKEN_PURGE_BATCH_SIZE）',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=None,
+            help='批次之间的暂停时间，单位秒（默认使用TOKEN_PURGE_PAUSE）',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='最多执行的批次数，达到后停止并保留检查点',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='最长执行时间（秒），达到后停止并保留检查点',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='忽略已有的检查点，从头开始清理',
+        )
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='清理完成后回收空间（PostgreSQL执行VACUUM ANALYZE，SQLite仅在incremental模式下执行）',
+        )
+
+    def handle(self, *args, **options):
+        # 与定时任务共用清理锁，避免同时删除同一批令牌；每批完成后延长锁的有效期，命令中断后锁自动过期
+        if not acquire_purge_lock():
+            raise CommandError('另一个清理任务（定时任务或purge_tokens命令）正在运行，请稍后再试')
+        try:
+            self.purge(options)
+        finally:
+            release_purge_lock()
+
+    def purge(self, options):
+        purger = TokenPurger(
+            batch_size=options['batch_size'] or getattr(settings, 'TOKEN_PURGE_BATCH_SIZE', 1000),
+            pause=options['pause'] if options['pause'] is not None else getattr(settings, 'TOKEN_PURGE_PAUSE', 0.1),
+            checkpoint_file=getattr(settings, 'TOKEN_PURGE_CHECKPOINT_FILE', None),
+        )
+
+        if options['restart']:
+            purger.clear_checkpoint()
+        checkpoint = purger.load_checkpoint()
+        if checkpoint:
+            self.stdout.write(f"从检查点继续: 截止时间={checkpoint['cutoff']}, 主键>{checkpoint['last_id']}")
+
+        verbosity = options['verbosity']
+
+        def progress(stats):
+            refresh_purge_lock()
+            if verbosity > 1:
+                self.stdout.write(
+                    f"  第{stats['batches']}批: 累计删除OutstandingToken {stats['outstanding_deleted']}条, "
+                    f"BlacklistedToken {stats['blacklisted_deleted']}条"
+                )
+
+        stats = purger.purge(
+            max_batches=options['max_batches'],
+            max_seconds=options['max_seconds'],
+            progress=progress,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"√ 已删除OutstandingToken {stats['outstanding_deleted']}条, "
+            f"BlacklistedToken {stats['blacklisted_deleted']}条（{stats['batches']}批, {stats['elapsed']}秒）"
+        ))
+        if not stats['completed']:
+            self.stdout.write(self.style.WARNING('未全部完成，进度已保存，再次运行将从检查点继续'))
+        elif options['compact']:
+            operation = purger.compact()
+            if operation:
+                self.stdout.write(self.style.SUCCESS(f'√ 已回收空间: {operation}'))
+            else:
+                self.stdout.write(self.style.WARNING('当前数据库不支持在线回收空间，已跳过'))
@@ -1,26 +1,56 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.contrib.auth.models import Permission
 from django.db.models import Q
 
 from users.models import Role
-
-User = get_user_model()
+from users.role_sync import (
+    CheckpointMismatch, ParallelSyncUnsupported, RoleSyncer, check_workers, role_statistics, web_worker_notice,
+)
 
 class Command(BaseCommand):
     help = "同步用户的角色对象和权限，并创建默认角色"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='每批同步的用户数（默认使用ROLE_SYNC_CHUNK_SIZE）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='并行处理的工作进程数，默认在当前进程中顺序处理',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只列出需要更新的用户，不写入数据库',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='忽略已有的检查点，从头开始同步',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE("开始同步角色和权限..."))
+        dry_run = options['dry_run']
+        try:
+            check_workers(options['workers'])
+        except ParallelSyncUnsupported as exc:
+            raise CommandError(str(exc))
         
-        # 使用事务确保数据一致性
-        with transaction.atomic():
-            # 创建默认角色
-            self.create_default_roles()
+        # 创建默认角色（只涉及少量记录，使用单独的事务）
+        if not dry_run:
+            with transaction.atomic():
+                self.create_default_roles()
             
-            # 同步用户角色
-            self.sync_user_roles()
+        # 同步用户角色（每批用户在单独的事务中更新）
+        self.sync_user_roles(options)
             
         # 输出角色和用户统计信息
         self.show_statistics()
@@ -60,45 +90,54 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f"已创建或更新默认角色: admin, teacher, student"))
         
-    def sync_user_roles(self):
-        """同步用户角色，使用直接数据库更新避免触发信号"""
+    def sync_user_roles(self, options):
+        """分批同步用户角色，使用bulk_update避免逐个保存用户和触发信号"""
         self.stdout.write("同步用户角色...")
         
-        # 获取所有角色
-        roles = {role.name: role for role in Role.objects.all()}
+        syncer = RoleSyncer(
+            'sync_roles',
+            chunk_size=options['chunk_size'] or getattr(settings, 'ROLE_SYNC_CHUNK_SIZE', 1000),
+            checkpoint_file=getattr(settings, 'ROLE_SYNC_CHECKPOINT_FILE', None),
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+        )
+        if not options['dry_run'] and options['restart']:
+            syncer.clear_checkpoint()
         
-        # 遍历所有用户
-        total_users = User.objects.count()
-        updated_count = 0
+        verbosity = options['verbosity']
         
-        for user in User.objects.all():
-            updated = False
-            
-            # 如果用户有role但没有role_obj
-            if user.role and not user.role_obj and user.role in roles:
-                user.role_obj = roles[user.role]
-                updated = True
-                
-            # 如果用户有role_obj但role不匹配
-            elif user.role_obj and user.role != user.role_obj.name:
-                user.role = user.role_obj.name
-                updated = True
-                
-            # 如果需要更新，直接保存
-            if updated:
-                # 使用update_fields减少触发其他信号处理器的可能性
-                user.save(update_fields=['role', 'role_obj'], syncing_roles=True)
-                updated_count += 1
-                
-        self.stdout.write(self.style.SUCCESS(f"共处理 {total_users} 个用户，更新了 {updated_count} 个用户的角色"))
+        def progress(stats):
+            if verbosity > 1:
+                self.stdout.write(f"  已处理 {stats['chunks']} 批，{stats['scanned']} 个用户")
+        
+        try:
+            checkpoint = None if options['dry_run'] else syncer.load_checkpoint()
+        except CheckpointMismatch as exc:
+            raise CommandError(f'{exc}，使用--restart从头开始同步')
+        if checkpoint:
+            self.stdout.write(f"从检查点继续: 主键>{checkpoint}")
+        stats = syncer.run(progress=progress)
+        
+        if options['dry_run']:
+            for pk, username, field, old, new in stats['changes']:
+                self.stdout.write(f"  - {username}(#{pk}): {field} {old or '-'} -> {new}")
+            self.stdout.write(self.style.WARNING(
+                f"[dry-run] 共检查 {stats['scanned']} 个用户，{stats['updated']} 个用户需要更新角色"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"共处理 {stats['scanned']} 个用户，更新了 {stats['updated']} 个用户的角色"
+        ))
+        notice = web_worker_notice() if stats['updated'] else None
+        if notice:
+            self.stdout.write(self.style.WARNING(notice))
     
     def show_statistics(self):
-        """显示角色和用户统计信息"""
+        """显示角色和用户统计信息（一次聚合查询）"""
         self.stdout.write("\n角色及关联用户统计:")
         
-        for role in Role.objects.all():
-            # 直接查询以避免触发额外的信号处理
-            direct_user_count = User.objects.filter(role_obj=role).count()
-            string_user_count = User.objects.filter(role=role.name).count()
-            
-            self.stdout.write(f"  - {role.name}: {direct_user_count} 个用户通过role_obj关联，{string_user_count} 个用户通过role字段关联") 
\ No newline at end of file
+        for role in role_statistics():
+            self.stdout.write(
+                f"  - {role['name']}: {role['direct_user_count']} 个用户通过role_obj关联，"
+                f"{role['string_user_count']} 个用户通过role字段关联"
+            )
@@ -1,3 +1,4 @@
 from .jwt_auth_middleware import JWTAuthMiddleware
+from .role_permission_middleware import RoleBasedPermissionMiddleware
 
-__all__ = ['JWTAuthMiddleware'] 
\ No newline at end of file
+__all__ = ['JWTAuthMiddleware', 'RoleBasedPermissionMiddleware']
@@ -1,13 +1,17 @@
 import logging
 import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import (
     InvalidToken, TokenError, AuthenticationFailed
 )
 from django.conf import settings
 
+from apps.core.routing import get_route_info
+from users.authentication import CachedJWTAuthentication
+from apps.core.timing import timed
+
 # 创建JWT认证日志记录器
 logger = logging.getLogger('jwt_auth')
 
@@ -19,91 +23,118 @@ class JWTAuthMiddleware:
     - 处理令牌验证过程
     - 记录认证尝试和结果
     - 处理令牌失效或过期的情况
+    
+    同时支持同步（WSGI）和异步（ASGI）调用，异步模式下只有令牌校验中的用户查询在线程池中执行
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
-        self.auth = JWTAuthentication()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.auth = CachedJWTAuthentication()
         
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
         # 开始计时，用于性能日志
         start_time = time.time()
         
-        # 检查请求路径，排除不需要认证的路径
-        path = request.path_info.lstrip('/')
-        if any(path.startswith(url) for url in self.get_exempt_urls()):
+        # 检查请求路径，排除不需要认证的路径（JWT_AUTH_EXEMPT_PATHS）
+        route_info = get_route_info(request)
+        if route_info.auth_exempt:
             return self.get_response(request)
         
-        # 检查请求头中是否有Authorization头
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        
-        if auth_header and auth_header.startswith('Bearer '):
+        # 检查请求头中是否有Bearer令牌
+        if self.has_bearer_token(request):
             # 尝试验证令牌
             try:
-                # 使用JWTAuthentication进行认证
-                authenticated = self.auth.authenticate(request)
-                
-                if authenticated:
-                    user, token = authenticated
-                    # 在请求中保存令牌信息，供后续中间件使用
-                    request.token = token
-                    request.token_payload = token.payload
-                    
-                    # 记录成功认证
-                    self.log_auth_success(request, user, time.time() - start_time)
-                else:
-                    # 记录认证失败
-                    self.log_auth_failure(request, "No credentials were provided", time.time() - start_time)
-            
-            except InvalidToken as e:
-                # 令牌无效
-                self.log_auth_failure(request, f"Invalid token: {str(e)}", time.time() - start_time)
-                
-                # 如果配置为自定义响应且是API请求
-                if getattr(settings, 'CUSTOM_JWT_ERROR_RESPONSE', False) and request.path.startswith('/api/'):
-                    return self.custom_jwt_error_response(request, "无效的认证令牌，请重新登录")
-                
-            except TokenError as e:
-                # 令牌错误（可能是过期）
-                self.log_auth_failure(request, f"Token error: {str(e)}", time.time() - start_time)
-                
-                # 如果配置为自定义响应且是API请求
-                if getattr(settings, 'CUSTOM_JWT_ERROR_RESPONSE', False) and request.path.startswith('/api/'):
-                    return self.custom_jwt_error_response(request, "认证令牌已过期，请重新登录")
-                
-            except AuthenticationFailed as e:
-                # 认证失败（如用户已禁用）
-                self.log_auth_failure(request, f"Authentication failed: {str(e)}", time.time() - start_time)
-                
-                # 如果配置为自定义响应且是API请求
-                if getattr(settings, 'CUSTOM_JWT_ERROR_RESPONSE', False) and request.path.startswith('/api/'):
-                    return self.custom_jwt_error_response(request, "认证失败，用户可能已被禁用")
-                
+                # 使用JWTAuthentication进行认证（用户通过两级用户缓存解析）
+                with timed('auth'):
+                    authenticated = self.auth.authenticate(request)
             except Exception as e:
-                # 其他异常
-                self.log_auth_failure(request, f"Unexpected error: {str(e)}", time.time() - start_time)
-                
-                # 如果配置为自定义响应且是API请求
-                if getattr(settings, 'CUSTOM_JWT_ERROR_RESPONSE', False) and request.path.startswith('/api/'):
-                    return self.custom_jwt_error_response(request, "认证处理过程中发生错误")
+                error_response = self.handle_auth_error(request, route_info, e, start_time)
+                if error_response is not None:
+                    return error_response
+            else:
+                self.handle_auth_result(request, authenticated, start_time)
         
         # 执行下一个中间件/视图
         response = self.get_response(request)
         return response
     
-    def get_exempt_urls(self):
-        """获取豁免URL，这些URL不需要进行JWT认证"""
-        return [
-            'admin/',
-            'static/',
-            'media/',
-            'api-auth/',
-            'api/token/',
-            'api/login/',
-            'swagger/',
-            'redoc/',
-            'health-check/',
-        ]
+    async def __acall__(self, request):
+        """异步调用入口"""
+        start_time = time.time()
+        
+        route_info = get_route_info(request)
+        if route_info.auth_exempt:
+            return await self.get_response(request)
+        
+        # 只有携带令牌的请求才需要查询用户，此时才切换到线程池执行
+        if self.has_bearer_token(request):
+            try:
+                with timed('auth'):
+                    authenticated = await sync_to_async(self.auth.authenticate)(request)
+            except Exception as e:
+                error_response = self.handle_auth_error(request, route_info, e, start_time)
+                if error_response is not None:
+                    return error_response
+            else:
+                self.handle_auth_result(request, authenticated, start_time)
+        
+        return await self.get_response(request)
+    
+    def has_bearer_token(self, request):
+        """检查请求头中是否有Bearer令牌"""
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(auth_header) and auth_header.startswith('Bearer ')
+    
+    def handle_auth_result(self, request, authenticated, start_time):
+        """处理认证结果"""
+        if authenticated:
+            user, token = authenticated
+            # 在请求中保存令牌信息，供后续中间件使用
+            request.token = token
+            request.token_payload = token.payload
+            # 保存认证结果，DRF的CachedJWTAuthentication直接复用，不再重复解码令牌和查询用户
+            request.jwt_auth = authenticated
+            
+            # 记录成功认证
+            self.log_auth_success(request, user, time.time() - start_time)
+        else:
+            # 记录认证失败
+            self.log_auth_failure(request, "No credentials were provided", time.time() - start_time)
+    
+    def handle_auth_error(self, request, route_info, error, start_time):
+        """处理认证异常，需要返回自定义错误响应时返回响应对象，否则返回None"""
+        if isinstance(error, InvalidToken):
+            # 令牌无效
+            reason = f"Invalid token: {str(error)}"
+            message = "无效的认证令牌，请重新登录"
+        elif isinstance(error, TokenError):
+            # 令牌错误（可能是过期）
+            reason = f"Token error: {str(error)}"
+            message = "认证令牌已过期，请重新登录"
+        elif isinstance(error, AuthenticationFailed):
+            # 认证失败（如用户已禁用）
+            reason = f"Authentication failed: {str(error)}"
+            message = "认证失败，用户可能已被禁用"
+        else:
+            # 其他异常
+            reason = f"Unexpected error: {str(error)}"
+            message = "认证处理过程中发生错误"
+        
+        self.log_auth_failure(request, reason, time.time() - start_time)
+        
+        # 如果配置为自定义响应且是API请求
+        if getattr(settings, 'CUSTOM_JWT_ERROR_RESPONSE', False) and route_info.is_api:
+            return self.custom_jwt_error_response(request, message)
+        return None
     
     def log_auth_success(self, request, user, elapsed_time):
         """记录认证成功"""
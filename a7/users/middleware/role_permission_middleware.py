@@ -1,9 +1,12 @@
 import json
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
 from django.urls import resolve
 from django.conf import settings
 
+from apps.core.routing import get_route_info
+
 # 创建权限日志记录器
 logger = logging.getLogger('permission_log')
 
@@ -12,23 +15,57 @@ class RoleBasedPermissionMiddleware:
     """
     基于角色的权限检查中间件
     记录权限检查结果并提供自定义的权限拒绝响应
+    同时支持同步（WSGI）和异步（ASGI）调用
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
         
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
         # 在视图处理前的逻辑
         
-        # 检查请求路径，排除不需要检查的路径（如静态文件、管理页面等）
-        path = request.path_info.lstrip('/')
-        if any(path.startswith(url) for url in self.get_exempt_urls()):
+        # 检查请求路径，排除不需要检查的路径（如静态文件、管理页面等，见PERMISSION_EXEMPT_PATHS）
+        route_info = get_route_info(request)
+        if route_info.permission_exempt:
             return self.get_response(request)
         
         # 如果用户未登录，直接执行后续过程
         if not request.user.is_authenticated:
             return self.get_response(request)
-            
+        
+        view_name = self.before_view(request)
+        
+        # 执行视图
+        response = self.get_response(request)
+        
+        return self.after_view(request, route_info, view_name, response)
+    
+    async def __acall__(self, request):
+        """异步调用入口"""
+        route_info = get_route_info(request)
+        if route_info.permission_exempt:
+            return await self.get_response(request)
+        
+        # 会话用户是惰性加载的，首次访问需要查询数据库，在线程池中执行
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return await self.get_response(request)
+        
+        view_name = self.before_view(request)
+        response = await self.get_response(request)
+        return self.after_view(request, route_info, view_name, response)
+    
+    def before_view(self, request):
+        """视图执行前：解析视图名称并记录访问尝试"""
         # 获取当前请求的视图函数
         try:
             resolved = resolve(request.path)
@@ -38,33 +75,19 @@ class RoleBasedPermissionMiddleware:
         
         # 记录访问尝试
         self.log_access_attempt(request, view_name)
-        
-        # 执行视图
-        response = self.get_response(request)
-        
-        # 检查响应代码，记录权限拒绝情况
+        return view_name
+    
+    def after_view(self, request, route_info, view_name, response):
+        """视图执行后：检查响应代码，记录权限拒绝情况"""
         if response.status_code in [401, 403]:
             self.log_permission_denied(request, view_name, response.status_code)
             
             # 如果设置了自定义的权限拒绝响应且是API请求
-            if getattr(settings, 'CUSTOM_PERMISSION_DENIED_RESPONSE', False) and request.path.startswith('/api/'):
+            if getattr(settings, 'CUSTOM_PERMISSION_DENIED_RESPONSE', False) and route_info.is_api:
                 return self.custom_permission_denied_response(request, response)
         
         return response
     
-    def get_exempt_urls(self):
-        """获取豁免URL，这些URL不需要进行权限检查"""
-        return [
-            'admin/',
-            'static/',
-            'media/',
-            'api-auth/',
-            'api/token/',
-            'api/login/',
-            'swagger/',
-            'redoc/',
-        ]
-    
     def log_access_attempt(self, request, view_name):
         """记录访问尝试"""
         logger.info(
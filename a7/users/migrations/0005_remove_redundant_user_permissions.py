@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def remove_redundant_user_permissions(apps, schema_editor):
+    """
+    删除角色已经提供的用户权限记录
+
+    之前为每个用户写入了角色的全部权限（管理员为全部权限），改为由角色解析权限后这些记录是多余的；
+    只删除用户所属角色（role_obj）拥有的权限，角色之外单独授予的权限（包括管理员的）保留
+    """
+    db_alias = schema_editor.connection.alias
+    User = apps.get_model('users', 'User')
+    Role = apps.get_model('users', 'Role')
+    UserPermission = User.user_permissions.through
+    RolePermission = Role.permissions.through
+
+    role_grants = RolePermission.objects.using(db_alias).filter(
+        role_id=OuterRef('user__role_obj_id'),
+        permission_id=OuterRef('permission_id'),
+    )
+    UserPermission.objects.using(db_alias).filter(Exists(role_grants)).delete()
+
+
+def restore_user_permissions(apps, schema_editor):
+    """回滚时重新为每个用户写入角色的权限"""
+    db_alias = schema_editor.connection.alias
+    User = apps.get_model('users', 'User')
+    Role = apps.get_model('users', 'Role')
+    UserPermission = User.user_permissions.through
+    RolePermission = Role.permissions.through
+
+    users_by_role = {}
+    for user_id, role_id in User.objects.using(db_alias).filter(role_obj__isnull=False).values_list('pk', 'role_obj_id'):
+        users_by_role.setdefault(role_id, []).append(user_id)
+
+    rows = [
+        UserPermission(user_id=user_id, permission_id=permission_id)
+        for role_id, permission_id in RolePermission.objects.using(db_alias).values_list('role_id', 'permission_id')
+        for user_id in users_by_role.get(role_id, [])
+    ]
+    UserPermission.objects.using(db_alias).bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20250522_1602'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_redundant_user_permissions, restore_user_permissions),
+    ]
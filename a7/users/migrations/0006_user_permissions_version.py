@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:09
+
+from django.db import migrations
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_remove_redundant_user_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='permissions_version',
+            field=users.models.VersionField(default=users.models.new_permissions_version, editable=False, verbose_name='权限版本'),
+        ),
+    ]
@@ -1,6 +1,34 @@
+import time
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
-from django.contrib.auth.models import _user_get_permissions
+from django.contrib.auth.models import _user_get_permissions, _user_has_module_perms, _user_has_perm
+
+from apps.core.tracking import TrackedFieldsMixin
+
+
+def new_permissions_version():
+    """
+    新用户的初始权限版本
+
+    取当前时间（微秒）而不是0：主键被重用时（如删除后重建），新用户不会与旧用户的版本相同，
+    不会读到旧用户缓存的权限集
+    """
+    return time.time_ns() // 1000
+
+
+class VersionField(models.PositiveBigIntegerField):
+    """
+    只通过update(F()+1)递增的版本字段
+
+    对象上的值可能已经过期（其他请求或批量操作递增了版本），
+    普通保存更新已有对象时写入字段自身（F表达式），不会用过期的值覆盖数据库中的版本
+    """
+
+    def pre_save(self, model_instance, add):
+        if add:
+            return super().pre_save(model_instance, add)
+        return models.F(self.attname)
 
 
 class Role(models.Model):
@@ -27,7 +55,7 @@ class Role(models.Model):
         return self.name
 
 
-class User(AbstractUser):
+class User(TrackedFieldsMixin, AbstractUser):
     """
     扩展Django默认用户模型，添加角色字段
     """
@@ -52,6 +80,14 @@ class User(AbstractUser):
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     
+    # 权限版本：角色、直接权限、所属组或组权限变化时递增（users.tokens.bump_user_permissions），
+    # 令牌中的授权声明和缓存的权限集都以此判断是否过期
+    permissions_version = VersionField(
+        default=new_permissions_version,
+        editable=False,
+        verbose_name='权限版本'
+    )
+    
     class Meta:
         verbose_name = '用户'
         verbose_name_plural = '用户'
@@ -75,6 +111,10 @@ class User(AbstractUser):
         """
         # 防止递归调用
         syncing_roles = kwargs.pop('syncing_roles', False)
+        # 只更新last_login等非角色字段时不需要检查角色
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & {'role', 'role_obj', 'role_obj_id'}:
+            syncing_roles = True
         if not syncing_roles:
             # 如果设置了role_obj但未设置role，则更新role
             if self.role_obj and self.role != self.role_obj.name:
@@ -88,6 +128,33 @@ class User(AbstractUser):
                     pass
         
         super(User, self).save(*args, **kwargs)
+        # 角色可能已变化，清除本对象上的权限集
+        self.__dict__.pop('_permission_set', None)
+    
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        访问延迟字段时一次性加载全部延迟字段
+        
+        用户缓存（users.user_cache）构建的用户只包含请求处理需要的字段，
+        序列化等场景逐个访问其余字段时，避免每个字段各查询一次数据库
+        """
+        if fields is not None:
+            deferred = self.get_deferred_fields()
+            if set(fields) <= deferred:
+                fields = deferred
+        else:
+            # 重新加载全部字段时角色或权限关系可能已变化，清除本对象上的权限集
+            self.__dict__.pop('_permission_set', None)
+        super().refresh_from_db(using=using, fields=fields)
+        
+    def get_permission_set(self):
+        """
+        获取用户的有效权限集（直接权限、组权限和角色权限）
+        
+        由权限解析器（users.permission_cache）计算，在同一个请求中和跨请求缓存
+        """
+        from .permission_cache import get_permission_resolver
+        return get_permission_resolver().get(self)
         
     def has_perm(self, perm, obj=None):
         """
@@ -106,26 +173,12 @@ class User(AbstractUser):
         if not self.is_active:
             return False
             
-        # 权限格式可能是app.codename或直接是codename
-        if '.' in perm:
-            app_label, codename = perm.split('.')
-        else:
-            app_label, codename = None, perm
-        
-        # 检查用户的直接权限
-        if self.user_permissions.filter(codename=codename).exists():
-            return True
-            
-        # 检查用户所属的组的权限
-        for group in self.groups.all():
-            if group.permissions.filter(codename=codename).exists():
-                return True
-        
-        # 检查用户的role_obj关联的权限（新增）
-        if self.role_obj and self.role_obj.permissions.filter(codename=codename).exists():
+        # 由认证后端（AUTHENTICATION_BACKENDS）检查用户的直接权限、所属组的权限和role_obj关联的权限
+        if _user_has_perm(self, perm, obj):
             return True
                 
         # 为特定角色添加硬编码的权限规则（保留向后兼容）
+        codename = perm.split('.', 1)[-1]
         if self.role == 'teacher':
             teacher_perms = ['view_student_data', 'manage_courses', 'generate_teaching_content']
             if codename in teacher_perms:
@@ -146,18 +199,8 @@ class User(AbstractUser):
         if not self.is_active:
             return False
             
-        # 获取用户的所有权限
-        user_perms = self.user_permissions.filter(content_type__app_label=app_label).exists()
-        if user_perms:
-            return True
-            
-        # 检查用户组的权限
-        for group in self.groups.all():
-            if group.permissions.filter(content_type__app_label=app_label).exists():
-                return True
-        
-        # 检查用户的role_obj关联的权限（新增）
-        if self.role_obj and self.role_obj.permissions.filter(content_type__app_label=app_label).exists():
+        # 由认证后端（AUTHENTICATION_BACKENDS）检查用户的直接权限、所属组的权限和role_obj关联的权限
+        if _user_has_module_perms(self, app_label):
             return True
                 
         # 为特定角色添加硬编码的应用权限
@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+
+# 用户的有效权限：完整权限名（app_label.codename）集合、权限代码集合和权限所属的应用标签集合
+PermissionSet = namedtuple('PermissionSet', ['names', 'codenames', 'app_labels'])
+
+# 用户对象上保存本次请求权限集的属性名
+INSTANCE_ATTR = '_permission_set'
+
+
+def clear_instance_permissions(user):
+    """清除用户对象上的权限集（同一个对象的权限关系发生变化后调用）"""
+    user.__dict__.pop(INSTANCE_ATTR, None)
+
+
+class PermissionResolver:
+    """
+    用户有效权限解析器
+
+    一次查询合并用户的直接权限、所属组的权限和角色对象（role_obj）的权限：
+    - 结果保存在用户对象上，同一个请求中的后续检查不再查询
+    - 结果同时按(用户, 权限版本)保存在Django缓存中，跨请求复用
+    权限版本（User.permissions_version）与令牌中的授权声明共用（见users.tokens），角色、组或用户的
+    权限变化（m2m_changed信号）以及用户角色变化时递增，缓存键随之变化，旧的权限集不会再被读取。
+    """
+
+    def __init__(self, timeout=300, cache_alias='default', key_prefix='user:perms'):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+        # 统计计数器
+        self.request_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建解析器"""
+        return cls(
+            timeout=getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300),
+            cache_alias=getattr(settings, 'PERMISSION_CACHE_ALIAS', 'default'),
+        )
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def key(self, user):
+        return f'{self.key_prefix}:{user.pk}:{user.permissions_version}'
+
+    def get(self, user):
+        """获取用户的有效权限集"""
+        permissions = user.__dict__.get(INSTANCE_ATTR)
+        if permissions is not None:
+            self.request_hits += 1
+            return permissions
+
+        key = self.key(user)
+        permissions = self.shared.get(key)
+        if permissions is not None:
+            self.shared_hits += 1
+        else:
+            permissions = self.load(user)
+            self.misses += 1
+            self.shared.set(key, permissions, self.timeout)
+
+        user.__dict__[INSTANCE_ATTR] = permissions
+        return permissions
+
+    def load(self, user):
+        """从数据库加载用户的有效权限（一次查询）"""
+        query = Q(user=user) | Q(group__user=user)
+        if user.role_obj_id is not None:
+            query |= Q(roles=user.role_obj_id)
+        rows = set(
+            Permission.objects
+            .filter(query)
+            .values_list('content_type__app_label', 'codename')
+            .distinct()
+        )
+        return PermissionSet(
+            names=frozenset(f'{app_label}.{codename}' for app_label, codename in rows),
+            codenames=frozenset(codename for _, codename in rows),
+            app_labels=frozenset(app_label for app_label, _ in rows),
+        )
+
+    def stats(self):
+        """返回命中统计"""
+        lookups = self.request_hits + self.shared_hits + self.misses
+        return {
+            'request_hits': self.request_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.request_hits + self.shared_hits) / lookups, 4) if lookups else None,
+        }
+
+
+_resolver = None
+
+
+def get_permission_resolver():
+    """获取全局权限解析器（首次使用时构建）"""
+    global _resolver
+    if _resolver is None:
+        _resolver = PermissionResolver.from_settings()
+    return _resolver
+
+
+def permission_cache_probe():
+    """健康检查中导出权限缓存的命中统计"""
+    return get_permission_resolver().stats()
+
+
+@receiver(setting_changed)
+def _reset_permission_resolver(setting, **kwargs):
+    """权限缓存配置变更时（如测试中的override_settings）重建"""
+    global _resolver
+    if setting.startswith('PERMISSION_CACHE_'):
+        _resolver = None
@@ -3,6 +3,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 
 from .models import User, Role
+from .role_sync import RoleSyncer
 
 
 def get_permission_by_codename(codename):
@@ -15,8 +16,11 @@ def get_permission_by_codename(codename):
 
 def assign_role_permissions(user, role_name=None):
     """
-    根据用户角色分配相应权限
+    根据用户角色关联相应的角色对象
     如果指定了role_name，则使用该角色名称；否则使用用户当前角色
+    
+    用户的权限由角色提供（见users.backends.RolePermissionBackend），
+    这里只关联role_obj，不再把角色的权限写入用户的user_permissions
     """
     if not role_name:
         role_name = user.role
@@ -24,73 +28,18 @@ def assign_role_permissions(user, role_name=None):
     # 尝试获取对应的Role对象
     try:
         role = Role.objects.get(name=role_name)
-        # 设置用户的role_obj
-        if user.role_obj != role:
-            user.role_obj = role
-            user.save(syncing_roles=True)  # 使用syncing_roles=True避免循环引用
     except Role.DoesNotExist:
         # 如果找不到对应的Role对象，尝试创建
-        if role_name in dict(User.ROLE_CHOICES).keys():
-            role = create_default_role(role_name)
-            if user.role_obj != role:
-                user.role_obj = role
-                user.save(syncing_roles=True)  # 使用syncing_roles=True避免循环引用
-        
-    if role_name == 'admin':
-        # 管理员拥有所有权限
-        return assign_admin_permissions(user)
-    elif role_name == 'teacher':
-        # 教师拥有特定权限
-        return assign_teacher_permissions(user)
-    elif role_name == 'student':
-        # 学生拥有最少的权限
-        return assign_student_permissions(user)
-    
-    return False
-
-
-def assign_admin_permissions(user):
-    """为管理员用户分配所有权限"""
-    # 获取所有权限
-    permissions = Permission.objects.all()
-    # 分配所有权限
-    user.user_permissions.set(permissions)
-    
-    # 同步到role_obj（如果存在）
-    if user.role_obj:
-        user.role_obj.permissions.set(permissions)
+        if role_name not in dict(User.ROLE_CHOICES).keys():
+            return False
+        role = create_default_role(role_name)
     
-    return True
-
-
-def assign_teacher_permissions(user):
-    """为教师用户分配教学相关权限"""
-    # 获取教师所需的特定权限
-    permissions = Permission.objects.filter(
-        Q(codename='view_student_data') | 
-        Q(codename='manage_courses') | 
-        Q(codename='generate_teaching_content')
-    )
-    # 分配这些权限
-    user.user_permissions.set(permissions)
-    
-    # 同步到role_obj（如果存在）
-    if user.role_obj:
-        user.role_obj.permissions.set(permissions)
-    
-    return True
-
-
-def assign_student_permissions(user):
-    """为学生用户分配基本权限"""
-    # 学生通常只需要非常基本的权限
-    user.user_permissions.clear()
-    
-    # 同步到role_obj（如果存在）
-    if user.role_obj:
-        user.role_obj.permissions.clear()
+    # 设置用户的role_obj
+    if user.role_obj_id != role.pk:
+        user.role_obj = role
+        user.save(syncing_roles=True, update_fields=['role_obj'])  # 使用syncing_roles=True避免循环引用
     
-    return True
+    return role_name in dict(User.ROLE_CHOICES).keys()
 
 
 def get_user_role_permissions(user):
@@ -160,11 +109,8 @@ def create_default_role(role_name):
     return role
 
 
-def sync_role_permissions(modeladmin, request, queryset=None):
-    """
-    同步所有角色和权限的admin操作函数
-    """
-    # 创建默认角色
+def sync_default_roles():
+    """创建或更新默认角色及其权限，返回 {角色名: 角色}"""
     admin_role = create_default_role('admin')
     admin_role.permissions.set(Permission.objects.all())
     
@@ -179,58 +125,33 @@ def sync_role_permissions(modeladmin, request, queryset=None):
     student_role = create_default_role('student')
     student_role.permissions.clear()
     
-    # 同步用户角色
-    roles = {role.name: role for role in Role.objects.all()}
-    users_updated = 0
+    return {
+        'admin': admin_role,
+        'teacher': teacher_role,
+        'student': student_role
+    }
+
+
+def sync_role_permissions(modeladmin, request, queryset=None):
+    """
+    同步所有角色和权限的admin操作函数
+    """
+    # 创建默认角色
+    roles = sync_default_roles()
     
-    for user in User.objects.all():
-        updated = False
-        
-        # 如果用户有role但没有role_obj
-        if user.role and not user.role_obj and user.role in roles:
-            user.role_obj = roles[user.role]
-            updated = True
-            
-        # 如果用户有role_obj但role不匹配
-        elif user.role_obj and user.role != user.role_obj.name:
-            user.role = user.role_obj.name
-            updated = True
-            
-        # 如果需要更新，直接保存
-        if updated:
-            user.save(syncing_roles=True)
-            users_updated += 1
+    # 同步用户角色（分批bulk_update，不逐个保存用户）
+    users_updated = RoleSyncer('sync_role_permissions').run()['updated']
     
     if request:
         from django.contrib import messages
         messages.success(request, f'已同步角色权限，更新了 {users_updated} 个用户的角色。')
         
-    return {
-        'admin': admin_role,
-        'teacher': teacher_role,
-        'student': student_role
-    }
+    return roles
 
 
 def sync_users_role_objects():
-    """同步所有用户的role和role_obj"""
-    # 获取所有角色
-    roles = {role.name: role for role in Role.objects.all()}
-    
-    # 获取所有用户
-    users = User.objects.all()
-    
-    for user in users:
-        # 如果用户有role但没有role_obj
-        if user.role and not user.role_obj:
-            # 尝试找到对应的Role对象
-            if user.role in roles:
-                user.role_obj = roles[user.role]
-                user.save(syncing_roles=True)  # 使用syncing_roles=True避免循环引用
-        # 如果用户有role_obj但role不匹配
-        elif user.role_obj and user.role != user.role_obj.name:
-            user.role = user.role_obj.name
-            user.save(syncing_roles=True)  # 使用syncing_roles=True避免循环引用
+    """同步所有用户的role和role_obj（分批bulk_update，不逐个保存用户），返回统计信息"""
+    return RoleSyncer('sync_users_role_objects').run()
 
 
 def update_user_permissions_on_role_change(user, old_role=None, new_role=None):
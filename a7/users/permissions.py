@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .tokens import get_request_role, request_has_perm
+
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -29,6 +31,7 @@ class IsUserOwnerOrStaff(permissions.BasePermission):
         return obj == request.user
 
 # 新增的基于角色的权限类
+# 角色和权限优先从访问令牌的授权声明中读取（见users.tokens），声明无效时回退到用户对象
 
 class IsAdmin(permissions.BasePermission):
     """
@@ -37,7 +40,7 @@ class IsAdmin(permissions.BasePermission):
     message = '只有管理员才能执行此操作。'
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role == 'admin'
+        return request.user.is_authenticated and get_request_role(request) == 'admin'
 
 
 class IsTeacher(permissions.BasePermission):
@@ -47,7 +50,7 @@ class IsTeacher(permissions.BasePermission):
     message = '只有教师才能执行此操作。'
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role == 'teacher'
+        return request.user.is_authenticated and get_request_role(request) == 'teacher'
 
 
 class IsStudent(permissions.BasePermission):
@@ -57,7 +60,7 @@ class IsStudent(permissions.BasePermission):
     message = '只有学生才能执行此操作。'
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role == 'student'
+        return request.user.is_authenticated and get_request_role(request) == 'student'
 
 
 class IsAdminOrTeacher(permissions.BasePermission):
@@ -69,7 +72,7 @@ class IsAdminOrTeacher(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        return request.user.role in ['admin', 'teacher']
+        return get_request_role(request) in ['admin', 'teacher']
 
 
 class HasViewStudentDataPermission(permissions.BasePermission):
@@ -79,7 +82,7 @@ class HasViewStudentDataPermission(permissions.BasePermission):
     message = '没有查看学生数据的权限。'
 
     def has_permission(self, request, view):
-        return request.user.has_perm('users.view_student_data')
+        return request_has_perm(request, 'users.view_student_data')
 
 
 class HasManageCoursesPermission(permissions.BasePermission):
@@ -89,7 +92,7 @@ class HasManageCoursesPermission(permissions.BasePermission):
     message = '没有管理课程的权限。'
 
     def has_permission(self, request, view):
-        return request.user.has_perm('users.manage_courses')
+        return request_has_perm(request, 'users.manage_courses')
 
 
 class HasGenerateTeachingContentPermission(permissions.BasePermission):
@@ -99,7 +102,7 @@ class HasGenerateTeachingContentPermission(permissions.BasePermission):
     message = '没有生成教学内容的权限。'
 
     def has_permission(self, request, view):
-        return request.user.has_perm('users.generate_teaching_content')
+        return request_has_perm(request, 'users.generate_teaching_content')
 
 
 class IsTeacherWithCourseManagement(permissions.BasePermission):
@@ -110,8 +113,8 @@ class IsTeacherWithCourseManagement(permissions.BasePermission):
 
     def has_permission(self, request, view):
         return (request.user.is_authenticated and 
-                request.user.role == 'teacher' and 
-                request.user.has_perm('users.manage_courses'))
+                get_request_role(request) == 'teacher' and 
+                request_has_perm(request, 'users.manage_courses'))
 
 
 class IsAdminOrTeacherReadOnly(permissions.BasePermission):
@@ -124,12 +127,14 @@ class IsAdminOrTeacherReadOnly(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
             
+        role = get_request_role(request)
+        
         # 管理员可以执行任何操作
-        if request.user.role == 'admin':
+        if role == 'admin':
             return True
             
         # 教师只能执行读操作
-        if request.user.role == 'teacher':
+        if role == 'teacher':
             return request.method in permissions.SAFE_METHODS
             
         return False 
\ No newline at end of file
@@ -0,0 +1,207 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import receiver
+
+from apps.core.background import PeriodicWorker
+
+from .models import Role
+from .tokens import bump_user_permissions
+
+logger = logging.getLogger('django')
+
+# 保存同步进度的缓存键前缀
+PROGRESS_KEY_PREFIX = 'role-propagation'
+# 同步进度在缓存中的保存时间（秒）
+PROGRESS_TIMEOUT = 24 * 3600
+
+
+class RolePropagator:
+    """
+    角色变更的批量传播
+
+    角色保存后，把使用该角色名称或角色对象的用户的role/role_obj同步为该角色：
+    - 按主键分批，每批一条UPDATE同时写入role和role_obj，不逐个保存用户，也不触发用户的保存信号
+    - 每批更新后批量清除用户缓存中的快照，并更新这些用户的权限版本（令牌声明和权限缓存随之失效）
+    用户的权限由角色解析（见users.backends），不需要为用户写入权限记录。
+    待同步的用户数超过background_threshold时记录为等待中，由后台任务（PeriodicWorker）执行，
+    进度（含已处理到的主键last_pk）保存在共享缓存中（见get_progress），中断后可以从last_pk继续。
+    """
+
+    def __init__(self, batch_size=1000, background_threshold=1000, cache_alias='shared', stale_after=300):
+        self.batch_size = batch_size
+        self.background_threshold = background_threshold
+        self.cache_alias = cache_alias
+        # running记录超过该时间（秒）没有更新时视为执行同步的进程已退出
+        self.stale_after = stale_after
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建传播器"""
+        return cls(
+            batch_size=getattr(settings, 'ROLE_PROPAGATION_BATCH_SIZE', 1000),
+            background_threshold=getattr(settings, 'ROLE_PROPAGATION_BACKGROUND_THRESHOLD', 1000),
+            cache_alias=getattr(settings, 'ROLE_PROPAGATION_CACHE', 'shared'),
+            stale_after=getattr(settings, 'ROLE_PROPAGATION_STALE_AFTER', 300),
+        )
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def pending_users(self, role):
+        """role和role_obj与角色不一致的用户"""
+        User = get_user_model()
+        return User.objects.filter(
+            (Q(role=role.name) & ~Q(role_obj=role)) | (Q(role_obj=role) & ~Q(role=role.name))
+        )
+
+    def schedule(self, role, resume=False):
+        """
+        同步角色的用户，返回是否转入后台执行
+
+        待同步用户较少时在当前事务中直接执行；较多时记录为等待中，事务提交后唤醒后台任务执行，调用方立即返回。
+        resume为True时从上次失败的同步记录的last_pk继续。
+        BACKGROUND_WORKERS_ENABLED为False时（如测试配置中）总是直接执行。
+        """
+        pending = self.pending_users(role).count()
+        if not pending:
+            return False
+        background = (
+            pending > self.background_threshold
+            and getattr(settings, 'BACKGROUND_WORKERS_ENABLED', True)
+        )
+        if not background:
+            self.propagate(role, resume=resume)
+            return False
+
+        progress = self.get_progress(role.pk) if resume else None
+        if not progress or progress['status'] != 'failed':
+            progress = {'updated': 0, 'batches': 0, 'last_pk': 0}
+        progress.update(status='pending', total=progress['updated'] + pending)
+        self._save_progress(role.pk, **progress)
+        transaction.on_commit(start_propagation_worker)
+        return True
+
+    def propagate(self, role, resume=False):
+        """分批同步角色的用户，返回统计；resume为True时从等待中或失败的进度记录的last_pk继续"""
+        progress = self.get_progress(role.pk) if resume else None
+        if not progress or progress['status'] not in ('pending', 'failed'):
+            progress = {}
+        last_pk = progress.get('last_pk', 0)
+        updated = progress.get('updated', 0)
+        started = time.monotonic()
+        stats = {
+            'total': updated + self.pending_users(role).filter(pk__gt=last_pk).count(),
+            'updated': updated,
+            'batches': 0,
+            'last_pk': last_pk,
+        }
+        self._save_progress(role.pk, status='running', **stats)
+
+        User = get_user_model()
+        while True:
+            pks = list(
+                self.pending_users(role)
+                .filter(pk__gt=stats['last_pk'])
+                .order_by('pk')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not pks:
+                break
+            User.objects.filter(pk__in=pks).update(role=role.name, role_obj=role)
+            bump_user_permissions(*pks)
+
+            stats['last_pk'] = pks[-1]
+            stats['updated'] += len(pks)
+            stats['batches'] += 1
+            self._save_progress(role.pk, status='running', **stats)
+
+        stats['elapsed'] = round(time.monotonic() - started, 3)
+        self._save_progress(role.pk, status='done', **stats)
+        return stats
+
+    def run_pending(self):
+        """
+        执行等待中的同步（后台任务的target），返回完成的角色数
+
+        每个角色执行前在共享缓存中加锁，多个进程的后台任务不会同时同步同一角色
+        """
+        done = 0
+        for role in Role.objects.all():
+            progress = self.get_progress(role.pk)
+            if not progress or progress['status'] != 'pending':
+                continue
+            lock_key = f'{PROGRESS_KEY_PREFIX}:{role.pk}:lock'
+            if not self.shared.add(lock_key, os.getpid(), self.stale_after):
+                continue
+            try:
+                stats = self.propagate(role, resume=True)
+                logger.info(
+                    f"角色同步完成: 角色={role.name}, 用户={stats['updated']}个, "
+                    f"批次={stats['batches']}, 耗时={stats['elapsed']}秒"
+                )
+                done += 1
+            except Exception:
+                logger.exception(f"角色同步失败: 角色={role.name}")
+                progress = self.get_progress(role.pk) or progress
+                progress['status'] = 'failed'
+                self._save_progress(role.pk, **progress)
+            finally:
+                self.shared.delete(lock_key)
+        return done
+
+    def get_progress(self, role_pk):
+        """
+        返回角色最近一次同步的进度，没有记录时返回None
+
+        running记录超过stale_after秒没有更新时（执行同步的进程已退出）标记为失败，可以重新同步并从last_pk继续
+        """
+        progress = self.shared.get(f'{PROGRESS_KEY_PREFIX}:{role_pk}')
+        if progress and progress['status'] == 'running' and time.time() - progress['updated_at'] > self.stale_after:
+            progress['status'] = 'failed'
+            self._save_progress(role_pk, **progress)
+        return progress
+
+    def _save_progress(self, role_pk, **progress):
+        progress['updated_at'] = time.time()
+        self.shared.set(f'{PROGRESS_KEY_PREFIX}:{role_pk}', progress, PROGRESS_TIMEOUT)
+
+
+def get_role_propagator():
+    """根据当前settings创建角色传播器"""
+    return RolePropagator.from_settings()
+
+
+_worker = None
+
+
+def start_propagation_worker():
+    """按需启动后台同步任务并唤醒它立即检查等待中的同步，返回任务是否在运行"""
+    global _worker
+    if _worker is None:
+        _worker = PeriodicWorker(
+            'role-propagation',
+            getattr(settings, 'ROLE_PROPAGATION_INTERVAL', 60),
+            lambda: get_role_propagator().run_pending(),
+            final_run=False,
+        )
+    return _worker.trigger()
+
+
+@receiver(request_started, dispatch_uid='users.role_propagation.start_on_first_request')
+def start_propagation_worker_on_first_request(sender, **kwargs):
+    """
+    处理第一个请求时启动后台同步任务，继续执行其他进程退出前留下的等待中的同步
+
+    启动后断开信号，不再占用请求处理路径
+    """
+    request_started.disconnect(dispatch_uid='users.role_propagation.start_on_first_request')
+    start_propagation_worker()
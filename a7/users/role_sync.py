@@ -0,0 +1,265 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.core.shared_cache import is_shared_cache
+
+from .models import Role
+from .tokens import bump_user_permissions
+
+
+class CheckpointMismatch(Exception):
+    """检查点由参数不同的同步留下，不能继续（需要从头开始同步）"""
+
+
+class ParallelSyncUnsupported(Exception):
+    """数据库不支持多个工作进程并行写入（SQLite同一时间只允许一个写事务）"""
+
+
+def check_workers(workers):
+    """检查数据库是否支持workers个工作进程并行同步，不支持时抛出ParallelSyncUnsupported"""
+    if workers > 1 and connections[DEFAULT_DB_ALIAS].vendor == 'sqlite':
+        raise ParallelSyncUnsupported('SQLite同一时间只允许一个写事务，多个工作进程会相互等待直至超时，请使用--workers 1')
+
+
+def role_statistics():
+    """
+    返回各角色的统计信息：名称、描述、权限数、通过role_obj关联的用户数、通过role字段关联的用户数
+
+    一次聚合查询完成
+    """
+    User = get_user_model()
+    string_users = (
+        User.objects
+        .filter(role=OuterRef('name'))
+        .order_by()
+        .values('role')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return list(
+        Role.objects
+        .annotate(
+            permission_count=Count('permissions', distinct=True),
+            direct_user_count=Count('users', distinct=True),
+            string_user_count=Coalesce(Subquery(string_users, output_field=IntegerField()), 0),
+        )
+        .order_by('name')
+        .values('name', 'description', 'permission_count', 'direct_user_count', 'string_user_count')
+    )
+
+
+def sync_chunk(low, high, role_ids, prefer_role_field=False, dry_run=False):
+    """
+    同步主键在(low, high]范围内的用户的role和role_obj，返回(扫描数, 更新数, 变更列表)
+
+    - 只有role没有role_obj的用户：关联同名角色
+    - role与role_obj不一致的用户：默认以role_obj为准更新role；prefer_role_field为True时以role为准更新role_obj
+    更新在一个事务中通过bulk_update完成，不触发用户的保存信号，之后批量清除用户缓存并更新权限版本。
+    dry_run为True时只返回变更列表，不写入数据库。
+    该函数也在工作进程中执行，参数只使用可序列化的值。
+    """
+    User = get_user_model()
+    role_names = {pk: name for name, pk in role_ids.items()}
+    users = list(
+        User.objects
+        .filter(pk__gt=low, pk__lte=high)
+        .order_by('pk')
+        .only('pk', 'username', 'role', 'role_obj_id')
+    )
+
+    changed = []
+    changes = []
+    for user in users:
+        current_name = role_names.get(user.role_obj_id)
+        if user.role_obj_id is None or (prefer_role_field and user.role != current_name):
+            role_id = role_ids.get(user.role)
+            if role_id is None or role_id == user.role_obj_id:
+                continue
+            changes.append((user.pk, user.username, 'role_obj', current_name, user.role))
+            user.role_obj_id = role_id
+        elif current_name is not None and user.role != current_name:
+            changes.append((user.pk, user.username, 'role', user.role, current_name))
+            user.role = current_name
+        else:
+            continue
+        changed.append(user)
+
+    if changed and not dry_run:
+        with transaction.atomic():
+            User.objects.bulk_update(changed, ['role', 'role_obj'])
+        pks = [user.pk for user in changed]
+        bump_user_permissions(*pks)
+    # 变更列表只在dry_run时返回，避免大批量同步时占用内存
+    return len(users), len(changed), changes if dry_run else []
+
+
+def web_worker_notice():
+    """
+    同步命令在单独的进程中运行，返回web worker进程何时看到更新后的角色的说明
+
+    权限版本保存在用户表中，但web worker进程内缓存的用户快照（含角色和权限版本）无法由命令清除：
+    用户缓存使用共享缓存时最迟USER_CACHE_LOCAL_TTL秒后更新，否则需要重启web worker
+    """
+    if not getattr(settings, 'USER_CACHE_ENABLED', True):
+        return None
+    alias = getattr(settings, 'USER_CACHE_ALIAS', 'shared')
+    if is_shared_cache(alias):
+        return f"运行中的web worker进程最迟{getattr(settings, 'USER_CACHE_LOCAL_TTL', 10)}秒后使用更新后的角色"
+    return f"用户缓存'{alias}'不在进程间共享，需要重启web worker进程才能立即使用更新后的角色"
+
+
+def _init_worker():
+    # 以spawn方式启动的工作进程需要重新加载Django配置；fork方式启动时不能复用父进程的数据库连接
+    django.setup()
+    connections.close_all()
+
+
+class RoleSyncer:
+    """
+    分批同步用户的role和role_obj
+
+    按主键键集分页把用户分成每块chunk_size个，每块在单独的事务中用bulk_update更新：
+    - 每完成一块把已连续完成的最大主键写入检查点文件，中断后再次运行时从检查点继续；
+      检查点同时记录prefer_role_field，参数不同时不能继续（抛出CheckpointMismatch）
+    - workers大于1时使用进程池并行处理各块（检查点只推进到连续完成的位置，重新运行时可能重复处理少量用户，结果相同）；
+      SQLite不支持并行写入，workers大于1时抛出ParallelSyncUnsupported
+    - dry_run只计算变更，不写入数据库和检查点
+    """
+
+    def __init__(self, task, chunk_size=1000, checkpoint_file=None, workers=1, prefer_role_field=False,
+                 dry_run=False):
+        self.task = task
+        self.chunk_size = chunk_size
+        self.checkpoint_file = checkpoint_file
+        self.workers = max(int(workers), 1)
+        check_workers(self.workers)
+        self.prefer_role_field = prefer_role_field
+        self.dry_run = dry_run
+
+    def chunks(self, start):
+        """依次返回各块的主键范围(low, high]"""
+        User = get_user_model()
+        low = start
+        while True:
+            pks = list(
+                User.objects
+                .filter(pk__gt=low)
+                .order_by('pk')
+                .values_list('pk', flat=True)[self.chunk_size - 1:self.chunk_size]
+            )
+            if pks:
+                yield low, pks[0]
+                low = pks[0]
+                continue
+            # 最后一块不足chunk_size个用户
+            last = User.objects.filter(pk__gt=low).order_by('-pk').values_list('pk', flat=True).first()
+            if last is not None:
+                yield low, last
+            return
+
+    def run(self, resume=True, progress=None):
+        """
+        同步全部用户，返回统计
+
+        progress(stats)在每块完成后调用
+        """
+        role_ids = dict(Role.objects.values_list('name', 'pk'))
+        start = 0
+        if resume and not self.dry_run:
+            start = self.load_checkpoint() or 0
+        stats = {'scanned': 0, 'updated': 0, 'chunks': 0, 'resumed_from': start, 'changes': []}
+        args = (role_ids, self.prefer_role_field, self.dry_run)
+
+        if self.workers == 1:
+            for low, high in self.chunks(start):
+                self._record(stats, sync_chunk(low, high, *args), progress)
+                self.save_checkpoint(high)
+        else:
+            self._run_parallel(start, args, stats, progress)
+
+        if not self.dry_run:
+            self.clear_checkpoint()
+        return stats
+
+    def _run_parallel(self, start, args, stats, progress):
+        # fork之前关闭连接，避免工作进程共用父进程的连接
+        connections.close_all()
+        pending = {}
+        # 按顺序记录各块的完成情况，检查点只推进到连续完成的位置
+        order = []
+        done = set()
+        chunks = self.chunks(start)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+            exhausted = False
+            while True:
+                # 控制提交的块数，避免一次性生成全部块
+                while not exhausted and len(pending) < self.workers * 2:
+                    try:
+                        low, high = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(sync_chunk, low, high, *args)] = high
+                    order.append(high)
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done.add(pending.pop(future))
+                    self._record(stats, future.result(), progress)
+                watermark = None
+                while order and order[0] in done:
+                    watermark = order.pop(0)
+                    done.discard(watermark)
+                if watermark is not None:
+                    self.save_checkpoint(watermark)
+
+    def _record(self, stats, result, progress):
+        scanned, updated, changes = result
+        stats['scanned'] += scanned
+        stats['updated'] += updated
+        stats['chunks'] += 1
+        stats['changes'].extend(changes)
+        if progress is not None:
+            progress(stats)
+
+    def load_checkpoint(self):
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return None
+        try:
+            with open(self.checkpoint_file, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 只继续同一个命令留下的检查点
+        if checkpoint.get('task') != self.task:
+            return None
+        # 检查点之前的用户按检查点记录的规则同步，规则不同时继续会得到混合的结果
+        if checkpoint.get('prefer_role_field') != self.prefer_role_field:
+            raise CheckpointMismatch(
+                f"检查点的prefer_role_field为{checkpoint.get('prefer_role_field')}，"
+                f"与本次同步的{self.prefer_role_field}不一致"
+            )
+        return checkpoint.get('last_pk')
+
+    def save_checkpoint(self, last_pk):
+        if not self.checkpoint_file or self.dry_run:
+            return
+        # 先写临时文件再替换，避免中断时留下不完整的检查点
+        os.makedirs(os.path.dirname(self.checkpoint_file) or '.', exist_ok=True)
+        temp_file = f'{self.checkpoint_file}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'task': self.task, 'prefer_role_field': self.prefer_role_field, 'last_pk': last_pk}, f)
+        os.replace(temp_file, self.checkpoint_file)
+
+    def clear_checkpoint(self):
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
@@ -1,13 +1,23 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.conf import settings
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer, TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from apps.core.timing import ServerTimingSerializerMixin
 
 from .models import Role
+from .blacklist import is_token_blacklisted
+from .tokens import PermissionRefreshToken
 
 User = get_user_model()
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """角色序列化器"""
     
     class Meta:
@@ -15,7 +25,7 @@ class RoleSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'permissions']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """用户序列化器"""
     
     class Meta:
@@ -24,7 +34,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """用户创建序列化器"""
     
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -45,7 +55,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(ServerTimingSerializerMixin, serializers.ModelSerializer):
     """用户更新序列化器"""
     
     class Meta:
@@ -89,6 +99,35 @@ class PasswordChangeSerializer(serializers.Serializer):
         return attrs
 
 
+class PermissionTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """登录序列化器，签发的访问令牌中包含角色、权限位图和权限版本"""
+    token_class = PermissionRefreshToken
+
+
+class PermissionTokenRefreshSerializer(TokenRefreshSerializer):
+    """令牌刷新序列化器，按用户当前的角色和权限重新生成访问令牌中的声明"""
+    token_class = PermissionRefreshToken
+
+
+class FilteredTokenVerifySerializer(TokenVerifySerializer):
+    """令牌验证序列化器，通过黑名单过滤器检查令牌是否已加入黑名单"""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+
+        if (api_settings.BLACKLIST_AFTER_ROTATION
+                and 'rest_framework_simplejwt.token_blacklist' in settings.INSTALLED_APPS):
+            if is_token_blacklisted(token.get(api_settings.JTI_CLAIM)):
+                raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
+
+
+class FilteredTokenBlacklistSerializer(TokenBlacklistSerializer):
+    """令牌黑名单序列化器，校验刷新令牌时通过黑名单过滤器检查"""
+    token_class = PermissionRefreshToken
+
+
 # 以下序列化器用于Swagger文档
 class TokenObtainPairResponseSerializer(serializers.Serializer):
     """令牌获取响应序列化器（用于文档）"""
@@ -1,14 +1,27 @@
 from django.conf import settings
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from django.contrib.auth import get_user_model
 
 from .models import Role
-from .permission_utils import assign_role_permissions, update_user_permissions_on_role_change, sync_users_role_objects
+from .permission_utils import assign_role_permissions, update_user_permissions_on_role_change
+from .blacklist import get_blacklist_filter
+from .permission_cache import clear_instance_permissions
+from .role_propagation import get_role_propagator
+from .tokens import bump_role_permissions, bump_user_permissions
+from .user_cache import get_user_cache, snapshot_changed
 
 User = get_user_model()
 
+# 与用户角色有关的字段，只更新其他字段的保存不需要处理角色权限
+ROLE_FIELDS = {'role', 'role_obj', 'role_obj_id'}
+# 影响用户有效权限的字段
+PERMISSION_FIELDS = ROLE_FIELDS | {'is_active', 'is_superuser'}
+
 
 @receiver(post_save, sender=User)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
@@ -35,6 +48,9 @@ def create_user_permissions(sender, instance, created, **kwargs):
 def update_user_role_permissions(sender, instance, **kwargs):
     """
     当用户角色变更时，更新其权限
+
+    通过用户对象记录的加载值（User.changed_fields）判断角色是否变化，不再查询数据库；
+    只更新last_login等非角色字段的保存直接跳过
     """
     # 检查是否是使用syncing_roles进行的保存操作，如果是则跳过
     if kwargs.get('raw', False) or kwargs.get('update_fields') == ['role', 'role_obj']:
@@ -43,54 +59,49 @@ def update_user_role_permissions(sender, instance, **kwargs):
     # 如果是新用户，则跳过，因为post_save信号处理函数会处理
     if instance.pk is None:
         return
-        
-    # 获取数据库中现有的用户数据
-    try:
-        old_instance = User.objects.get(pk=instance.pk)
-        
-        # 检查角色变化
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(update_fields) & ROLE_FIELDS:
+        return
+
+    changed = instance.changed_fields
+    if changed is not None:
+        role_changed = 'role' in changed
+        role_obj_changed = 'role_obj' in changed
+        old_role = instance.get_loaded_value('role')
+    else:
+        # 不是从数据库加载的用户对象没有记录加载值，查询数据库中现有的用户数据
+        try:
+            old_instance = User.objects.only('role', 'role_obj').get(pk=instance.pk)
+        except User.DoesNotExist:
+            return  # 这是新用户，将由post_save信号处理
         role_changed = old_instance.role != instance.role
-        role_obj_changed = old_instance.role_obj != instance.role_obj
-        
-        # 如果role或role_obj发生了变化
-        if role_changed or role_obj_changed:
-            # 确定新的角色名称
-            new_role = None
-            if role_changed:
-                new_role = instance.role
-            elif role_obj_changed and instance.role_obj:
-                new_role = instance.role_obj.name
-                
-            # 更新用户权限
-            update_user_permissions_on_role_change(instance, old_instance.role, new_role)
-    except User.DoesNotExist:
-        pass  # 这是新用户，将由post_save信号处理
+        role_obj_changed = old_instance.role_obj_id != instance.role_obj_id
+        old_role = old_instance.role
+
+    # 如果role或role_obj发生了变化
+    if role_changed or role_obj_changed:
+        # 确定新的角色名称
+        new_role = None
+        if role_changed:
+            new_role = instance.role
+        elif role_obj_changed and instance.role_obj:
+            new_role = instance.role_obj.name
+            
+        # 更新用户权限
+        update_user_permissions_on_role_change(instance, old_role, new_role)
 
 
 @receiver(post_save, sender=Role)
 def update_role_users_permissions(sender, instance, created=False, **kwargs):
     """
-    当角色权限更改时，更新所有使用该角色的用户的权限
-    """
-    # 获取所有使用此角色的用户（通过role字段或role_obj关联）
-    users_by_role = User.objects.filter(role=instance.name)
-    users_by_role_obj = User.objects.filter(role_obj=instance)
-    
-    # 合并用户集合
-    users = users_by_role.union(users_by_role_obj)
-    
-    # 为每个用户更新权限
-    for user in users:
-        # 同步role和role_obj
-        if user.role != instance.name or user.role_obj != instance:
-            if user.role != instance.name:
-                user.role = instance.name
-            if user.role_obj != instance:
-                user.role_obj = instance
-            user.save(syncing_roles=True, update_fields=['role', 'role_obj'])
-        
-        # 分配权限
-        assign_role_permissions(user)
+    角色保存后，批量同步所有使用该角色的用户（通过role字段或role_obj关联）的role和role_obj
+
+    待同步的用户较多时在后台执行（见users.role_propagation）
+    """
+    if kwargs.get('raw', False):
+        return
+    get_role_propagator().schedule(instance)
         
         
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -105,6 +116,11 @@ def sync_user_role_objects(sender, instance=None, created=False, **kwargs):
     # 跳过信号递归和创建步骤的处理(创建由其他信号处理)
     if kwargs.get('update_fields') == ['role', 'role_obj']:
         return
+
+    # 只更新last_login等非角色字段的保存不需要同步
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(update_fields) & ROLE_FIELDS:
+        return
         
     # 尝试同步role和role_obj
     if instance.role and not instance.role_obj:
@@ -118,4 +134,140 @@ def sync_user_role_objects(sender, instance=None, created=False, **kwargs):
     elif instance.role_obj and instance.role != instance.role_obj.name:
         # 用户有role_obj但role不匹配，更新role
         instance.role = instance.role_obj.name
-        instance.save(syncing_roles=True, update_fields=['role']) 
\ No newline at end of file
+        instance.save(syncing_roles=True, update_fields=['role']) 
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    用户保存或删除时清除用户缓存中的快照（只更新last_login等快照之外字段的保存不清除）
+    """
+    if snapshot_changed(kwargs.get('update_fields')):
+        get_user_cache().invalidate(instance.pk)
+
+
+@receiver(pre_delete, sender=Role)
+def invalidate_role_users_cache(sender, instance, **kwargs):
+    """
+    删除角色时数据库会将用户的role_obj置空（不触发用户的保存信号），需要清除这些用户的快照
+    """
+    cache = get_user_cache()
+    for pk in User.objects.filter(role_obj=instance).values_list('pk', flat=True):
+        cache.invalidate(pk)
+
+
+@receiver(post_save, sender=User)
+def bump_user_permissions_version(sender, instance, created=False, **kwargs):
+    """
+    用户角色、is_superuser等字段变化时递增用户权限版本，使已签发令牌中的授权声明和缓存的权限集失效
+
+    新建用户的初始版本取创建时间（见User.permissions_version），不需要递增；
+    从数据库加载的用户只在PERMISSION_FIELDS发生变化时递增
+    """
+    if kwargs.get('raw', False) or created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(update_fields) & PERMISSION_FIELDS:
+        return
+    changed = instance.changed_fields
+    if changed is not None and not changed & PERMISSION_FIELDS:
+        return
+    bump_user_permissions(instance.pk)
+    # 同步本对象上的版本，之后用同一个对象签发的令牌携带新版本
+    instance.permissions_version += 1
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def bump_role_permissions_version(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    角色权限变化时递增该角色用户的权限版本
+
+    没有实际增删权限行时（重复添加、清空本来为空的权限）不递增，避免所有用户的令牌声明和权限集缓存失效
+    """
+    if action == 'pre_clear':
+        # post_clear时行已删除，需要提前记录清空前的角色
+        if not reverse:
+            instance._cleared_role_names = [instance.name] if instance.permissions.exists() else []
+        else:
+            instance._cleared_role_names = list(instance.roles.values_list('name', flat=True))
+        return
+    if action == 'post_clear':
+        bump_role_permissions(*getattr(instance, '_cleared_role_names', ()))
+        instance._cleared_role_names = []
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if not reverse:
+        bump_role_permissions(instance.name)
+    else:
+        # 从权限一侧修改（permission.roles.add等）
+        bump_role_permissions(*Role.objects.filter(pk__in=pk_set).values_list('name', flat=True))
+
+
+@receiver(pre_delete, sender=Role)
+def bump_deleted_role_version(sender, instance, **kwargs):
+    """
+    删除角色时用户的role_obj被置空，角色权限不再生效，需要递增这些用户的权限版本
+    （在删除前执行，与置空在同一个事务中提交）
+    """
+    bump_user_permissions(*User.objects.filter(role_obj=instance).values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def bump_user_grants_version(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    用户直接权限或所属组变化时递增用户权限版本（从用户一侧修改时同步本对象上的版本）
+    """
+    if action == 'pre_clear' and reverse:
+        # 从权限或组一侧清空时post_clear不提供用户，需要提前记录
+        instance._cleared_user_pks = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        clear_instance_permissions(instance)
+        bump_user_permissions(instance.pk)
+        instance.permissions_version += 1
+    elif action == 'post_clear':
+        bump_user_permissions(*getattr(instance, '_cleared_user_pks', []))
+    else:
+        bump_user_permissions(*pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def bump_group_users_version(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    组权限变化时更新组内用户的权限版本
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        users = User.objects.filter(groups=instance)
+    else:
+        groups = Group.objects.all() if pk_set is None else Group.objects.filter(pk__in=pk_set)
+        users = User.objects.filter(groups__in=groups)
+    bump_user_permissions(*users.values_list('pk', flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+def bump_deleted_group_users_version(sender, instance, **kwargs):
+    """
+    删除组时数据库直接删除组与用户的关联（不触发m2m_changed），需要更新组内用户的权限版本
+    """
+    bump_user_permissions(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def update_blacklist_filter(sender, instance, created=False, **kwargs):
+    """
+    令牌加入黑名单时（登出、加入黑名单接口、刷新令牌轮换）更新黑名单过滤器
+
+    本进程立即生效；事务提交后通知其他进程增量同步
+    """
+    if not created or kwargs.get('raw', False):
+        return
+    blacklist_filter = get_blacklist_filter()
+    blacklist_filter.add(instance.token.jti)
+    transaction.on_commit(blacklist_filter.notify)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.authentication import CachedJWTAuthentication
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """复用中间件认证结果的JWT认证测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other = User.objects.create_user(username='other', password='testpassword')
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.factory = RequestFactory()
+
+    def _user_lookups(self, queries):
+        table = User._meta.db_table
+        return [q['sql'] for q in queries if f'FROM "{table}"' in q['sql']]
+
+    def test_single_user_lookup_per_request(self):
+        """测试经过中间件和DRF的认证请求只解析一次用户"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/courses/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._user_lookups(ctx.captured_queries)), 1)
+
+    def test_cached_user_skips_lookup(self):
+        """测试用户缓存命中时不查询用户表，访问快照之外的字段时只加载一次"""
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.access_token}'}
+        self.client.get('/api/courses/', **headers)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/courses/', **headers)
+        self.assertEqual(self._user_lookups(ctx.captured_queries), [])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/users/me/', **headers)
+        self.assertEqual(response.json()['data']['username'], 'testuser')
+        self.assertEqual(len(self._user_lookups(ctx.captured_queries)), 1)
+
+    def test_reuses_middleware_result(self):
+        """测试令牌一致时直接返回中间件的认证结果"""
+        request = self.factory.get('/api/users/me/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        authenticated = CachedJWTAuthentication().authenticate(Request(request))
+        request.jwt_auth = authenticated
+
+        with self.assertNumQueries(0):
+            self.assertIs(CachedJWTAuthentication().authenticate(Request(request)), authenticated)
+
+    def test_mismatched_token_authenticates_again(self):
+        """测试请求头中的令牌与中间件结果不一致时重新认证"""
+        other_token = str(RefreshToken.for_user(self.other).access_token)
+        request = self.factory.get('/api/users/me/', HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        request.jwt_auth = CachedJWTAuthentication().authenticate(
+            Request(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}'))
+        )
+
+        user, _ = CachedJWTAuthentication().authenticate(Request(request))
+        self.assertEqual(user, self.other)
+
+    def test_without_middleware_result(self):
+        """测试没有中间件结果时按原方式认证"""
+        request = self.factory.get('/api/users/me/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        user, token = CachedJWTAuthentication().authenticate(Request(request))
+        self.assertEqual(user, self.user)
+        self.assertEqual(str(token['user_id']), str(self.user.pk))
@@ -0,0 +1,167 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.core.tests.utils import DatabaseSharedCacheMixin
+from users.blacklist import BlacklistFilter, BloomFilter, get_blacklist_filter
+from users.tokens import PermissionRefreshToken
+
+User = get_user_model()
+
+
+class BloomFilterTest(SimpleTestCase):
+    """布隆过滤器测试"""
+
+    def test_no_false_negatives(self):
+        """测试加入的元素一定命中，误判率接近设定值"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        items = [uuid.uuid4().hex for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class BlacklistFilterTest(TestCase):
+    """令牌黑名单过滤器测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.blacklist_filter = BlacklistFilter()
+
+    def _blacklist(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+
+    def test_negative_skips_database(self):
+        """测试未加入黑名单的令牌不查询黑名单表"""
+        self.blacklist_filter.rebuild()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.blacklist_filter.is_blacklisted(uuid.uuid4().hex))
+        self.assertEqual(self.blacklist_filter.stats()['negatives'], 1)
+
+    def test_rebuild_loads_unexpired_tokens(self):
+        """测试全量重建加载未过期的黑名单令牌，布隆过滤器命中时查询数据库确认"""
+        token = PermissionRefreshToken.for_user(self.user)
+        token.blacklist()
+        expired = PermissionRefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+
+        self.blacklist_filter.rebuild()
+        self.assertEqual(self.blacklist_filter.stats()['bloom_entries'], 1)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.blacklist_filter.is_blacklisted(token['jti']))
+
+    def test_false_positive_falls_back_to_database(self):
+        """测试布隆过滤器误判时以数据库结果为准"""
+        self.blacklist_filter.rebuild()
+        jti = uuid.uuid4().hex
+        self.blacklist_filter._bloom.add(jti)
+
+        self.assertFalse(self.blacklist_filter.is_blacklisted(jti))
+        self.assertEqual(self.blacklist_filter.stats()['false_positives'], 1)
+
+    def test_other_process_syncs_new_entries(self):
+        """测试其他进程写入黑名单后，通过共享缓存中的代数发现变化并增量加载"""
+        self.blacklist_filter.rebuild()
+        token = PermissionRefreshToken.for_user(self.user)
+        # 模拟其他进程写入：本过滤器没有收到信号
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))
+        ])
+        get_blacklist_filter().notify()
+
+        self.assertTrue(self.blacklist_filter.is_blacklisted(token['jti']))
+        self.assertEqual(self.blacklist_filter.stats()['syncs'], 1)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.blacklist_filter.is_blacklisted(token['jti']))
+
+    def test_first_lookup_builds_in_background(self):
+        """测试首次查询唤醒后台任务构建过滤器，构建完成前直接查询数据库"""
+        with mock.patch.object(self.blacklist_filter.worker, 'trigger', return_value=True) as trigger:
+            with self.assertNumQueries(1):
+                self.assertFalse(self.blacklist_filter.is_blacklisted(uuid.uuid4().hex))
+            self.blacklist_filter.is_blacklisted(uuid.uuid4().hex)
+        trigger.assert_called_once()
+        self.assertEqual(self.blacklist_filter.stats()['rebuilds'], 0)
+
+    def test_process_local_generation_verifies_negatives(self):
+        """测试保存代数的缓存只在进程内有效时，否定结果也查询数据库确认"""
+        with override_settings(TOKEN_BLACKLIST_FILTER_CACHE='default'):
+            blacklist_filter = BlacklistFilter.from_settings()
+        self.assertTrue(blacklist_filter.verify_negatives)
+        blacklist_filter.rebuild()
+
+        # 模拟其他进程写入：没有收到信号，进程内缓存中的代数也不会变化
+        token = PermissionRefreshToken.for_user(self.user)
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))
+        ])
+        self.assertTrue(blacklist_filter.is_blacklisted(token['jti']))
+        self.assertEqual(blacklist_filter.stats()['false_positives'], 0)
+
+    def test_logout_then_refresh_rejected(self):
+        """测试登出后刷新令牌被拒绝，且不需要查询黑名单表"""
+        refresh = PermissionRefreshToken.for_user(self.user)
+        access = str(refresh.access_token)
+        get_blacklist_filter().rebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/logout/', {'refresh': str(refresh)},
+                                        HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+
+        recent_hits = get_blacklist_filter().stats()['recent_hits']
+        response = self.client.post('/api/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(get_blacklist_filter().stats()['recent_hits'], recent_hits + 1)
+
+        response = self.client.post('/api/token/verify/', {'token': str(refresh)})
+        self.assertEqual(response.status_code, 400)
+
+
+class BlacklistFilterDatabaseCacheTest(DatabaseSharedCacheMixin, TestCase):
+    """共享缓存为数据库缓存时的黑名单过滤器测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.blacklist_filter = BlacklistFilter(check_interval=0.5)
+        self.blacklist_filter.rebuild()
+
+    def test_negative_path_query_budget(self):
+        """测试否定结果在检查间隔内不读取缓存表，每个间隔最多读取一次代数"""
+        with mock.patch('users.blacklist.time.monotonic', return_value=100):
+            with self.assertNumQueries(1), self.assertSharedCacheQueries(1):
+                for _ in range(20):
+                    self.assertFalse(self.blacklist_filter.is_blacklisted(uuid.uuid4().hex))
+        self.assertEqual(self.blacklist_filter.stats()['negatives'], 20)
+
+    def test_other_process_entries_after_interval(self):
+        """测试其他进程写入的黑名单在检查间隔后生效"""
+        self.blacklist_filter.maybe_sync(now=100)
+        token = PermissionRefreshToken.for_user(self.user)
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=token['jti']))
+        ])
+        BlacklistFilter().notify()
+
+        with mock.patch('users.blacklist.time.monotonic', return_value=100.2):
+            self.assertFalse(self.blacklist_filter.is_blacklisted(token['jti']))
+        self.assertEqual(self.blacklist_filter.stats()['syncs'], 0)
+
+        with mock.patch('users.blacklist.time.monotonic', return_value=101):
+            self.assertTrue(self.blacklist_filter.is_blacklisted(token['jti']))
+            with self.assertNumQueries(0):
+                self.assertTrue(self.blacklist_filter.is_blacklisted(token['jti']))
+        self.assertEqual(self.blacklist_filter.stats()['syncs'], 1)
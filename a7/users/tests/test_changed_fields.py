@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.permission_utils import create_default_role
+
+User = get_user_model()
+
+
+class ChangedFieldsTest(TestCase):
+    """用户字段变化跟踪测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher_role = create_default_role('teacher')
+        self.student_role = create_default_role('student')
+        self.user = User.objects.create_user(username='student', password='password', role='student')
+
+    def _user_selects(self, context):
+        table = User._meta.db_table
+        return [
+            q['sql'] for q in context.captured_queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']
+        ]
+
+    def test_changed_fields(self):
+        """测试记录加载值并在保存后重置"""
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.changed_fields, set())
+
+        user.role_obj = self.teacher_role
+        user.first_name = 'Li'
+        self.assertEqual(user.changed_fields, {'role_obj', 'first_name'})
+        self.assertEqual(user.get_loaded_value('role'), 'student')
+
+        user.save()
+        self.assertEqual(user.changed_fields, set())
+        self.assertEqual(user.get_loaded_value('role_obj'), self.teacher_role.pk)
+
+    def test_deferred_fields_tracked_after_load(self):
+        """测试延迟字段只在加载后参与比较"""
+        user = User.objects.only('id', 'role').get(pk=self.user.pk)
+        self.assertEqual(user.changed_fields, set())
+        self.assertEqual(user.email, '')
+        self.assertEqual(user.changed_fields, set())
+
+    def test_last_login_update_skips_role_work(self):
+        """测试只更新last_login时不查询用户和角色"""
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        with CaptureQueriesContext(connection) as context:
+            user.save(update_fields=['last_login'])
+        self.assertEqual(len(context.captured_queries), 1, context.captured_queries)
+
+    def test_save_without_select(self):
+        """测试保存从数据库加载的用户时不再查询旧值"""
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Li'
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        self.assertEqual(self._user_selects(context), [])
+
+    def test_role_change_detected(self):
+        """测试角色变化时仍然关联新的角色对象"""
+        user = User.objects.get(pk=self.user.pk)
+        user.role_obj = self.teacher_role
+        user.save()
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.role, 'teacher')
+        self.assertEqual(user.role_obj, self.teacher_role)
+
+    def test_unloaded_instance_falls_back_to_query(self):
+        """测试不是从数据库加载的用户对象查询旧值判断变化"""
+        values = User.objects.filter(pk=self.user.pk).values().get()
+        values.update(role='teacher', role_obj_id=None)
+        user = User(**values)
+        self.assertIsNone(user.changed_fields)
+        user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).role_obj, self.teacher_role)
@@ -136,4 +136,37 @@ class JWTAuthMiddlewareTest(TestCase):
             self.assertEqual(response.status_code, 401)
             response_data = json.loads(response.content)
             self.assertTrue(response_data['error'])
-            self.assertIn('令牌已过期', response_data['message']) 
\ No newline at end of file
+            self.assertIn('令牌已过期', response_data['message'])
+    
+    @patch('users.middleware.jwt_auth_middleware.logger')
+    async def test_async_valid_token_authenticates_user(self, mock_logger):
+        """测试异步模式下有效令牌能正确认证用户"""
+        async def get_response(request):
+            return JsonResponse({'message': 'success'})
+        
+        middleware = JWTAuthMiddleware(get_response)
+        request = self.factory.get('/api/users/')
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {self.access_token}'
+        
+        response = await middleware(request)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(str(request.token_payload['user_id']), str(self.user.id))
+        mock_logger.info.assert_called_once()
+    
+    @patch('users.middleware.jwt_auth_middleware.logger')
+    async def test_async_invalid_token_returns_error(self, mock_logger):
+        """测试异步模式下无效令牌返回错误响应"""
+        get_response = MagicMock()
+        
+        async def async_get_response(request):
+            return get_response(request)
+        
+        middleware = JWTAuthMiddleware(async_get_response)
+        request = self.factory.get('/api/users/')
+        request.META['HTTP_AUTHORIZATION'] = 'Bearer invalidtoken'
+        
+        response = await middleware(request)
+        
+        self.assertEqual(response.status_code, 401)
+        get_response.assert_not_called()
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from users.models import Role
+from users.permission_cache import clear_instance_permissions, get_permission_resolver
+
+User = get_user_model()
+
+
+class PermissionResolverTest(TestCase):
+    """用户有效权限缓存测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='assistant', description='助教')
+        self.user = User.objects.create_user(username='testuser', password='testpassword', role_obj=self.role)
+        self.view_course = Permission.objects.get(codename='view_course')
+        self.add_group = Permission.objects.get(codename='add_group')
+        self.add_user = Permission.objects.get(codename='add_user')
+
+    def _fresh_user(self):
+        """模拟新请求中的用户对象"""
+        return User.objects.get(pk=self.user.pk)
+
+    def test_combines_user_group_and_role_permissions(self):
+        """测试一次查询合并直接权限、组权限和角色权限"""
+        self.role.permissions.add(self.view_course)
+        self.user.user_permissions.add(self.add_user)
+        group = Group.objects.create(name='editors')
+        group.permissions.add(self.add_group)
+        self.user.groups.add(group)
+
+        user = self._fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('courses.view_course'))
+            self.assertTrue(user.has_perm('add_user'))
+            self.assertTrue(user.has_perm('auth.add_group'))
+            self.assertFalse(user.has_perm('delete_course'))
+            self.assertTrue(user.has_module_perms('courses'))
+            self.assertFalse(user.has_module_perms('sessions'))
+
+    def test_has_perm_delegates_to_backends(self):
+        """测试User.has_perm通过AUTHENTICATION_BACKENDS检查角色权限"""
+        self.role.permissions.add(self.view_course)
+        self.assertTrue(self._fresh_user().has_perm('courses.view_course'))
+
+        # ModelBackend不知道角色权限
+        with override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+            user = self._fresh_user()
+            self.assertFalse(user.has_perm('courses.view_course'))
+            self.assertFalse(user.has_module_perms('courses'))
+
+    def test_warm_cache_skips_database(self):
+        """测试跨请求复用缓存的权限集"""
+        self.role.permissions.add(self.view_course)
+        self._fresh_user().has_perm('view_course')
+
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('view_course'))
+            self.assertFalse(user.has_perm('add_group'))
+        self.assertGreaterEqual(get_permission_resolver().stats()['shared_hits'], 1)
+
+    def test_role_permission_change_invalidates(self):
+        """测试角色权限变化后缓存的权限集失效"""
+        self.assertFalse(self._fresh_user().has_perm('view_course'))
+        self.role.permissions.add(self.view_course)
+        self.assertTrue(self._fresh_user().has_perm('view_course'))
+        self.role.permissions.remove(self.view_course)
+        self.assertFalse(self._fresh_user().has_perm('view_course'))
+
+    def test_group_permission_change_invalidates(self):
+        """测试组权限和组成员变化后缓存的权限集失效"""
+        group = Group.objects.create(name='editors')
+        self.user.groups.add(group)
+        self.assertFalse(self._fresh_user().has_perm('add_group'))
+
+        group.permissions.add(self.add_group)
+        self.assertTrue(self._fresh_user().has_perm('add_group'))
+
+        group.user_set.remove(self.user)
+        self.assertFalse(self._fresh_user().has_perm('add_group'))
+
+    def test_same_instance_sees_own_permission_change(self):
+        """测试修改用户自身的直接权限后同一个对象立即生效"""
+        self.assertFalse(self.user.has_perm('add_user'))
+        self.user.user_permissions.add(self.add_user)
+        self.assertTrue(self.user.has_perm('add_user'))
+
+    def test_role_change_invalidates(self):
+        """测试用户更换角色后缓存的权限集失效"""
+        other_role = Role.objects.create(name='reviewer', description='审核员')
+        other_role.permissions.add(self.add_group)
+        self.assertFalse(self._fresh_user().has_perm('add_group'))
+
+        user = self._fresh_user()
+        user.role_obj = other_role
+        user.save()
+        self.assertTrue(self._fresh_user().has_perm('add_group'))
+
+    def test_clear_instance_permissions(self):
+        """测试清除对象上的权限集后重新从缓存读取"""
+        user = self._fresh_user()
+        user.has_perm('view_course')
+        clear_instance_permissions(user)
+        with self.assertNumQueries(0):
+            user.has_perm('view_course')
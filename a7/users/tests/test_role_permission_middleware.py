@@ -0,0 +1,46 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+from django.contrib.auth import get_user_model
+
+from users.middleware import RoleBasedPermissionMiddleware
+
+User = get_user_model()
+
+
+class RoleBasedPermissionMiddlewareTest(TestCase):
+    """基于角色的权限中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='student', password='password', role='student')
+
+    def test_exempt_path_skipped(self):
+        """测试豁免路径和未登录用户直接放行"""
+        get_response = MagicMock(return_value=JsonResponse({}, status=403))
+        middleware = RoleBasedPermissionMiddleware(get_response)
+
+        request = self.factory.get('/admin/')
+        request.user = self.user
+        self.assertEqual(middleware(request).status_code, 403)
+
+        request = self.factory.get('/api/courses/')
+        request.user = AnonymousUser()
+        response = middleware(request)
+        self.assertIs(response, get_response.return_value)
+
+    @patch('users.middleware.role_permission_middleware.logger')
+    def test_permission_denied_response(self, mock_logger):
+        """测试API请求被拒绝时记录日志并返回自定义响应"""
+        middleware = RoleBasedPermissionMiddleware(lambda request: JsonResponse({}, status=403))
+        request = self.factory.get('/api/courses/')
+        request.user = self.user
+
+        response = middleware(request)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(json.loads(response.content)['user_role'], 'student')
+        mock_logger.warning.assert_called_once()
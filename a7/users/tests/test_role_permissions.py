@@ -0,0 +1,102 @@
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from users.permission_utils import create_default_role
+
+User = get_user_model()
+
+migration = import_module('users.migrations.0005_remove_redundant_user_permissions')
+
+
+class RolePermissionBackendTest(TestCase):
+    """基于角色的权限解析测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin_role = create_default_role('admin')
+        self.teacher_role = create_default_role('teacher')
+        self.student_role = create_default_role('student')
+
+    def test_user_creation_writes_no_permission_rows(self):
+        """测试创建用户时不再为每个用户写入角色的权限"""
+        admin = User.objects.create_user(username='admin', password='password', role='admin')
+        teacher = User.objects.create_user(username='teacher', password='password', role='teacher')
+
+        self.assertEqual(admin.role_obj, self.admin_role)
+        self.assertEqual(teacher.role_obj, self.teacher_role)
+        self.assertFalse(User.user_permissions.through.objects.exists())
+        self.assertTrue(User.objects.get(pk=teacher.pk).has_perm('users.manage_courses'))
+
+    def test_all_permissions_combine_role_and_overrides(self):
+        """测试有效权限为角色权限与单独授予权限的并集"""
+        teacher = User.objects.create_user(username='teacher', password='password', role='teacher')
+        teacher.user_permissions.add(Permission.objects.get(codename='add_course'))
+
+        teacher = User.objects.get(pk=teacher.pk)
+        permissions = teacher.get_all_permissions()
+        self.assertIn('users.view_student_data', permissions)
+        self.assertIn('courses.add_course', permissions)
+        self.assertNotIn('courses.delete_course', permissions)
+
+    def test_override_kept_on_role_change(self):
+        """测试更换角色时保留单独授予的权限，角色权限随角色变化"""
+        user = User.objects.create_user(username='teacher', password='password', role='teacher')
+        user.user_permissions.add(Permission.objects.get(codename='add_course'))
+
+        user.role_obj = self.student_role
+        user.save()
+
+        user = User.objects.get(pk=user.pk)
+        self.assertEqual(user.get_all_permissions(), {'courses.add_course'})
+
+    def test_inactive_user_has_no_permissions(self):
+        """测试未激活的用户没有任何权限"""
+        user = User.objects.create_user(username='teacher', password='password', role='teacher', is_active=False)
+        self.assertEqual(user.get_all_permissions(), set())
+
+
+class RemoveRedundantUserPermissionsMigrationTest(TestCase):
+    """删除多余用户权限记录的数据迁移测试"""
+
+    def setUp(self):
+        self.teacher_role = create_default_role('teacher')
+        self.admin_role = create_default_role('admin')
+        self.teacher = User.objects.create_user(username='teacher', password='password', role='teacher')
+        self.admin = User.objects.create_user(username='admin', password='password', role='admin')
+        self.add_course = Permission.objects.get(codename='add_course')
+
+        # 之前的实现为每个用户写入了角色的全部权限
+        self.teacher.user_permissions.set(list(self.teacher_role.permissions.all()) + [self.add_course])
+        self.admin.user_permissions.set(Permission.objects.all())
+
+    def test_removes_role_granted_rows(self):
+        """测试只保留角色之外单独授予的权限"""
+        migration.remove_redundant_user_permissions(apps, SimpleNamespace(connection=connection))
+
+        rows = User.user_permissions.through.objects.values_list('user_id', 'permission_id')
+        self.assertEqual(list(rows), [(self.teacher.pk, self.add_course.pk)])
+
+    def test_keeps_admin_grants_outside_role(self):
+        """测试管理员单独授予、管理员角色没有的权限不被删除"""
+        self.admin_role.permissions.remove(self.add_course)
+        migration.remove_redundant_user_permissions(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(list(self.admin.user_permissions.values_list('codename', flat=True)), ['add_course'])
+
+    def test_reverse_restores_role_rows(self):
+        """测试回滚时重新写入角色的权限"""
+        migration.remove_redundant_user_permissions(apps, SimpleNamespace(connection=connection))
+        migration.restore_user_permissions(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(
+            set(self.teacher.user_permissions.values_list('codename', flat=True)),
+            {'view_student_data', 'manage_courses', 'generate_teaching_content', 'add_course'},
+        )
+        self.assertEqual(self.admin.user_permissions.count(), Permission.objects.count())
@@ -0,0 +1,135 @@
+import time
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.admin import RoleAdmin
+from users.models import Role
+from users.role_propagation import PROGRESS_KEY_PREFIX, RolePropagator, get_role_propagator
+from users.user_cache import get_user_cache
+
+User = get_user_model()
+
+
+class RolePropagationTest(TestCase):
+    """角色变更批量传播测试"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _create_users(self, count, role):
+        return [
+            User.objects.create_user(username=f'{role}-{i}', password='password', role=role)
+            for i in range(count)
+        ]
+
+    def _propagation_queries(self, count):
+        """返回保存新角色时同步count个用户执行的查询数"""
+        users = self._create_users(count, role=f'reviewer{count}')
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                role = Role.objects.create(name=f'reviewer{count}')
+        for user in users:
+            user.refresh_from_db()
+            self.assertEqual(user.role_obj, role)
+        return len(context.captured_queries)
+
+    def test_new_role_links_users_with_constant_queries(self):
+        """测试新建角色时一次UPDATE关联所有使用该角色名称的用户，查询数与用户数无关"""
+        self.assertEqual(self._propagation_queries(3), self._propagation_queries(20))
+
+    def test_renamed_role_updates_users(self):
+        """测试角色改名后同步用户的role字段，并清除用户缓存"""
+        role = Role.objects.create(name='reviewer')
+        user = User.objects.create_user(username='reviewer', password='password', role_obj=role)
+        self.assertEqual(get_user_cache().get(user.pk).role, 'reviewer')
+
+        role.name = 'auditor'
+        role.save()
+
+        self.assertEqual(User.objects.get(pk=user.pk).role, 'auditor')
+        self.assertEqual(get_user_cache().get(user.pk).role, 'auditor')
+
+    def test_propagate_in_batches(self):
+        """测试分批更新并记录进度"""
+        self._create_users(5, role='reviewer')
+        role = Role.objects.bulk_create([Role(name='reviewer')])[0]
+        propagator = RolePropagator(batch_size=2)
+
+        stats = propagator.propagate(role)
+
+        self.assertEqual(stats['updated'], 5)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(User.objects.filter(role_obj=role).count(), 5)
+        progress = propagator.get_progress(role.pk)
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['updated'], 5)
+
+    @override_settings(BACKGROUND_WORKERS_ENABLED=True, ROLE_PROPAGATION_BACKGROUND_THRESHOLD=2)
+    def test_large_role_runs_in_background(self):
+        """测试待同步用户较多时在事务提交后转入后台执行"""
+        self._create_users(3, role='reviewer')
+        role = Role.objects.bulk_create([Role(name='reviewer')])[0]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(get_role_propagator().schedule(role))
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_role_propagator().get_progress(role.pk)['status'], 'pending')
+        self.assertFalse(User.objects.filter(role_obj=role).exists())
+
+        # 后台任务从等待中的记录开始执行
+        self.assertEqual(get_role_propagator().run_pending(), 1)
+        self.assertEqual(User.objects.filter(role_obj=role).count(), 3)
+        self.assertEqual(get_role_propagator().get_progress(role.pk)['status'], 'done')
+
+    def test_stale_running_marked_failed(self):
+        """测试长时间没有更新的同步记录标记为失败，再次同步时从last_pk继续"""
+        users = self._create_users(4, role='reviewer')
+        role = Role.objects.bulk_create([Role(name='reviewer')])[0]
+        propagator = RolePropagator(stale_after=60)
+        # 模拟进程在处理完前两个用户后退出
+        User.objects.filter(pk__in=[u.pk for u in users[:2]]).update(role_obj=role)
+        propagator.shared.set(f'{PROGRESS_KEY_PREFIX}:{role.pk}', {
+            'status': 'running', 'total': 4, 'updated': 2, 'batches': 1,
+            'last_pk': users[1].pk, 'updated_at': time.time() - 120,
+        })
+
+        self.assertEqual(propagator.get_progress(role.pk)['status'], 'failed')
+        stats = propagator.propagate(role, resume=True)
+
+        self.assertEqual(stats['updated'], 4)
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(User.objects.filter(role_obj=role).count(), 4)
+
+    def test_running_lock_skips_role(self):
+        """测试其他进程正在同步的角色不会重复执行"""
+        self._create_users(2, role='reviewer')
+        role = Role.objects.bulk_create([Role(name='reviewer')])[0]
+        propagator = get_role_propagator()
+        propagator.shared.set(f'{PROGRESS_KEY_PREFIX}:{role.pk}', {
+            'status': 'pending', 'total': 2, 'updated': 0, 'batches': 0, 'last_pk': 0, 'updated_at': time.time(),
+        })
+        propagator.shared.set(f'{PROGRESS_KEY_PREFIX}:{role.pk}:lock', 1)
+
+        self.assertEqual(propagator.run_pending(), 0)
+        self.assertFalse(User.objects.filter(role_obj=role).exists())
+
+    def test_admin_action_uses_propagator(self):
+        """测试管理后台的同步操作一次UPDATE同步用户，不逐个保存"""
+        users = self._create_users(5, role='reviewer')
+        role = Role.objects.bulk_create([Role(name='reviewer')])[0]
+        request = RequestFactory().post('/admin/users/role/')
+        model_admin = RoleAdmin(Role, AdminSite())
+        model_admin.message_user = lambda *args, **kwargs: None
+
+        with CaptureQueriesContext(connection) as context:
+            model_admin.sync_users_with_this_role(request, Role.objects.filter(pk=role.pk))
+
+        self.assertEqual(User.objects.filter(role_obj=role).count(), len(users))
+        updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "users_user"')]
+        self.assertLessEqual(len(updates), 2)
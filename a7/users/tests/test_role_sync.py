@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from users.models import Role
+from users.permission_utils import create_default_role
+from users.role_sync import CheckpointMismatch, ParallelSyncUnsupported, RoleSyncer, _init_worker, role_statistics
+
+User = get_user_model()
+
+
+class RoleSyncTest(TestCase):
+    """分批同步用户角色测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher_role = create_default_role('teacher')
+        self.student_role = create_default_role('student')
+        self.checkpoint_file = os.path.join(tempfile.mkdtemp(), 'role_sync.checkpoint')
+        self.addCleanup(lambda: os.path.exists(self.checkpoint_file) and os.remove(self.checkpoint_file))
+
+        # 绕过保存信号制造不同步的用户
+        self.unlinked = [
+            User.objects.create_user(username=f'unlinked-{i}', password='password', role='teacher')
+            for i in range(3)
+        ]
+        User.objects.filter(pk__in=[u.pk for u in self.unlinked]).update(role_obj=None)
+        self.mismatched = User.objects.create_user(username='mismatched', password='password', role='teacher')
+        User.objects.filter(pk=self.mismatched.pk).update(role='student')
+
+    def _syncer(self, **kwargs):
+        kwargs.setdefault('chunk_size', 2)
+        return RoleSyncer('test', checkpoint_file=self.checkpoint_file, **kwargs)
+
+    def test_sync_in_chunks(self):
+        """测试分批关联角色对象，并以role_obj为准修正role"""
+        stats = self._syncer().run()
+
+        self.assertEqual(stats['scanned'], 4)
+        self.assertEqual(stats['updated'], 4)
+        self.assertEqual(stats['chunks'], 2)
+        self.assertEqual(User.objects.filter(role_obj=self.teacher_role, role='teacher').count(), 4)
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+    def test_prefer_role_field(self):
+        """测试以role字段为准重新关联角色对象"""
+        self._syncer(prefer_role_field=True).run()
+        mismatched = User.objects.get(pk=self.mismatched.pk)
+        self.assertEqual(mismatched.role, 'student')
+        self.assertEqual(mismatched.role_obj, self.student_role)
+
+    def test_resume_from_checkpoint(self):
+        """测试从检查点继续，只处理检查点之后的用户"""
+        with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+            json.dump({'task': 'test', 'prefer_role_field': False, 'last_pk': self.unlinked[1].pk}, f)
+
+        stats = self._syncer().run()
+
+        self.assertEqual(stats['resumed_from'], self.unlinked[1].pk)
+        self.assertEqual(stats['scanned'], 2)
+        self.assertEqual(User.objects.filter(role_obj__isnull=True).count(), 2)
+
+    def test_resume_with_other_prefer_role_field_rejected(self):
+        """测试检查点记录prefer_role_field，参数不同时拒绝继续"""
+        syncer = self._syncer()
+        syncer.save_checkpoint(self.unlinked[1].pk)
+        with open(self.checkpoint_file, encoding='utf-8') as f:
+            self.assertFalse(json.load(f)['prefer_role_field'])
+
+        with self.assertRaises(CheckpointMismatch):
+            self._syncer(prefer_role_field=True).run()
+        self.assertEqual(User.objects.filter(role_obj__isnull=True).count(), 3)
+
+        # 命令提示使用--restart，--restart后从头同步
+        with override_settings(ROLE_SYNC_CHECKPOINT_FILE=self.checkpoint_file):
+            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+                json.dump({'task': 'init_roles', 'prefer_role_field': False, 'last_pk': self.unlinked[1].pk}, f)
+            with self.assertRaisesMessage(CommandError, '--restart'):
+                call_command('init_roles', '--force', stdout=StringIO())
+            call_command('init_roles', '--force', '--restart', stdout=StringIO())
+        self.assertFalse(User.objects.filter(role_obj__isnull=True).exists())
+
+    def test_checkpoint_of_other_task_ignored(self):
+        """测试忽略其他命令留下的检查点"""
+        with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+            json.dump({'task': 'other', 'last_pk': self.unlinked[1].pk}, f)
+        self.assertEqual(self._syncer().run()['scanned'], 4)
+
+    def test_dry_run(self):
+        """测试dry-run只返回变更，不写入数据库"""
+        stats = self._syncer(dry_run=True).run()
+
+        self.assertEqual(stats['updated'], 4)
+        self.assertIn((self.mismatched.pk, 'mismatched', 'role', 'student', 'teacher'), stats['changes'])
+        self.assertEqual(User.objects.filter(role_obj__isnull=True).count(), 3)
+
+    def test_statistics_single_query(self):
+        """测试角色统计只执行一次查询"""
+        with self.assertNumQueries(1):
+            stats = {role['name']: role for role in role_statistics()}
+        self.assertEqual(stats['teacher']['direct_user_count'], 1)
+        self.assertEqual(stats['teacher']['string_user_count'], 3)
+        self.assertEqual(stats['teacher']['permission_count'], 3)
+
+    def test_sync_roles_command(self):
+        """测试同步命令的dry-run输出和实际同步"""
+        out = StringIO()
+        with override_settings(ROLE_SYNC_CHECKPOINT_FILE=self.checkpoint_file):
+            call_command('sync_roles', '--dry-run', stdout=out)
+            self.assertIn('mismatched', out.getvalue())
+            self.assertEqual(User.objects.filter(role_obj__isnull=True).count(), 3)
+
+            call_command('sync_roles', '--chunk-size', '2', stdout=out)
+        self.assertIn('更新了 4 个用户的角色', out.getvalue())
+        self.assertIn('web worker', out.getvalue())
+        self.assertFalse(User.objects.filter(role_obj__isnull=True).exists())
+
+    def test_init_roles_command(self):
+        """测试初始化命令创建默认角色并关联用户"""
+        out = StringIO()
+        with override_settings(ROLE_SYNC_CHECKPOINT_FILE=self.checkpoint_file):
+            call_command('init_roles', '--force', stdout=out)
+        self.assertTrue(Role.objects.filter(name='admin').exists())
+        self.assertEqual(User.objects.get(pk=self.mismatched.pk).role_obj, self.student_role)
+        self.assertFalse(User.objects.filter(role_obj__isnull=True).exists())
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    })
+    def test_command_warns_restart_without_shared_cache(self):
+        """测试用户缓存不在进程间共享时，命令提示需要重启web worker"""
+        out = StringIO()
+        with override_settings(ROLE_SYNC_CHECKPOINT_FILE=self.checkpoint_file):
+            call_command('sync_roles', stdout=out)
+        self.assertIn('需要重启web worker', out.getvalue())
+
+    def test_parallel_sync_rejected_on_sqlite(self):
+        """测试SQLite上拒绝多个工作进程并行同步，命令在写入前报错"""
+        with self.assertRaises(ParallelSyncUnsupported):
+            self._syncer(workers=2)
+        with self.assertRaisesMessage(CommandError, '--workers 1'):
+            call_command('sync_roles', '--workers', '2', stdout=StringIO())
+        self.assertEqual(User.objects.filter(role_obj__isnull=True).count(), 3)
+
+    def test_worker_initializer_sets_up_django(self):
+        """测试工作进程初始化时加载Django配置并关闭继承的数据库连接"""
+        with mock.patch('users.role_sync.django.setup') as setup, \
+                mock.patch('users.role_sync.connections.close_all') as close_all:
+            _init_worker()
+        setup.assert_called_once_with()
+        close_all.assert_called_once_with()
@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import Role
+from users.permissions import HasManageCoursesPermission, IsAdminOrTeacher
+from users.tokens import PermissionRefreshToken, TOKEN_PERMISSIONS, get_token_permissions
+
+User = get_user_model()
+
+
+class PermissionClaimsTest(TestCase):
+    """访问令牌授权声明测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        User.objects.create_user(username='teacher', password='teacher123', role='teacher')
+        User.objects.create_user(username='student', password='student123', role='student')
+        # 与登录时一样使用从数据库加载的用户（创建时关联角色会递增数据库中的权限版本）
+        self.teacher = User.objects.get(username='teacher')
+        self.student = User.objects.get(username='student')
+
+    def _request(self, user, token):
+        request = Request(self.factory.get('/api/users/'))
+        request._request.token_payload = token.payload
+        request.user = User.objects.get(pk=user.pk)
+        return request
+
+    def test_login_issues_claims(self):
+        """测试登录返回的访问令牌包含角色、权限位图和权限版本"""
+        response = self.client.post('/api/token/', {'username': 'teacher', 'password': 'teacher123'})
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()['data']['access'])
+        self.assertEqual(access['role'], 'teacher')
+        self.assertEqual(access['perms'], (1 << len(TOKEN_PERMISSIONS)) - 1)
+        self.assertEqual(access['pv'], User.objects.get(username='teacher').permissions_version)
+
+    def test_refresh_reissues_claims(self):
+        """测试刷新令牌时按当前角色重新生成声明"""
+        refresh = PermissionRefreshToken.for_user(self.student)
+        self.student.role_obj = Role.objects.get(name='teacher')
+        self.student.save()
+
+        response = self.client.post('/api/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(AccessToken(response.json()['data']['access'])['role'], 'teacher')
+
+    def test_authorize_without_queries(self):
+        """测试声明有效时权限类不查询数据库"""
+        request = self._request(self.teacher, PermissionRefreshToken.for_user(self.teacher).access_token)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsAdminOrTeacher().has_permission(request, None))
+            self.assertTrue(HasManageCoursesPermission().has_permission(request, None))
+
+        request = self._request(self.student, PermissionRefreshToken.for_user(self.student).access_token)
+        with self.assertNumQueries(0):
+            self.assertFalse(IsAdminOrTeacher().has_permission(request, None))
+            self.assertFalse(HasManageCoursesPermission().has_permission(request, None))
+
+    def test_role_permission_change_invalidates_claims(self):
+        """测试角色权限变化后旧令牌的声明失效，回退到数据库检查"""
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        self.student.role_obj.permissions.add(Permission.objects.get(codename='manage_courses'))
+
+        request = self._request(self.student, token)
+        self.assertIsNone(get_token_permissions(request))
+        self.assertTrue(HasManageCoursesPermission().has_permission(request, None))
+
+    def test_user_role_change_invalidates_claims(self):
+        """测试用户角色变化后旧令牌的声明失效"""
+        token = PermissionRefreshToken.for_user(self.teacher).access_token
+        self.teacher.role_obj = Role.objects.get(name='student')
+        self.teacher.save()
+
+        request = self._request(self.teacher, token)
+        self.assertIsNone(get_token_permissions(request))
+        self.assertFalse(IsAdminOrTeacher().has_permission(request, None))
+
+    def test_direct_grant_invalidates_claims(self):
+        """测试用户直接权限变化后旧令牌的声明失效"""
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        self.student.user_permissions.add(Permission.objects.get(codename='generate_teaching_content'))
+        self.assertIsNone(get_token_permissions(self._request(self.student, token)))
+
+    def test_token_without_claims(self):
+        """测试不含声明的令牌按原方式检查"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        request = self._request(self.teacher, RefreshToken.for_user(self.teacher).access_token)
+        self.assertIsNone(get_token_permissions(request))
+        self.assertTrue(IsAdminOrTeacher().has_permission(request, None))
+
+    def test_stale_instance_does_not_overwrite_version(self):
+        """测试权限版本保存在用户表中，用过期的用户对象保存其他字段时不会覆盖已递增的版本"""
+        stale = User.objects.get(pk=self.student.pk)
+        self.student.role_obj.permissions.add(Permission.objects.get(codename='manage_courses'))
+        version = User.objects.get(pk=self.student.pk).permissions_version
+        self.assertNotEqual(version, stale.permissions_version)
+
+        stale.first_name = '李'
+        stale.save()
+        self.assertEqual(User.objects.get(pk=self.student.pk).permissions_version, version)
+
+    def test_noop_role_permission_change_keeps_version(self):
+        """测试清空本来为空的角色权限、重复添加权限时不递增权限版本"""
+        role = self.student.role_obj
+        role.permissions.clear()
+        version = User.objects.get(pk=self.student.pk).permissions_version
+
+        role.permissions.clear()
+        self.assertEqual(User.objects.get(pk=self.student.pk).permissions_version, version)
+
+        permission = Permission.objects.get(codename='manage_courses')
+        role.permissions.add(permission)
+        version = User.objects.get(pk=self.student.pk).permissions_version
+        role.permissions.add(permission)
+        self.assertEqual(User.objects.get(pk=self.student.pk).permissions_version, version)
+
+        role.permissions.clear()
+        self.assertNotEqual(User.objects.get(pk=self.student.pk).permissions_version, version)
+
+    def test_clear_from_permission_side_bumps_roles(self):
+        """测试从权限一侧清空时只递增拥有该权限的角色的用户"""
+        permission = Permission.objects.get(codename='manage_courses')
+        self.student.role_obj.permissions.add(permission)
+        self.teacher.role_obj.permissions.remove(permission)
+        student_version = User.objects.get(pk=self.student.pk).permissions_version
+        teacher_version = User.objects.get(pk=self.teacher.pk).permissions_version
+
+        permission.roles.clear()
+        self.assertNotEqual(User.objects.get(pk=self.student.pk).permissions_version, student_version)
+        self.assertEqual(User.objects.get(pk=self.teacher.pk).permissions_version, teacher_version)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from users.token_purge import LOCK_KEY, TokenPurger, acquire_purge_lock, run_scheduled_purge
+
+User = get_user_model()
+
+
+class TokenPurgeTest(TestCase):
+    """过期令牌清理测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.checkpoint_file = os.path.join(tempfile.mkdtemp(), 'token_purge.checkpoint')
+        self.addCleanup(lambda: os.path.exists(self.checkpoint_file) and os.remove(self.checkpoint_file))
+
+    def _create_tokens(self, count, expired=True, blacklisted=False):
+        now = timezone.now()
+        expires_at = now - timedelta(days=1) if expired else now + timedelta(days=1)
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                user=self.user, jti=uuid.uuid4().hex, token='token', created_at=now, expires_at=expires_at,
+            )
+            for _ in range(count)
+        ])
+        if blacklisted:
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens])
+        return tokens
+
+    def test_purge_in_batches(self):
+        """测试分批删除过期令牌及其黑名单记录，保留未过期的令牌"""
+        self._create_tokens(5)
+        self._create_tokens(2, blacklisted=True)
+        valid = self._create_tokens(3, expired=False, blacklisted=True)
+
+        purger = TokenPurger(batch_size=3, pause=0, checkpoint_file=self.checkpoint_file)
+        stats = purger.purge()
+
+        self.assertTrue(stats['completed'])
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['outstanding_deleted'], 7)
+        self.assertEqual(stats['blacklisted_deleted'], 2)
+        self.assertQuerysetEqual(
+            OutstandingToken.objects.order_by('pk'), [t.pk for t in valid], transform=lambda t: t.pk,
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+    def test_resume_from_checkpoint(self):
+        """测试中断后从检查点继续，不重复扫描已处理的令牌"""
+        self._create_tokens(5)
+        purger = TokenPurger(batch_size=2, pause=0, checkpoint_file=self.checkpoint_file)
+
+        stats = purger.purge(max_batches=1)
+        self.assertFalse(stats['completed'])
+        self.assertEqual(stats['outstanding_deleted'], 2)
+        checkpoint = purger.load_checkpoint()
+        self.assertIsNotNone(checkpoint)
+
+        # 检查点之后新过期的令牌留到下一轮清理
+        late = self._create_tokens(1)
+        stats = purger.purge(now=timezone.now() - timedelta(days=30))
+        self.assertTrue(stats['completed'])
+        self.assertEqual(stats['resumed_from'], checkpoint['last_id'])
+        self.assertEqual(stats['outstanding_deleted'], 4)
+        self.assertFalse(OutstandingToken.objects.exclude(pk=late[0].pk).exists())
+
+    def test_purge_tokens_command(self):
+        """测试清理命令输出清理的记录数"""
+        self._create_tokens(3, blacklisted=True)
+        self._create_tokens(1, expired=False)
+
+        out = StringIO()
+        with override_settings(TOKEN_PURGE_CHECKPOINT_FILE=self.checkpoint_file):
+            call_command('purge_tokens', '--batch-size', '2', '--pause', '0', stdout=out)
+
+        self.assertIn('OutstandingToken 3条', out.getvalue())
+        self.assertIn('BlacklistedToken 3条', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+
+    def test_command_and_schedule_share_lock(self):
+        """测试purge_tokens命令与定时任务共用清理锁：锁被占用时命令报错、定时任务跳过，完成后释放锁"""
+        self._create_tokens(2)
+        with override_settings(TOKEN_PURGE_CHECKPOINT_FILE=self.checkpoint_file):
+            self.assertTrue(acquire_purge_lock())
+            with self.assertRaises(CommandError):
+                call_command('purge_tokens', '--pause', '0', stdout=StringIO())
+            run_scheduled_purge()
+            self.assertEqual(OutstandingToken.objects.count(), 2)
+
+            cache.delete(LOCK_KEY)
+            call_command('purge_tokens', '--pause', '0', stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 0)
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+    def test_checkpoint_directory_created(self):
+        """测试检查点所在的数据目录不存在时自动创建"""
+        checkpoint_file = os.path.join(tempfile.mkdtemp(), 'data', 'token_purge.checkpoint')
+        self._create_tokens(3)
+        TokenPurger(batch_size=1, pause=0, checkpoint_file=checkpoint_file).purge(max_batches=1)
+        self.assertTrue(os.path.exists(checkpoint_file))
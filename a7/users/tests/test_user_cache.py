@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.core.tests.utils import DatabaseSharedCacheMixin
+from users.models import Role
+from users.user_cache import UserCache, get_user_cache
+
+User = get_user_model()
+
+
+class UserCacheTest(TestCase):
+    """两级用户缓存测试"""
+
+    def setUp(self):
+        cache.clear()
+        get_user_cache().clear()
+        self.role = Role.objects.create(name='assistant')
+        self.user = User.objects.create_user(username='testuser', password='testpassword', role='teacher')
+        self.user_cache = UserCache(local_ttl=10, shared_ttl=60)
+
+    def test_snapshot_fields(self):
+        """测试快照包含请求处理需要的字段，其余字段延迟加载"""
+        user = self.user_cache.get(self.user.pk)
+        self.assertEqual((user.pk, user.username, user.role, user.is_active), (self.user.pk, 'testuser', 'teacher', True))
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertNotIn('role_obj_id', user.get_deferred_fields())
+
+        with self.assertNumQueries(1):
+            user.email
+            user.date_joined
+            user.last_login
+
+    def test_tiers(self):
+        """测试依次命中进程内缓存和共享缓存"""
+        with self.assertNumQueries(1):
+            self.user_cache.get(self.user.pk, now=0)
+            self.user_cache.get(self.user.pk, now=5)
+        self.assertEqual(self.user_cache.local_hits, 1)
+
+        # 进程内缓存过期后从共享缓存读取
+        with self.assertNumQueries(0):
+            self.user_cache.get(self.user.pk, now=20)
+        stats = self.user_cache.stats()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], round(2 / 3, 4))
+
+    def test_missing_user(self):
+        """测试用户不存在时返回None"""
+        self.assertIsNone(self.user_cache.get(self.user.pk + 100))
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的用户"""
+        other = User.objects.create_user(username='other', password='testpassword')
+        user_cache = UserCache(max_size=1)
+        user_cache.get(self.user.pk)
+        user_cache.get(other.pk)
+        self.assertEqual(user_cache.stats()['size'], 1)
+
+    def test_save_invalidates(self):
+        """测试保存用户后缓存失效，只更新last_login时不失效"""
+        user_cache = get_user_cache()
+        user_cache.get(self.user.pk)
+
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            user_cache.get(self.user.pk)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(user_cache.get(self.user.pk).is_active)
+
+    def test_role_delete_invalidates(self):
+        """测试删除角色后用户的role_obj_id在缓存中被清除"""
+        User.objects.filter(pk=self.user.pk).update(role_obj=self.role)
+        user_cache = get_user_cache()
+        self.assertEqual(user_cache.get(self.user.pk).role_obj_id, self.role.pk)
+
+        self.role.delete()
+        self.assertIsNone(user_cache.get(self.user.pk).role_obj_id)
+
+    def test_inactive_user_rejected(self):
+        """测试禁用用户后使用原令牌的请求被拒绝"""
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.assertEqual(self.client.get('/api/courses/', **headers).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/courses/', **headers).status_code, 401)
+
+
+class UserCacheSettingsTest(SimpleTestCase):
+    """用户缓存配置测试"""
+
+    @override_settings(USER_CACHE_ALIAS='default', USER_CACHE_LOCAL_TTL=10, USER_CACHE_SHARED_TTL=60)
+    def test_process_local_shared_tier_capped(self):
+        """测试第二级缓存只在进程内有效时，共享缓存有效期被限制为进程内缓存有效期"""
+        self.assertEqual(UserCache.from_settings().shared_ttl, 10)
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'},
+        },
+        USER_CACHE_ALIAS='shared', USER_CACHE_LOCAL_TTL=10, USER_CACHE_SHARED_TTL=60,
+    )
+    def test_shared_tier_keeps_ttl(self):
+        """测试第二级缓存在进程间共享时保留配置的有效期"""
+        user_cache = UserCache.from_settings()
+        self.assertEqual((user_cache.cache_alias, user_cache.shared_ttl), ('shared', 60))
+
+
+class UserCacheDatabaseTierTest(DatabaseSharedCacheMixin, TestCase):
+    """共享缓存为数据库缓存时的用户缓存测试"""
+
+    def test_single_tier(self):
+        """测试只使用进程内缓存，未命中时只查询一次用户表"""
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        user_cache = get_user_cache()
+        self.assertIsNone(user_cache.cache_alias)
+
+        with self.assertNumQueries(1), self.assertSharedCacheQueries(0):
+            self.assertEqual(user_cache.get(user.pk, now=0).username, 'testuser')
+            user_cache.get(user.pk, now=5)
+        with self.assertSharedCacheQueries(0):
+            user_cache.invalidate(user.pk)
+            user_cache.invalidate_many([user.pk])
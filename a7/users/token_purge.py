@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.core.background import PeriodicWorker
+
+logger = logging.getLogger('django')
+
+# 清理锁：定时任务和purge_tokens命令执行清理期间持有，保证同一时间只有一个清理任务
+LOCK_KEY = 'token-purge:lock'
+# 清理锁的有效期（秒），每批完成后延长，进程中断后锁自动过期
+LOCK_TIMEOUT = 300
+# 多个进程中的定时任务通过该键保证每个周期只有一个进程执行清理
+CYCLE_KEY = 'token-purge:cycle'
+
+
+class TokenPurger:
+    """
+    过期令牌清理
+
+    按主键顺序分批（键集分页）删除已过期的OutstandingToken及其BlacklistedToken：
+    - 每批在单独的短事务中删除，不会长时间持有锁
+    - 批次之间暂停pause秒，降低对线上请求的影响
+    - 每批完成后把进度（截止时间和最后处理的主键）写入检查点文件，中断后再次运行时从检查点继续
+    """
+
+    def __init__(self, batch_size=1000, pause=0.1, checkpoint_file=None):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.checkpoint_file = checkpoint_file
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建清理器"""
+        return cls(
+            batch_size=getattr(settings, 'TOKEN_PURGE_BATCH_SIZE', 1000),
+            pause=getattr(settings, 'TOKEN_PURGE_PAUSE', 0.1),
+            checkpoint_file=getattr(settings, 'TOKEN_PURGE_CHECKPOINT_FILE', None),
+        )
+
+    def purge(self, now=None, max_batches=None, max_seconds=None, resume=True, progress=None):
+        """
+        删除过期令牌，返回清理统计
+
+        达到max_batches或max_seconds时停止并保留检查点，progress(stats)在每批完成后调用
+        """
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint:
+            cutoff = parse_datetime(checkpoint['cutoff'])
+            last_id = checkpoint['last_id']
+        else:
+            cutoff = now or timezone.now()
+            last_id = 0
+
+        stats = {
+            'outstanding_deleted': 0,
+            'blacklisted_deleted': 0,
+            'batches': 0,
+            'resumed_from': last_id,
+            'completed': False,
+        }
+        started = time.monotonic()
+
+        while True:
+            if max_batches is not None and stats['batches'] >= max_batches:
+                break
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                break
+
+            # 按主键顺序取下一批过期令牌，只读取主键
+            ids = list(
+                OutstandingToken.objects
+                .filter(pk__gt=last_id, expires_at__lt=cutoff)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                stats['completed'] = True
+                break
+
+            with transaction.atomic():
+                # 先删除黑名单记录，删除OutstandingToken时不再需要级联查询
+                _, blacklisted = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                _, outstanding = OutstandingToken.objects.filter(pk__in=ids).delete()
+
+            last_id = ids[-1]
+            stats['batches'] += 1
+            stats['blacklisted_deleted'] += (
+                blacklisted.get(BlacklistedToken._meta.label, 0) + outstanding.get(BlacklistedToken._meta.label, 0)
+            )
+            stats['outstanding_deleted'] += outstanding.get(OutstandingToken._meta.label, 0)
+            self.save_checkpoint(cutoff, last_id)
+            if progress is not None:
+                progress(stats)
+
+            if len(ids) < self.batch_size:
+                stats['completed'] = True
+                break
+            if self.pause:
+                time.sleep(self.pause)
+
+        if stats['completed']:
+            self.clear_checkpoint()
+        stats['elapsed'] = round(time.monotonic() - started, 3)
+        return stats
+
+    def compact(self):
+        """
+        回收已删除记录占用的空间，返回执行的操作说明
+
+        只执行不阻塞读写的操作：PostgreSQL执行VACUUM ANALYZE（不使用FULL），
+        SQLite只在auto_vacuum为INCREMENTAL时执行incremental_vacuum，否则跳过（VACUUM会锁住整个数据库）
+        """
+        tables = [BlacklistedToken._meta.db_table, OutstandingToken._meta.db_table]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for table in tables:
+                    cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(table)}')
+            return 'VACUUM ANALYZE'
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA auto_vacuum')
+                # 0: NONE, 1: FULL, 2: INCREMENTAL
+                if cursor.fetchone()[0] == 2:
+                    cursor.execute('PRAGMA incremental_vacuum')
+                    return 'PRAGMA incremental_vacuum'
+            return None
+        return None
+
+    def load_checkpoint(self):
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return None
+        try:
+            with open(self.checkpoint_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_checkpoint(self, cutoff, last_id):
+        if not self.checkpoint_file:
+            return
+        # 先写临时文件再替换，避免中断时留下不完整的检查点
+        os.makedirs(os.path.dirname(self.checkpoint_file) or '.', exist_ok=True)
+        temp_file = f'{self.checkpoint_file}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'cutoff': cutoff.isoformat(), 'last_id': last_id}, f)
+        os.replace(temp_file, self.checkpoint_file)
+
+    def clear_checkpoint(self):
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+
+def _lock_cache():
+    return caches[getattr(settings, 'TOKEN_PURGE_LOCK_CACHE', 'shared')]
+
+
+def acquire_purge_lock():
+    """获取清理锁（定时任务和purge_tokens命令共用）"""
+    return _lock_cache().add(LOCK_KEY, os.getpid(), timeout=LOCK_TIMEOUT)
+
+
+def refresh_purge_lock(stats=None):
+    """延长清理锁的有效期，作为TokenPurger.purge()的progress回调在每批完成后调用"""
+    _lock_cache().touch(LOCK_KEY, LOCK_TIMEOUT)
+
+
+def release_purge_lock():
+    _lock_cache().delete(LOCK_KEY)
+
+
+def run_scheduled_purge():
+    """
+    定时清理任务，单轮最多执行TOKEN_PURGE_MAX_SECONDS秒
+
+    周期键在TOKEN_PURGE_INTERVAL秒后自动过期，多个进程中每个周期只有一个进程执行清理；
+    purge_tokens命令正在运行（持有清理锁）时跳过本周期
+    """
+    interval = getattr(settings, 'TOKEN_PURGE_INTERVAL', 3600)
+    if not _lock_cache().add(CYCLE_KEY, os.getpid(), timeout=interval):
+        return
+    if not acquire_purge_lock():
+        return
+    try:
+        stats = TokenPurger.from_settings().purge(
+            max_seconds=getattr(settings, 'TOKEN_PURGE_MAX_SECONDS', 60),
+            progress=refresh_purge_lock,
+        )
+    finally:
+        release_purge_lock()
+    if stats['outstanding_deleted'] or stats['blacklisted_deleted']:
+        logger.info(
+            f"清理过期令牌: OutstandingToken={stats['outstanding_deleted']}条, "
+            f"BlacklistedToken={stats['blacklisted_deleted']}条, 批次={stats['batches']}, "
+            f"耗时={stats['elapsed']}秒, 完成={stats['completed']}"
+        )
+
+
+_worker = None
+
+
+def start_purge_worker():
+    """按需启动定时清理任务（TOKEN_PURGE_INTERVAL为None时不启动）"""
+    global _worker
+    interval = getattr(settings, 'TOKEN_PURGE_INTERVAL', 3600)
+    if not interval:
+        return False
+    if _worker is None:
+        _worker = PeriodicWorker('token-purge', interval, run_scheduled_purge, final_run=False)
+    return _worker.start()
+
+
+@receiver(request_started, dispatch_uid='users.token_purge.start_on_first_request')
+def start_purge_worker_on_first_request(sender, **kwargs):
+    """
+    处理第一个请求时启动定时清理任务，之后断开信号，不再占用请求处理路径
+
+    只有处理请求的进程（而不是migrate等管理命令）会启动清理任务
+    """
+    request_started.disconnect(dispatch_uid='users.token_purge.start_on_first_request')
+    start_purge_worker()
@@ -0,0 +1,119 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+
+from .blacklist import FilteredBlacklistMixin
+from .user_cache import get_user_cache
+
+# 写入访问令牌的权限位，按位置编码，只能在末尾追加，不能调整顺序
+TOKEN_PERMISSIONS = ('view_student_data', 'manage_courses', 'generate_teaching_content')
+
+# 访问令牌中的授权声明
+ROLE_CLAIM = 'role'
+PERMISSIONS_CLAIM = 'perms'
+PERMISSIONS_VERSION_CLAIM = 'pv'
+
+
+def bump_user_permissions(*user_pks):
+    """
+    用户角色、直接权限或所属组变化时递增用户的权限版本（User.permissions_version），
+    使该用户令牌中的授权声明和缓存的权限集失效
+
+    版本保存在用户表中，所有worker进程都能读到；请求中的用户来自用户缓存，
+    递增后同时清除这些用户的快照（其他进程的进程内缓存最多在USER_CACHE_LOCAL_TTL秒后过期）
+    """
+    pks = list(user_pks)
+    if not pks:
+        return
+    get_user_model().objects.filter(pk__in=pks).update(permissions_version=F('permissions_version') + 1)
+    get_user_cache().invalidate_many(pks)
+
+
+def bump_role_permissions(*role_names):
+    """角色权限变化时递增该角色所有用户的权限版本，使按该角色签发的令牌中的授权声明失效"""
+    if not role_names:
+        return
+    users = get_user_model().objects.filter(Q(role__in=role_names) | Q(role_obj__name__in=role_names))
+    bump_user_permissions(*users.values_list('pk', flat=True).distinct())
+
+
+def permission_bitmap(user):
+    """将用户拥有的TOKEN_PERMISSIONS编码为整数位图"""
+    bitmap = 0
+    for bit, codename in enumerate(TOKEN_PERMISSIONS):
+        if user.has_perm(f'users.{codename}'):
+            bitmap |= 1 << bit
+    return bitmap
+
+
+def add_permission_claims(token, user):
+    """在令牌中写入角色、权限位图和权限版本"""
+    token[ROLE_CLAIM] = user.role
+    token[PERMISSIONS_CLAIM] = permission_bitmap(user)
+    token[PERMISSIONS_VERSION_CLAIM] = user.permissions_version
+
+
+class PermissionRefreshToken(FilteredBlacklistMixin, RefreshToken):
+    """
+    签发访问令牌时写入授权声明的刷新令牌
+
+    登录和刷新令牌时都会按用户当前的角色和权限重新生成声明，刷新令牌本身不携带这些声明；
+    黑名单检查通过黑名单过滤器完成（见users.blacklist）
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = getattr(self, 'user', None)
+        if user is None and api_settings.USER_ID_CLAIM in self.payload:
+            user = get_user_cache().get(self.payload[api_settings.USER_ID_CLAIM])
+        if user is not None:
+            add_permission_claims(access, user)
+        return access
+
+
+def get_token_permissions(request):
+    """
+    返回访问令牌中仍然有效的(角色, 权限位图)，没有声明或声明已过期时返回None
+
+    声明有效的条件：令牌属于当前用户，且签发时的权限版本与用户当前的权限版本一致；
+    用户来自用户缓存，版本比较不查询数据库。结果在同一个请求中复用。
+    """
+    if hasattr(request, '_token_permissions'):
+        return request._token_permissions
+
+    claims = None
+    payload = getattr(request, 'token_payload', None)
+    user = getattr(request, 'user', None)
+    if (payload and PERMISSIONS_CLAIM in payload and user is not None and user.is_authenticated
+            and str(payload.get(api_settings.USER_ID_CLAIM)) == str(user.pk)):
+        if payload.get(PERMISSIONS_VERSION_CLAIM) == user.permissions_version:
+            claims = (payload.get(ROLE_CLAIM), payload[PERMISSIONS_CLAIM])
+
+    request._token_permissions = claims
+    return claims
+
+
+def get_request_role(request):
+    """获取当前请求用户的角色，优先使用令牌中的声明"""
+    claims = get_token_permissions(request)
+    if claims is not None:
+        return claims[0]
+    return request.user.role
+
+
+def request_has_perm(request, perm):
+    """判断当前请求用户是否拥有权限，令牌中有有效的权限位图时不查询数据库"""
+    codename = perm.split('.')[-1]
+    claims = get_token_permissions(request)
+    if claims is not None and codename in TOKEN_PERMISSIONS:
+        return bool(claims[1] >> TOKEN_PERMISSIONS.index(codename) & 1)
+    return request.user.has_perm(perm)
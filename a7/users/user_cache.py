@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+
+from apps.core.shared_cache import is_database_cache, is_shared_cache
+
+# 请求处理路径上需要的用户字段，其余字段在首次访问时一次性从数据库加载
+# （修改字段后同时修改UserCache的key_prefix，避免读到旧格式的快照）
+SNAPSHOT_FIELDS = (
+    'id', 'username', 'role', 'is_active', 'is_staff', 'is_superuser', 'role_obj_id', 'permissions_version',
+)
+
+
+def snapshot_changed(update_fields):
+    """判断一次保存是否可能修改快照中的字段"""
+    if not update_fields:
+        return True
+    model = get_user_model()
+    snapshot_names = {f.name for f in model._meta.concrete_fields if f.attname in SNAPSHOT_FIELDS}
+    return bool(set(update_fields) & (snapshot_names | set(SNAPSHOT_FIELDS)))
+
+
+class UserCache:
+    """
+    两级用户缓存
+
+    第一级为进程内LRU（带TTL），第二级为Django缓存（多进程共享），保存用户的精简快照。
+    用户保存或删除时通过信号清除两级缓存中的快照；其他进程的第一级缓存最多在local_ttl秒后过期，
+    因此is_active等字段的变化最迟local_ttl秒后在所有进程中生效（绕过信号的批量update最迟shared_ttl秒）。
+
+    第二级缓存只在当前进程内有效时（如开发环境的LocMemCache），其他进程收不到清除，
+    from_settings()把shared_ttl限制为local_ttl，过期时间的上限仍为local_ttl秒。
+    第二级缓存为数据库缓存时，未命中一次要多执行几次缓存表查询（读取、计数、写入），
+    比直接查询用户表更慢，from_settings()只保留第一级缓存（cache_alias为None）
+    """
+
+    def __init__(self, max_size=2048, local_ttl=10, shared_ttl=60, cache_alias='shared',
+                 key_prefix='user:snapshot:v2'):
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计计数器
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        model = get_user_model()
+        self.model = model
+        # from_db要求字段按模型定义的顺序排列
+        self.field_names = [f.attname for f in model._meta.concrete_fields if f.attname in SNAPSHOT_FIELDS]
+
+    @classmethod
+    def from_settings(cls):
+        """根据settings创建用户缓存"""
+        local_ttl = getattr(settings, 'USER_CACHE_LOCAL_TTL', 10)
+        shared_ttl = getattr(settings, 'USER_CACHE_SHARED_TTL', 60)
+        cache_alias = getattr(settings, 'USER_CACHE_ALIAS', 'shared')
+        if is_database_cache(cache_alias):
+            cache_alias = None
+        elif not is_shared_cache(cache_alias):
+            shared_ttl = min(shared_ttl, local_ttl)
+        return cls(
+            max_size=getattr(settings, 'USER_CACHE_MAX_SIZE', 2048),
+            local_ttl=local_ttl,
+            shared_ttl=shared_ttl,
+            cache_alias=cache_alias,
+        )
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def key(self, pk):
+        return f'{self.key_prefix}:{pk}'
+
+    def get(self, pk, now=None):
+        """获取用户，用户不存在时返回None"""
+        now = time.monotonic() if now is None else now
+        pk = str(pk)
+
+        with self._lock:
+            entry = self._local.get(pk)
+            if entry is not None and entry[0] > now:
+                self._local.move_to_end(pk)
+                self.local_hits += 1
+            else:
+                entry = None
+        if entry is not None:
+            return self.build(entry[1])
+
+        values = self.shared.get(self.key(pk)) if self.cache_alias else None
+        if values is not None:
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            values = self.model._base_manager.filter(pk=pk).values_list(*self.field_names).first()
+            with self._lock:
+                self.misses += 1
+            if values is None:
+                return None
+            if self.cache_alias:
+                self.shared.set(self.key(pk), values, self.shared_ttl)
+
+        self._store_local(pk, values, now)
+        return self.build(values)
+
+    def build(self, values):
+        """根据快照构建用户对象，快照之外的字段为延迟字段"""
+        return self.model.from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+    def invalidate(self, pk):
+        """清除用户快照"""
+        pk = str(pk)
+        with self._lock:
+            self._local.pop(pk, None)
+            self.invalidations += 1
+        if self.cache_alias:
+            self.shared.delete(self.key(pk))
+
+    def invalidate_many(self, pks):
+        """批量清除用户快照（绕过保存信号的批量更新后调用）"""
+        pks = [str(pk) for pk in pks]
+        with self._lock:
+            for pk in pks:
+                self._local.pop(pk, None)
+            self.invalidations += len(pks)
+        if self.cache_alias:
+            self.shared.delete_many([self.key(pk) for pk in pks])
+
+    def clear(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        """返回命中率等统计信息"""
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._local),
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else None,
+            }
+
+    def _store_local(self, pk, values, now):
+        with self._lock:
+            self._local[pk] = (now + self.local_ttl, tuple(values))
+            self._local.move_to_end(pk)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    """获取全局用户缓存（首次使用时构建）"""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache.from_settings()
+    return _user_cache
+
+
+def user_cache_probe():
+    """健康检查中导出用户缓存的命中统计"""
+    return get_user_cache().stats()
+
+
+@receiver(setting_changed)
+def _reset_user_cache(setting, **kwargs):
+    """用户缓存或缓存后端配置变更时（如测试中的override_settings）重建"""
+    global _user_cache
+    if setting.startswith('USER_CACHE_') or setting == 'CACHES':
+        _user_cache = None
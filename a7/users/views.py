@@ -5,7 +5,6 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -16,6 +15,8 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView
 )
 
+from apps.core.timing import ServerTimingViewMixin
+
 from .models import Role
 from .serializers import (
     UserSerializer, 
@@ -36,11 +37,12 @@ from .permissions import (
     IsAdminOrTeacher,
     IsAdminOrTeacherReadOnly
 )
+from .tokens import PermissionRefreshToken
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ServerTimingViewMixin, viewsets.ModelViewSet):
     """
     用户视图集，提供用户的增删改查功能
     """
@@ -131,7 +133,7 @@ class UserViewSet(viewsets.ModelViewSet):
         })
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(ServerTimingViewMixin, viewsets.ModelViewSet):
     """
     角色视图集，提供角色的增删改查功能
     """
@@ -230,7 +232,7 @@ class DecoratedTokenBlacklistView(TokenBlacklistView):
         return super().post(request, *args, **kwargs)
 
 
-class LogoutView(APIView):
+class LogoutView(ServerTimingViewMixin, APIView):
     """
     用户登出视图，将刷新令牌加入黑名单
     """
@@ -264,8 +266,8 @@ class LogoutView(APIView):
             refresh_token = request.data.get('refresh')
             
             if refresh_token:
-                # 将refresh token加入黑名单
-                token = RefreshToken(refresh_token)
+                # 将refresh token加入黑名单（校验时通过黑名单过滤器检查是否已登出）
+                token = PermissionRefreshToken(refresh_token)
                 token.blacklist()
                 
                 return Response(